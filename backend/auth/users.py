@@ -8,6 +8,7 @@ from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi import Body
 
 from backend.database.db import User, Base, get_db, SessionLocal
+from backend.cache.benutzer import lade_benutzer, vergiss_benutzer
 from backend.config import settings, JWT_SECRET
 from jose import JWTError, jwt as jose_jwt
 
@@ -36,6 +37,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+def _lade_benutzer(username: str) -> Optional[User]:
+    # Cache miss: own short session, the user is detached for reuse across requests
+    with SessionLocal() as db:
+        user = get_user_by_username(db, username)
+        if user is not None:
+            db.expunge(user)
+        return user
+
 def authenticate_user(db: Session, username: str, password: str):
     user = get_user_by_username(db, username)
     if not user or not verify_password(password, user.hashed_password):
@@ -47,7 +56,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 # Dependency: get current user from JWT
 from fastapi import Request
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -60,7 +69,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username=username)
+    user = lade_benutzer(username, _lade_benutzer)
     if user is None:
         raise credentials_exception
     return user
@@ -99,8 +108,10 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    username = user.username
     db.delete(user)
     db.commit()
+    vergiss_benutzer(username)
     return {"ok": True}
 
 @router.put("/users/{user_id}/password", dependencies=[Depends(get_current_admin_user)])
@@ -109,5 +120,19 @@ def change_password(user_id: int, new_password: str = Body(...), db: Session = D
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.password_hash = get_password_hash(new_password)
+    username = user.username
     db.commit()
+    vergiss_benutzer(username)
     return {"ok": True}
+
+@router.put("/users/{user_id}/role", dependencies=[Depends(get_current_admin_user)])
+def change_role(user_id: int, role: str = Body(..., embed=True), db: Session = Depends(get_db)):
+    if role not in ("admin", "user"):
+        raise HTTPException(status_code=400, detail="Unknown role")
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.role = role
+    db.commit()
+    vergiss_benutzer(user.username)
+    return {"id": user.id, "username": user.username, "role": user.role}
@@ -0,0 +1,38 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import threading
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping shared by the in-process caches"""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._daten: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            try:
+                self._daten.move_to_end(key)
+            except KeyError:
+                return default
+            return self._daten[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._daten[key] = value
+            self._daten.move_to_end(key)
+            while len(self._daten) > self.maxsize:
+                self._daten.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self._lock:
+            return self._daten.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._daten.clear()
+
+    def __len__(self) -> int:
+        return len(self._daten)
@@ -0,0 +1,54 @@
+from typing import Callable, Optional
+import threading
+import time
+
+from backend.cache import LRUCache
+from backend.config import settings
+from backend.database.db import User
+
+_benutzer = LRUCache(maxsize=settings.USER_CACHE_SIZE)
+# Bumped by every invalidation; a single counter instead of one stamp per
+# username, so memory stays bounded by the LRU above
+_generation = 0
+_lock = threading.Lock()
+
+
+def lade_benutzer(username: str, laden: Callable[[str], Optional[User]]) -> Optional[User]:
+    """
+    User for a token subject, from the cache while the entry is younger
+    than settings.USER_CACHE_TTL.
+
+    On a miss ``laden`` fetches the user (detached from its session). The
+    generation is read before the lookup and the result is only cached if no
+    invalidation happened in between, so a concurrent password change or
+    delete never gets overwritten by the stale row. An invalidation of any
+    other user in that window merely skips caching this one load. Unknown
+    users are not cached.
+    """
+    stand = _generation
+    eintrag = _benutzer.get(username)
+    if eintrag is not None:
+        ablauf, user = eintrag
+        if time.monotonic() < ablauf:
+            return user
+    user = laden(username)
+    if user is not None:
+        with _lock:
+            if _generation == stand:
+                _benutzer.put(username, (time.monotonic() + settings.USER_CACHE_TTL, user))
+    return user
+
+
+def vergiss_benutzer(username: str) -> None:
+    """Drop a user after delete, password or role changes and void loads in flight"""
+    global _generation
+    with _lock:
+        _generation += 1
+        _benutzer.pop(username)
+
+
+def leere() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+        _benutzer.clear()
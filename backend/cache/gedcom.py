@@ -0,0 +1,67 @@
+from typing import Dict, Any, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import json
+
+from backend.cache import LRUCache
+from backend.config import settings
+from backend.database.engine import insert_mit_konflikt
+from backend.models.gedcom import GedcomBaum
+from backend.tools.gedcom import GEDCOM_PARSER_VERSION
+
+_baeume = LRUCache(maxsize=settings.GEDCOM_CACHE_SIZE)
+
+
+def gedcom_hasher():
+    """
+    SHA-256 over the raw file content, seeded with the parser version so
+    stored trees are re-parsed after parser changes
+    """
+    return hashlib.sha256(f"gedcom-v{GEDCOM_PARSER_VERSION}\n".encode("ascii"))
+
+
+def gedcom_hash(content: bytes) -> str:
+    hasher = gedcom_hasher()
+    hasher.update(content)
+    return hasher.hexdigest()
+
+
+async def lade_baum(db: AsyncSession, user_id: int, baum_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Parsed tree of ``user_id`` by id: in-memory LRU first, then the
+    gedcom_baum table. Trees of other users are not found.
+    """
+    daten = _baeume.get((user_id, baum_id))
+    if daten is not None:
+        return daten
+    gespeichert = await db.scalar(
+        select(GedcomBaum.daten).where(GedcomBaum.id == baum_id, GedcomBaum.user_id == user_id)
+    )
+    if gespeichert is None:
+        return None
+    daten = json.loads(gespeichert)
+    _baeume.put((user_id, baum_id), daten)
+    return daten
+
+
+async def speichere_baum(
+    db: AsyncSession, user_id: int, baum_id: str, daten: Dict[str, Any], groesse: int = 0
+) -> Dict[str, Any]:
+    """
+    Store a freshly parsed tree under its content hash for ``user_id`` and
+    return it with its baumId. A single INSERT ... ON CONFLICT DO NOTHING,
+    so concurrent uploads of the same file both succeed.
+    """
+    daten = {**daten, "baumId": baum_id}
+    anweisung = insert_mit_konflikt(db.bind.dialect.name, GedcomBaum).values(
+        id=baum_id,
+        user_id=user_id,
+        erblasser_name=daten.get("erblasserName"),
+        daten=json.dumps(daten),
+        groesse=groesse
+    )
+    await db.execute(anweisung.on_conflict_do_nothing(index_elements=[GedcomBaum.id, GedcomBaum.user_id]))
+    await db.commit()
+    _baeume.put((user_id, baum_id), daten)
+    return daten
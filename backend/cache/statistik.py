@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import time
+
+from backend.cache import LRUCache
+from backend.config import settings
+
+# (parameters, time bucket) -> result
+_statistik = LRUCache(maxsize=settings.STATISTIK_CACHE_SIZE)
+
+
+def zeitfenster(jetzt: Optional[float] = None) -> int:
+    """
+    Current bucket of settings.STATISTIK_CACHE_SEKUNDEN seconds, aligned to
+    the epoch so that all workers start a new bucket at the same moment
+    """
+    return int((time.time() if jetzt is None else jetzt) // settings.STATISTIK_CACHE_SEKUNDEN)
+
+
+async def lade_statistik(schluessel: Hashable, berechnen: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Statistics for ``schluessel`` (the query parameters), computed at most
+    once per time bucket and worker. ``stand`` in the result is the time it
+    was computed, so dashboards can show how fresh the numbers are; entries
+    of past buckets are never read again and age out of the LRU.
+    """
+    fenster = zeitfenster()
+    ergebnis = _statistik.get((schluessel, fenster))
+    if ergebnis is None:
+        ergebnis = await berechnen()
+        ergebnis["stand"] = datetime.now(timezone.utc).isoformat()
+        _statistik.put((schluessel, fenster), ergebnis)
+    return ergebnis
+
+
+def leere() -> None:
+    _statistik.clear()
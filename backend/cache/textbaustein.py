@@ -0,0 +1,99 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import threading
+
+from backend.cache import LRUCache
+from backend.config import settings
+from backend.database.engine import insert_mit_konflikt
+from backend.models.textbaustein import Textbaustein, TextbausteinStand
+from backend.tools.textbaustein import Vorlage, kompiliere_textbaustein
+
+# (id, version) -> Vorlage
+_vorlagen = LRUCache(maxsize=settings.TEXTBAUSTEIN_CACHE_SIZE)
+
+
+def lade_vorlagen(db: Session, baustein_ids: Sequence[str]) -> Tuple[List[Vorlage], List[str]]:
+    """
+    Compiled templates in the requested order and the ids that do not exist.
+    Only (id, version) is queried; texts are loaded for cache misses only.
+    """
+    versionen: Dict[str, int] = dict(
+        db.query(Textbaustein.id, Textbaustein.version).filter(Textbaustein.id.in_(set(baustein_ids))).all()
+    )
+    gefunden = {}
+    fehlend = []
+    for baustein_id, version in versionen.items():
+        vorlage = _vorlagen.get((baustein_id, version))
+        if vorlage is None:
+            fehlend.append(baustein_id)
+        else:
+            gefunden[baustein_id] = vorlage
+    if fehlend:
+        zeilen = db.query(Textbaustein.id, Textbaustein.version, Textbaustein.text).filter(Textbaustein.id.in_(fehlend))
+        for baustein_id, version, text in zeilen:
+            vorlage = kompiliere_textbaustein(text or "")
+            _vorlagen.put((baustein_id, version), vorlage)
+            gefunden[baustein_id] = vorlage
+    unbekannt = [i for i in baustein_ids if i not in gefunden]
+    return [gefunden[i] for i in baustein_ids if i in gefunden], unbekannt
+
+
+def vergiss_vorlage(baustein_id: str, version: int) -> None:
+    """Drop the compiled template of a superseded version"""
+    _vorlagen.pop((baustein_id, version))
+
+
+class Katalog:
+    """
+    In-process snapshot of the Textbaustein library indexed by kategorie.
+
+    The version lives in the database (textbaustein_stand) and is bumped
+    by ``erhoehe_version`` in the same transaction as the change, so every
+    worker sees it. Each request reads it with one primary-key lookup; the
+    snapshot is only rebuilt when it changed. The ETag is the version, and
+    stays valid across workers and restarts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stand: Optional[Tuple[int, Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+
+    @staticmethod
+    def version(db: Session) -> int:
+        return db.execute(select(TextbausteinStand.version).where(TextbausteinStand.id == 1)).scalar() or 0
+
+    @staticmethod
+    def etag(version: int, kategorie: Optional[str] = None) -> str:
+        return f'"{version}-{kategorie or "*"}"'
+
+    @staticmethod
+    def erhoehe_version(db: Session) -> None:
+        """Bumps the version in the caller's transaction; commit follows with the change"""
+        tabelle = TextbausteinStand.__table__
+        anweisung = insert_mit_konflikt(db.bind.dialect.name, tabelle).values(id=1, version=1)
+        db.execute(anweisung.on_conflict_do_update(
+            index_elements=[tabelle.c.id], set_={"version": tabelle.c.version + 1}
+        ))
+
+    def eintraege(self, db: Session, kategorie: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """ETag and entries of one consistent snapshot"""
+        version = self.version(db)
+        stand = self._stand
+        if stand is None or stand[0] != version:
+            with self._lock:
+                # Another request may have rebuilt it while this one waited
+                stand = self._stand
+                if stand is None or stand[0] != version:
+                    alle = [
+                        {"id": b.id, "kategorie": b.kategorie, "titel": b.titel, "text": b.text, "version": b.version}
+                        for b in db.query(Textbaustein).all()
+                    ]
+                    nach_kategorie: Dict[str, List[Dict[str, Any]]] = {}
+                    for eintrag in alle:
+                        nach_kategorie.setdefault(eintrag["kategorie"], []).append(eintrag)
+                    stand = self._stand = (version, nach_kategorie, alle)
+        return self.etag(stand[0], kategorie), stand[1].get(kategorie, []) if kategorie else stand[2]
+
+
+katalog = Katalog()
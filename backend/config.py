@@ -1,10 +1,72 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"  # In production, use a secure key
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    DATABASE_URL: str = "sqlite:///./notary.db"
+    DATABASE_URL: str = "sqlite:///./sql_app.db"
+    # Optional replica for the read-only pool (empty = DATABASE_URL)
+    DATABASE_READ_URL: str = ""
+
+    # Connection pools (PostgreSQL; pool size/overflow also for SQLite files)
+    DB_POOL_SIZE: int = 5
+    DB_READ_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+
+    # SQLite profile, applied on every connection
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KIB: int = 64 * 1024
+
+    # Batch Settings (None = one worker per CPU)
+    BATCH_MAX_WORKERS: Optional[int] = None
+    # Erbfolge batches: estates per pool task (one submission and one insert each)
+    BATCH_NACHLAESSE_JE_AUFGABE: int = 64
+
+    # PDF rendering pool: worker processes, reports per task, reports per batch request
+    PDF_MAX_WORKERS: int = 2
+    PDF_BATCH_GROESSE: int = 25
+    PDF_MAX_BERICHTE: int = 5000
+
+    # Cache Settings
+    GEDCOM_CACHE_SIZE: int = 32
+    TEXTBAUSTEIN_CACHE_SIZE: int = 1024
+    # Authenticated users per worker process; changes made by another worker show up after the TTL
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: float = 60
+
+    # GNotKG fee tables (empty = tables shipped in backend/data/gebuehrentabellen)
+    GEBUEHRENTABELLEN_DIR: str = ""
+    GEBUEHRENTABELLEN_RELOAD_SEKUNDEN: float = 30
+
+    # Rows fetched and encoded per chunk by streaming CSV exports
+    EXPORT_ZEILEN_JE_BLOCK: int = 1000
+
+    # Background export jobs: worker threads and directory for finished files
+    EXPORT_JOB_WORKERS: int = 2
+    EXPORT_JOB_DIR: str = "./export_jobs"
+
+    # Write-behind log of calculator rows: flush after this many rows or milliseconds
+    PROTOKOLL_BATCH_ZEILEN: int = 500
+    PROTOKOLL_INTERVALL_MS: float = 200
+    # Rows of failed flushes kept for retry; beyond this, and on shutdown, they go to the error file
+    PROTOKOLL_MAX_OFFEN: int = 5000
+    PROTOKOLL_FEHLERDATEI: str = "./protokoll_fehler.ndjson"
+
+    # Per-tool history pages: default and maximum page size
+    HISTORY_SEITE_GROESSE: int = 50
+    HISTORY_SEITE_MAX: int = 500
+
+    # Statistics API: results are reused within buckets of this many seconds
+    STATISTIK_CACHE_SEKUNDEN: int = 300
+    STATISTIK_CACHE_SIZE: int = 64
+
+    # VPI series for Wertsicherungsklauseln (.npy holding start month and values, memory-mapped)
+    VPI_DATEI: str = "./vpi.npy"
     
     # SMTP Settings
     SMTP_SERVER: str = ""
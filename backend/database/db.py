@@ -1,15 +1,33 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import BigInteger, Column, Index, Integer, String, Boolean, DateTime, ForeignKey, Text, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from datetime import datetime
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+from backend.config import settings
+from backend.database.engine import erstelle_async_engine, erstelle_engine, ist_speicher_db
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+# Read-only pool for GET endpoints, a replica if DATABASE_READ_URL is set
+SQLALCHEMY_READ_URL = settings.DATABASE_READ_URL or SQLALCHEMY_DATABASE_URL
+
+engine = erstelle_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = erstelle_async_engine(SQLALCHEMY_DATABASE_URL)
+# expire_on_commit=False: rows stay readable after commit without a lazy
+# load, which an AsyncSession cannot do implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if ist_speicher_db(SQLALCHEMY_READ_URL):
+    # A second in-memory engine would be a different, empty database
+    read_engine, async_read_engine = engine, async_engine
+else:
+    read_engine = erstelle_engine(SQLALCHEMY_READ_URL, nur_lesen=True)
+    async_read_engine = erstelle_async_engine(SQLALCHEMY_READ_URL, nur_lesen=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 class User(Base):
@@ -22,14 +40,25 @@ class User(Base):
     tool_history = relationship("ToolHistory", back_populates="user")
 
 class ToolHistory(Base):
+    """Autosave store of the frontend: one row per user and tool"""
     __tablename__ = "tool_history"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    tool_name = Column(String, nullable=False)
-    json_data = Column(Text)
-    last_used = Column(DateTime, default=datetime.utcnow)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tool_id = Column(String, nullable=False)
+    tool_name = Column(String)
+    data = Column(Text)  # JSON-String des Frontends
+    last_accessed = Column(BigInteger)  # Millisekunden seit 1970 (Date.now())
     user = relationship("User", back_populates="tool_history")
 
+    __table_args__ = (
+        # Ziel des Upserts (INSERT ... ON CONFLICT (user_id, tool_id) DO UPDATE)
+        Index("ux_tool_history_user_tool", "user_id", "tool_id", unique=True),
+        # Liste je Benutzer, neueste zuerst, ohne Zugriff auf die Tabelle
+        Index("ix_tool_history_zuletzt", "user_id", text("last_accessed DESC"), "tool_id", "tool_name", "data").ddl_if(dialect="sqlite"),
+        # PostgreSQL: B-Tree-Einträge sind in der Größe begrenzt, data daher nicht im Index
+        Index("ix_tool_history_zuletzt", "user_id", text("last_accessed DESC"), postgresql_include=["tool_id", "tool_name"]).ddl_if(dialect="postgresql"),
+    )
+
 class SMTPConfig(Base):
     __tablename__ = "smtp_config"
     id = Column(Integer, primary_key=True, index=True)
@@ -44,3 +73,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session on the read-only pool, for GET endpoints"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Dependency for async routes: commits run on the event loop without blocking it"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,107 @@
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.config import settings
+
+# Async drivers for the same database: aiosqlite, asyncpg for PostgreSQL
+_ASYNC_DRIVER = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
+
+# INSERT constructs with on_conflict_do_nothing / on_conflict_do_update
+_INSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def insert_mit_konflikt(dialekt: str, tabelle):
+    """INSERT ... ON CONFLICT for ``tabelle`` in the given dialect"""
+    return _INSERT[dialekt](tabelle)
+
+
+def async_url(url: str) -> str:
+    """
+    Database URL with the asyncio driver of its dialect. A sync driver given
+    in the URL (postgresql+psycopg2, sqlite+pysqlite) is replaced; dialects
+    without a known async driver keep theirs.
+    """
+    adresse = make_url(url)
+    treiber = _ASYNC_DRIVER.get(adresse.get_backend_name())
+    if treiber is None:
+        return url
+    return adresse.set(drivername=treiber).render_as_string(hide_password=False)
+
+
+def ist_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def ist_speicher_db(url: str) -> bool:
+    """In-memory SQLite, every connection would see its own empty database"""
+    return ist_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(nur_lesen: bool):
+    # Applied to every new DBAPI connection (sqlite3 or the aiosqlite adapter)
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if not nur_lesen:
+            # WAL is stored in the file; readers never block the writer and vice versa
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        # Negative cache_size is in KiB instead of pages
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KIB)}")
+        if nur_lesen:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+
+def _engine_argumente(url: str, nur_lesen: bool) -> Dict[str, Any]:
+    if ist_sqlite(url):
+        argumente: Dict[str, Any] = {"connect_args": {"check_same_thread": False}}
+        if not ist_speicher_db(url):
+            argumente["pool_size"] = settings.DB_READ_POOL_SIZE if nur_lesen else settings.DB_POOL_SIZE
+            argumente["max_overflow"] = settings.DB_MAX_OVERFLOW
+            argumente["pool_timeout"] = settings.DB_POOL_TIMEOUT
+        return argumente
+    argumente = {
+        "pool_size": settings.DB_READ_POOL_SIZE if nur_lesen else settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if nur_lesen:
+        # psycopg2 and asyncpg both open read-only transactions with this option
+        argumente["execution_options"] = {"postgresql_readonly": True}
+    return argumente
+
+
+def _profil(engine: Engine, url: str, nur_lesen: bool) -> None:
+    if ist_sqlite(url):
+        event.listen(engine, "connect", _sqlite_pragmas(nur_lesen))
+
+
+def erstelle_engine(url: str, nur_lesen: bool = False) -> Engine:
+    """
+    Engine for ``url`` with the profile of its backend.
+
+    SQLite: WAL journal, synchronous, busy timeout, mmap and page cache as
+    configured, applied on connect. PostgreSQL (and other servers): a
+    QueuePool with size, overflow, timeout, recycle and pre-ping. With
+    ``nur_lesen`` connections refuse writes (query_only on SQLite,
+    read-only transactions on PostgreSQL).
+    """
+    engine = create_engine(url, **_engine_argumente(url, nur_lesen))
+    _profil(engine, url, nur_lesen)
+    return engine
+
+
+def erstelle_async_engine(url: str, nur_lesen: bool = False) -> AsyncEngine:
+    """Async counterpart of erstelle_engine over aiosqlite or asyncpg"""
+    engine = create_async_engine(async_url(url), **_engine_argumente(url, nur_lesen))
+    _profil(engine.sync_engine, url, nur_lesen)
+    return engine
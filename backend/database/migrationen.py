@@ -0,0 +1,185 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+# Applied migrations by name; create_all creates new tables, migrations
+# adapt tables that already exist in older databases
+_schema_migration = Table(
+    "schema_migration", MetaData(),
+    Column("name", String, primary_key=True),
+    Column("angewendet", DateTime, nullable=False),
+)
+
+Migration = Callable[[Connection], None]
+MIGRATIONEN: List[Tuple[str, Migration]] = []
+
+
+def migration(name: str) -> Callable[[Migration], Migration]:
+    def registriere(funktion: Migration) -> Migration:
+        MIGRATIONEN.append((name, funktion))
+        return funktion
+    return registriere
+
+
+def fuehre_migrationen_aus(engine: Engine) -> List[str]:
+    """
+    Runs every migration not yet recorded in schema_migration, each in its
+    own transaction, in definition order. Call after create_all at startup.
+    Returns the names of the migrations applied now.
+    """
+    _schema_migration.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        erledigt = set(conn.execute(select(_schema_migration.c.name)).scalars())
+    neu = []
+    for name, funktion in MIGRATIONEN:
+        if name in erledigt:
+            continue
+        with engine.begin() as conn:
+            funktion(conn)
+            conn.execute(_schema_migration.insert().values(name=name, angewendet=datetime.utcnow()))
+        neu.append(name)
+    return neu
+
+
+@migration("0001_tool_history_autosave")
+def _tool_history_autosave(conn: Connection) -> None:
+    """
+    tool_history in the layout of the ORM model with the unique
+    (user_id, tool_id) and the listing index. Older databases have either
+    the previous ORM layout (tool_name, json_data, last_used) or the one
+    created by raw SQL in routes/history.py (without unique index, so
+    possibly duplicate tools per user); both are copied over, keeping the
+    newest row per user and tool.
+    """
+    from backend.database.db import ToolHistory
+    tabelle = ToolHistory.__table__
+    if not inspect(conn).has_table("tool_history"):
+        tabelle.create(conn)
+        return
+    spalten = {c["name"] for c in inspect(conn).get_columns("tool_history")}
+    indizes = {i["name"] for i in inspect(conn).get_indexes("tool_history")}
+    if {"tool_id", "data", "last_accessed"} <= spalten and "ux_tool_history_user_tool" in indizes:
+        return
+    if {"tool_id", "data", "last_accessed"} <= spalten:
+        quelle = "SELECT id, user_id, tool_id, tool_name, data, last_accessed FROM tool_history_alt"
+    else:
+        # Vorheriges ORM-Modell: Werkzeugname als id, Datum in Millisekunden
+        if conn.dialect.name == "sqlite":
+            millis = "CAST((julianday(last_used) - 2440587.5) * 86400000 AS INTEGER)"
+        else:
+            millis = "CAST(EXTRACT(EPOCH FROM last_used) * 1000 AS BIGINT)"
+        quelle = (
+            f"SELECT id, user_id, tool_name AS tool_id, tool_name, json_data AS data, {millis} AS last_accessed "
+            "FROM tool_history_alt"
+        )
+    for index in indizes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    conn.execute(text("ALTER TABLE tool_history RENAME TO tool_history_alt"))
+    tabelle.create(conn)
+    conn.execute(text(f"""
+        INSERT INTO tool_history (user_id, tool_id, tool_name, data, last_accessed)
+        SELECT user_id, tool_id, tool_name, data, last_accessed FROM (
+            SELECT q.*, ROW_NUMBER() OVER (
+                PARTITION BY user_id, tool_id ORDER BY last_accessed DESC NULLS LAST, id DESC
+            ) AS rang
+            FROM ({quelle}) AS q
+        ) AS t
+        WHERE rang = 1 AND user_id IS NOT NULL AND tool_id IS NOT NULL
+    """))
+    conn.execute(text("DROP TABLE tool_history_alt"))
+
+
+@migration("0002_historie_keyset_indizes")
+def _historie_keyset_indizes(conn: Connection) -> None:
+    """(user_id, id) per calculator table for keyset-paginated history pages"""
+    from backend.models.erbfolge import Erbfolge
+    from backend.models.erbpachtzins import Erbpachtzins
+    from backend.models.gnotkg import GNotKG
+    from backend.models.miteigentum import Miteigentum
+    for modell in (Erbfolge, Erbpachtzins, GNotKG, Miteigentum):
+        # Missing tables come from create_all, indexes included
+        if not inspect(conn).has_table(modell.__tablename__):
+            continue
+        for index in modell.__table__.indexes:
+            if index.name == f"ix_{modell.__tablename__}_user_id_id":
+                index.create(conn, checkfirst=True)
+
+
+@migration("0003_berechnungen_created_at")
+def _berechnungen_created_at(conn: Connection) -> None:
+    """
+    created_at and the statistics index per calculator table. Rows written
+    before this migration keep created_at NULL: their date is unknown, they
+    count in totals without a date range but fall in no month.
+    """
+    from backend.models.erbfolge import Erbfolge
+    from backend.models.erbpachtzins import Erbpachtzins
+    from backend.models.gnotkg import GNotKG
+    from backend.models.miteigentum import Miteigentum
+    for modell in (Erbfolge, Erbpachtzins, GNotKG, Miteigentum):
+        name = modell.__tablename__
+        if not inspect(conn).has_table(name):
+            continue
+        if "created_at" not in {c["name"] for c in inspect(conn).get_columns(name)}:
+            typ = modell.__table__.c.created_at.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {name} ADD COLUMN created_at {typ}"))
+        for index in modell.__table__.indexes:
+            if index.name == f"ix_{name}_created_at":
+                index.create(conn, checkfirst=True)
+
+
+@migration("0004_textbaustein_version")
+def _textbaustein_version(conn: Connection) -> None:
+    """Template version of each Textbaustein (key of the compiled template cache)"""
+    if not inspect(conn).has_table("textbaustein"):
+        return
+    if "version" not in {c["name"] for c in inspect(conn).get_columns("textbaustein")}:
+        conn.execute(text("ALTER TABLE textbaustein ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+@migration("0005_textbaustein_nr")
+def _textbaustein_nr(conn: Connection) -> None:
+    """
+    textbaustein with the INTEGER PRIMARY KEY nr as key of the FTS index.
+    The implicit rowid of the old layout (String primary key) could change
+    on VACUUM and leave the external-content index pointing at other rows.
+    The table is copied over; the index and its triggers are dropped here
+    and rebuilt from the new table by erstelle_suchindex at startup.
+    """
+    from backend.models.textbaustein import Textbaustein
+    tabelle = Textbaustein.__table__
+    if not inspect(conn).has_table("textbaustein"):
+        return
+    if "nr" in {c["name"] for c in inspect(conn).get_columns("textbaustein")}:
+        return
+    if conn.dialect.name == "sqlite":
+        for trigger in ("textbaustein_fts_ai", "textbaustein_fts_ad", "textbaustein_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS textbaustein_fts"))
+    for index in inspect(conn).get_indexes("textbaustein"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    conn.execute(text("ALTER TABLE textbaustein RENAME TO textbaustein_alt"))
+    tabelle.create(conn)
+    conn.execute(text("""
+        INSERT INTO textbaustein (id, kategorie, titel, text, version)
+        SELECT id, kategorie, titel, text, version FROM textbaustein_alt WHERE id IS NOT NULL
+    """))
+    conn.execute(text("DROP TABLE textbaustein_alt"))
+
+
+@migration("0006_gedcom_baum_eigentuemer")
+def _gedcom_baum_eigentuemer(conn: Connection) -> None:
+    """
+    gedcom_baum keyed by (content hash, user_id). Rows of the previous
+    layout have no owner and are only a parse cache, so the table is
+    recreated empty; trees are parsed again on the next upload.
+    """
+    from backend.models.gedcom import GedcomBaum
+    if not inspect(conn).has_table("gedcom_baum"):
+        return
+    if "user_id" in {c["name"] for c in inspect(conn).get_columns("gedcom_baum")}:
+        return
+    conn.execute(text("DROP TABLE gedcom_baum"))
+    GedcomBaum.__table__.create(conn)
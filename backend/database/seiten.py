@@ -0,0 +1,38 @@
+from typing import Any, Dict, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+
+
+def seitengroesse(limit: Optional[int]) -> int:
+    """Requested page size, clamped to 1..settings.HISTORY_SEITE_MAX"""
+    return max(1, min(limit or settings.HISTORY_SEITE_GROESSE, settings.HISTORY_SEITE_MAX))
+
+
+async def lade_seite(
+    db: AsyncSession, modell: type, spalten: Sequence[str], user_id: int,
+    cursor: Optional[int] = None, limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    One page of a user's rows, newest first, by keyset over (user_id, id).
+
+    Only ``spalten`` are selected. ``cursor`` is the ``naechster_cursor``
+    of the previous page (the smallest id it contained); each page is a
+    single range scan on the (user_id, id) index no matter how deep it is.
+    One extra row is read to tell whether another page follows.
+    """
+    limit = seitengroesse(limit)
+    tabelle = modell.__table__
+    abfrage = select(*(tabelle.c[s] for s in spalten)).where(tabelle.c.user_id == user_id)
+    if cursor is not None:
+        abfrage = abfrage.where(tabelle.c.id < cursor)
+    abfrage = abfrage.order_by(tabelle.c.id.desc()).limit(limit + 1)
+    zeilen = (await db.execute(abfrage)).mappings().all()
+    weitere = len(zeilen) > limit
+    eintraege = [dict(z) for z in zeilen[:limit]]
+    return {
+        "eintraege": eintraege,
+        "naechster_cursor": eintraege[-1]["id"] if weitere else None,
+    }
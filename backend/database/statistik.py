@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database.db import User
+from backend.models.erbfolge import Erbfolge
+from backend.models.erbpachtzins import Erbpachtzins
+from backend.models.gnotkg import GNotKG
+from backend.models.miteigentum import Miteigentum
+
+# Tool name in the result -> calculator model
+TOOLS = {
+    "erbfolge": Erbfolge,
+    "gnotkg": GNotKG,
+    "erbpachtzins": Erbpachtzins,
+    "miteigentum": Miteigentum,
+}
+
+
+def monat(spalte, dialekt: str):
+    """'YYYY-MM' of a timestamp column, computed by the database"""
+    if dialekt == "postgresql":
+        return func.to_char(spalte, "YYYY-MM")
+    return func.strftime("%Y-%m", spalte)
+
+
+def _zeitraum(abfrage, tabelle, von: Optional[datetime], bis: Optional[datetime]):
+    # Half-open [von, bis), a range scan on the ix_<table>_created_at index
+    if von is not None:
+        abfrage = abfrage.where(tabelle.c.created_at >= von)
+    if bis is not None:
+        abfrage = abfrage.where(tabelle.c.created_at < bis)
+    return abfrage
+
+
+async def berechne_statistik(
+    db: AsyncSession, von: Optional[datetime] = None, bis: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Usage and value statistics of the calculator tables, aggregated by the
+    database with GROUP BY; only the grouped rows are transferred.
+
+    - ``nutzung``: calculations per tool and user (one UNION ALL query)
+    - ``gnotkg_gebuehren``: GNotKG count and fee total per month
+    - ``erbfolge_vermoegen``: Erbfolge count and average estate value per month
+
+    All three are answered from the (created_at, user_id, ...) indexes
+    without reading the tables. Rows without created_at (written before
+    migration 0003) are only counted without a date range, under month None.
+    """
+    dialekt = db.bind.dialect.name
+
+    je_tool = union_all(*(
+        _zeitraum(
+            select(literal(name).label("tool"), modell.user_id, func.count().label("anzahl"))
+            .group_by(modell.user_id),
+            modell.__table__, von, bis
+        )
+        for name, modell in TOOLS.items()
+    )).subquery()
+    nutzung = (await db.execute(
+        select(je_tool.c.tool, je_tool.c.user_id, User.username, je_tool.c.anzahl)
+        .outerjoin(User, User.id == je_tool.c.user_id)
+        .order_by(je_tool.c.tool, je_tool.c.anzahl.desc(), je_tool.c.user_id)
+    )).mappings().all()
+
+    gnotkg_monat = monat(GNotKG.created_at, dialekt).label("monat")
+    gebuehren = (await db.execute(
+        _zeitraum(
+            select(gnotkg_monat, func.count().label("anzahl"), func.sum(GNotKG.gebuehr).label("summe")),
+            GNotKG.__table__, von, bis
+        ).group_by(gnotkg_monat).order_by(gnotkg_monat)
+    )).mappings().all()
+
+    erbfolge_monat = monat(Erbfolge.created_at, dialekt).label("monat")
+    vermoegen = (await db.execute(
+        _zeitraum(
+            select(
+                erbfolge_monat, func.count().label("anzahl"),
+                func.avg(Erbfolge.vermoegenswert).label("durchschnitt")
+            ),
+            Erbfolge.__table__, von, bis
+        ).group_by(erbfolge_monat).order_by(erbfolge_monat)
+    )).mappings().all()
+
+    gesamt = dict.fromkeys(TOOLS, 0)
+    for zeile in nutzung:
+        gesamt[zeile["tool"]] += zeile["anzahl"]
+    return {
+        "je_tool": gesamt,
+        "nutzung": [dict(z) for z in nutzung],
+        "gnotkg_gebuehren": [dict(z) for z in gebuehren],
+        "erbfolge_vermoegen": [dict(z) for z in vermoegen],
+    }
@@ -0,0 +1,77 @@
+from typing import Iterable, Iterator, List, Set, Tuple
+import re
+import zipfile
+
+
+def eintragsname(name: str, endung: str, vergeben: Set[str]) -> str:
+    """
+    Safe, unique ZIP entry name for a client-supplied file name: only the
+    last path component, reduced to word characters, dots and dashes, no
+    leading dots; repeated names get -2, -3, ... The result is added to
+    ``vergeben``.
+    """
+    stamm = re.sub(r"[^\w.-]+", "_", re.split(r"[\\/]", name)[-1]).lstrip(".") or "dokument"
+    if stamm.lower().endswith(endung.lower()):
+        stamm = stamm[:-len(endung)] or "dokument"
+    kandidat, nummer = f"{stamm}{endung}", 1
+    while kandidat.lower() in vergeben:
+        nummer += 1
+        kandidat = f"{stamm}-{nummer}{endung}"
+    vergeben.add(kandidat.lower())
+    return kandidat
+
+
+class _Puffer:
+    """
+    Write-only sink for ZipFile. Without tell()/seek() zipfile writes
+    streaming entries (sizes in data descriptors), and everything written
+    so far can be handed out and dropped between entries.
+    """
+
+    def __init__(self):
+        self._teile: List[bytes] = []
+
+    def write(self, daten: bytes) -> int:
+        self._teile.append(bytes(daten))
+        return len(daten)
+
+    def flush(self) -> None:
+        pass
+
+    def abholen(self) -> bytes:
+        daten = b"".join(self._teile)
+        self._teile.clear()
+        return daten
+
+
+class ZipStrom:
+    """
+    Incremental ZIP writer: ``eintrag`` returns the bytes of one finished
+    entry, ``abschliessen`` the central directory. Usable from sync and
+    async generators alike.
+    """
+
+    def __init__(self):
+        self._puffer = _Puffer()
+        self._archiv = zipfile.ZipFile(self._puffer, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def eintrag(self, name: str, inhalt: bytes) -> bytes:
+        self._archiv.writestr(name, inhalt)
+        return self._puffer.abholen()
+
+    def abschliessen(self) -> bytes:
+        self._archiv.close()
+        return self._puffer.abholen()
+
+
+def zip_strom(eintraege: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """
+    Packs (name, content) pairs into a ZIP archive and yields it piece by
+    piece; only the entry currently being written is held in memory
+    """
+    archiv = ZipStrom()
+    for name, inhalt in eintraege:
+        daten = archiv.eintrag(name, inhalt)
+        if daten:
+            yield daten
+    yield archiv.abschliessen()
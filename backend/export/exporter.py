@@ -1,106 +1,163 @@
-from fastapi import APIRouter, Body, Response, HTTPException
-import csv
-import io
-from fpdf import FPDF
+from fastapi import APIRouter, Body, Depends, Response, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Set
+from pydantic import BaseModel
+import os
+from backend.auth.users import get_current_user, get_current_admin_user, User
+from backend.database.db import get_db, get_read_db
+from backend.models.exportjob import ExportJob
+from backend.config import settings
+from backend.export.archiv import ZipStrom, eintragsname
+from backend.export.historie import HISTORIEN, historie_csv
+from backend.export.pdf import LAYOUTS
+from backend.export.registry import ExportNichtVerfuegbar, exporter_fuer, formate
+from backend.workers.jobs import erstelle_job, laufender_fortschritt
+from backend.workers.pdf import pdf_statistik, rendere_pdfs
 
 router = APIRouter(prefix="/export", tags=["export"])
 
-@router.post("/{format}")
-def export_file(format: str, data: dict = Body(...)):
-    erblasser = data.get("erblasserName")
-    erben = data.get("erben", [])
-    ergebnisse = data.get("ergebnisse", {})
-
-    if format == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        writer.writerow(["Erblasser", erblasser])
-        writer.writerow(["Name", "Beziehung", "Erbquote (%)"])
-        for erbe in erben:
-            writer.writerow([
-                erbe.get("name"),
-                erbe.get("beziehung"),
-                f"{ergebnisse.get(erbe['id'], 0):.2f}"
-            ])
-        content = output.getvalue().encode("utf-8")
-        return Response(content, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=erbfolge.csv"})
-
-    elif format == "pdf":
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 10, f"Erbfolge-Berechnung für {erblasser}", ln=True)
-        pdf.cell(0, 10, "", ln=True)
-        pdf.cell(0, 10, "Name        Beziehung        Erbquote (%)", ln=True)
-        for erbe in erben:
-            pdf.cell(0, 10, f"{erbe.get('name','')}        {erbe.get('beziehung','')}        {ergebnisse.get(erbe['id'], 0):.2f}", ln=True)
-        content = pdf.output(dest='S')
-        return Response(content, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=erbfolge.pdf"})
-
-    elif format == "gedcom":
-        gedcom = f"0 @I1@ INDI\n1 NAME {erblasser}\n"
-        for idx, erbe in enumerate(erben, 1):
-            gedcom += f"0 @I{idx+1}@ INDI\n1 NAME {erbe.get('name','')}\n1 NOTE Beziehung: {erbe.get('beziehung','')}, Erbquote: {ergebnisse.get(erbe['id'], 0):.2f}%\n"
-        content = gedcom.encode("utf-8")
-        return Response(content, media_type="text/plain", headers={"Content-Disposition": "attachment; filename=erbfolge.ged"})
-
-    # Export für Erbpachtzins
-    elif format == "csv-erbpachtzins":
-        aktueller_zins = data.get("aktueller_zins")
-        alter_index = data.get("alter_index")
-        neuer_index = data.get("neuer_index")
-        neuer_zins = data.get("neuer_zins")
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        writer.writerow(["Aktueller Zins (€)", aktueller_zins])
-        writer.writerow(["Alter Index", alter_index])
-        writer.writerow(["Neuer Index", neuer_index])
-        writer.writerow(["Neuer Zins (€)", neuer_zins])
-        content = output.getvalue().encode("utf-8")
-        return Response(content, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=erbpachtzins.csv"})
-
-    elif format == "pdf-erbpachtzins":
-        aktueller_zins = data.get("aktueller_zins")
-        alter_index = data.get("alter_index")
-        neuer_index = data.get("neuer_index")
-        neuer_zins = data.get("neuer_zins")
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 10, "Erbpachtzins-Berechnung", ln=True)
-        pdf.cell(0, 10, f"Aktueller Zins: {aktueller_zins} €", ln=True)
-        pdf.cell(0, 10, f"Alter Index: {alter_index}", ln=True)
-        pdf.cell(0, 10, f"Neuer Index: {neuer_index}", ln=True)
-        pdf.cell(0, 10, f"Neuer Zins: {neuer_zins} €", ln=True)
-        content = pdf.output(dest='S')
-        return Response(content, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=erbpachtzins.pdf"})
-
-    # Export für GNotKG
-    elif format == "csv-gnotkg":
-        geschaeftswert = data.get("geschaeftswert")
-        vorgangsart = data.get("vorgangsart")
-        gebuehr = data.get("gebuehr")
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        writer.writerow(["Geschäftswert (€)", geschaeftswert])
-        writer.writerow(["Vorgangsart", vorgangsart])
-        writer.writerow(["Gebühr (€)", gebuehr])
-        content = output.getvalue().encode("utf-8")
-        return Response(content, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=gnotkg.csv"})
-
-    elif format == "pdf-gnotkg":
-        geschaeftswert = data.get("geschaeftswert")
-        vorgangsart = data.get("vorgangsart")
-        gebuehr = data.get("gebuehr")
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 10, "GNotKG-Berechnung", ln=True)
-        pdf.cell(0, 10, f"Geschäftswert: {geschaeftswert} €", ln=True)
-        pdf.cell(0, 10, f"Vorgangsart: {vorgangsart}", ln=True)
-        pdf.cell(0, 10, f"Gebühr: {gebuehr} €", ln=True)
-        content = pdf.output(dest='S')
-        return Response(content, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=gnotkg.pdf"})
-
-    else:
+@router.get("/history/{tool}.csv")
+def export_history_csv(tool: str, current_user: User = Depends(get_current_user)):
+    """Gesamte Berechnungshistorie eines Tools als CSV, blockweise gestreamt"""
+    if tool not in HISTORIEN:
+        raise HTTPException(status_code=404, detail="Unbekanntes Tool")
+    return StreamingResponse(
+        historie_csv(tool, current_user.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={tool}-historie.csv"}
+    )
+
+class PdfBericht(BaseModel):
+    layout: str
+    daten: Dict[str, Any] = {}
+    dateiname: Optional[str] = None
+
+@router.post("/pdf-batch")
+async def export_pdf_batch(
+    berichte: List[PdfBericht] = Body(..., embed=True),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Viele Berichte ({"layout": "gnotkg", "daten": {...}, "dateiname": ...})
+    in einem Aufruf; gerendert im PDF-Pool, gestreamt als ZIP. Dateinamen
+    werden auf einen sicheren, eindeutigen Namen ohne Pfad reduziert.
+    """
+    if len(berichte) > settings.PDF_MAX_BERICHTE:
+        raise HTTPException(status_code=413, detail=f"Höchstens {settings.PDF_MAX_BERICHTE} Berichte je Aufruf")
+    unbekannt = sorted({b.layout for b in berichte} - LAYOUTS.keys())
+    if unbekannt:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Layouts: {unbekannt}")
+    auftraege = [(b.layout, b.daten) for b in berichte]
+    vergeben: Set[str] = set()
+    namen = [
+        eintragsname(b.dateiname or f"{nummer:05d}_{b.layout}", ".pdf", vergeben)
+        for nummer, b in enumerate(berichte, 1)
+    ]
+
+    async def archiv():
+        zip_strom = ZipStrom()
+        nummer = 0
+        async for pdf in rendere_pdfs(auftraege):
+            yield zip_strom.eintrag(namen[nummer], pdf)
+            nummer += 1
+        yield zip_strom.abschliessen()
+
+    return StreamingResponse(archiv(), media_type="application/zip", headers={"Content-Disposition": "attachment; filename=berichte.zip"})
+
+@router.get("/pdf/stats", dependencies=[Depends(get_current_admin_user)])
+def export_pdf_stats():
+    return pdf_statistik()
+
+def _job_status(job: ExportJob) -> dict:
+    erledigt, gesamt = laufender_fortschritt(job.id) or (job.erledigt or 0, job.gesamt or 0)
+    return {
+        "id": job.id,
+        "art": job.art,
+        "status": job.status,
+        "erledigt": erledigt,
+        "gesamt": gesamt,
+        "fortschritt": round(erledigt / gesamt, 3) if gesamt else (1.0 if job.status == "fertig" else 0.0),
+        "dateiname": job.dateiname,
+        "groesse": job.groesse,
+        "fehler": job.fehler,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+
+def _eigener_job(db: Session, job_id: str, user: User) -> ExportJob:
+    job = db.get(ExportJob, job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Export-Job nicht gefunden")
+    return job
+
+@router.post("/jobs", status_code=202)
+def create_export_job(
+    art: str = Body(...),
+    parameter: dict = Body({}),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Startet einen Export im Hintergrund (art: historie-csv, pdf-batch)"""
+    try:
+        job = erstelle_job(db, current_user.id, art, parameter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _job_status(job)
+
+@router.get("/jobs/{job_id}")
+def get_export_job(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    return _job_status(_eigener_job(db, job_id, current_user))
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_read_db)):
+    """Fertige Datei; Range-Anfragen werden für fortgesetzte Downloads unterstützt"""
+    job = _eigener_job(db, job_id, current_user)
+    if job.status != "fertig" or not job.datei or not os.path.exists(job.datei):
+        raise HTTPException(status_code=409, detail=f"Export-Job ist nicht fertig ({job.status})")
+    return FileResponse(job.datei, media_type=job.media_type, filename=job.dateiname)
+
+@router.delete("/jobs/{job_id}", status_code=204)
+def delete_export_job(job_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    job = _eigener_job(db, job_id, current_user)
+    if job.status == "laeuft":
+        raise HTTPException(status_code=409, detail="Export-Job läuft noch")
+    if job.datei and os.path.exists(job.datei):
+        os.remove(job.datei)
+    db.delete(job)
+    db.commit()
+
+# Formatnamen der ersten Version ohne Tool-Suffix gehören zur Erbfolge
+_ERBFOLGE_FORMATE = ("csv", "pdf", "gedcom")
+
+
+async def _exportiere(tool: str, format: str, data: dict) -> Response:
+    try:
+        exporter = exporter_fuer(tool, format)
+    except KeyError:
         raise HTTPException(status_code=400, detail="Unbekanntes Exportformat")
+    headers = {"Content-Disposition": f"attachment; filename={exporter.dateiname}"}
+    try:
+        strom = exporter.strom(data)
+        if strom is not None:
+            return StreamingResponse(strom, media_type=exporter.media_type, headers=headers)
+        content = await exporter.erzeuge(data)
+    except ExportNichtVerfuegbar as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return Response(content, media_type=exporter.media_type, headers=headers)
+
+@router.get("/formate")
+def list_formate():
+    return formate()
+
+@router.post("/{tool}/{format}")
+async def export_tool(tool: str, format: str, data: dict = Body(...)):
+    return await _exportiere(tool, format, data)
+
+@router.post("/{format}")
+async def export_file(format: str, data: dict = Body(...)):
+    """Alte Formatnamen: csv, pdf, gedcom (Erbfolge) und <format>-<tool>"""
+    if format in _ERBFOLGE_FORMATE:
+        return await _exportiere("erbfolge", format, data)
+    format, _, tool = format.partition("-")
+    return await _exportiere(tool, format, data)
@@ -0,0 +1,28 @@
+from typing import Any, Dict
+
+from backend.export.registry import Exporter, registriere
+
+
+class PdfExporter(Exporter):
+    """Rendered in the PDF pool (backend.workers.pdf); the layout is named after the tool"""
+    format = "pdf"
+    media_type = "application/pdf"
+
+    async def erzeuge(self, data: Dict[str, Any]) -> bytes:
+        from backend.workers.pdf import rendere_pdf
+        return await rendere_pdf(self.tool, data)
+
+
+@registriere
+class ErbfolgePdf(PdfExporter):
+    tool = "erbfolge"
+
+
+@registriere
+class ErbpachtzinsPdf(PdfExporter):
+    tool = "erbpachtzins"
+
+
+@registriere
+class GnotkgPdf(PdfExporter):
+    tool = "gnotkg"
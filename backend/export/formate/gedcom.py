@@ -0,0 +1,22 @@
+from typing import Any, Dict, Iterator
+
+from backend.export.registry import Exporter, registriere
+from backend.tools.gedcom import write_gedcom_stream
+
+
+@registriere
+class ErbfolgeGedcom(Exporter):
+    tool = "erbfolge"
+    format = "gedcom"
+    media_type = "text/plain; charset=utf-8"
+    endung = "ged"
+
+    def strom(self, data: Dict[str, Any]) -> Iterator[str]:
+        return write_gedcom_stream(
+            data.get("erben", []),
+            data.get("erblasserName") or "Erblasser",
+            data.get("ergebnisse") or {}
+        )
+
+    async def erzeuge(self, data: Dict[str, Any]) -> bytes:
+        return "".join(self.strom(data)).encode("utf-8")
@@ -0,0 +1,104 @@
+from abc import abstractmethod
+from typing import Any, Dict, List
+import csv
+import io
+
+from backend.export.registry import Exporter, ExportNichtVerfuegbar, registriere
+
+
+def erbfolge_zeilen(data: Dict[str, Any]) -> List[List[Any]]:
+    ergebnisse = data.get("ergebnisse", {})
+    zeilen = [["Erblasser", data.get("erblasserName")], ["Name", "Beziehung", "Erbquote (%)"]]
+    for erbe in data.get("erben", []):
+        zeilen.append([erbe.get("name"), erbe.get("beziehung"), f"{ergebnisse.get(erbe['id'], 0):.2f}"])
+    return zeilen
+
+
+def erbpachtzins_zeilen(data: Dict[str, Any]) -> List[List[Any]]:
+    return [
+        ["Aktueller Zins (€)", data.get("aktueller_zins")],
+        ["Alter Index", data.get("alter_index")],
+        ["Neuer Index", data.get("neuer_index")],
+        ["Neuer Zins (€)", data.get("neuer_zins")],
+    ]
+
+
+def gnotkg_zeilen(data: Dict[str, Any]) -> List[List[Any]]:
+    return [
+        ["Geschäftswert (€)", data.get("geschaeftswert")],
+        ["Vorgangsart", data.get("vorgangsart")],
+        ["Gebühr (€)", data.get("gebuehr")],
+    ]
+
+
+class CsvExporter(Exporter):
+    format = "csv"
+    media_type = "text/csv"
+
+    @abstractmethod
+    def zeilen(self, data: Dict[str, Any]) -> List[List[Any]]:
+        """Rows of the table, one list of cells each"""
+
+    async def erzeuge(self, data: Dict[str, Any]) -> bytes:
+        output = io.StringIO()
+        csv.writer(output, delimiter=';').writerows(self.zeilen(data))
+        return output.getvalue().encode("utf-8")
+
+
+class XlsxExporter(Exporter):
+    """Same rows as the CSV export in one worksheet; needs the optional openpyxl"""
+    format = "xlsx"
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    @abstractmethod
+    def zeilen(self, data: Dict[str, Any]) -> List[List[Any]]:
+        """Rows of the table, one list of cells each"""
+
+    async def erzeuge(self, data: Dict[str, Any]) -> bytes:
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ExportNichtVerfuegbar("XLSX-Export benötigt openpyxl")
+        mappe = Workbook(write_only=True)
+        blatt = mappe.create_sheet(self.tool)
+        for zeile in self.zeilen(data):
+            blatt.append(zeile)
+        output = io.BytesIO()
+        mappe.save(output)
+        return output.getvalue()
+
+
+@registriere
+class ErbfolgeCsv(CsvExporter):
+    tool = "erbfolge"
+    zeilen = staticmethod(erbfolge_zeilen)
+
+
+@registriere
+class ErbpachtzinsCsv(CsvExporter):
+    tool = "erbpachtzins"
+    zeilen = staticmethod(erbpachtzins_zeilen)
+
+
+@registriere
+class GnotkgCsv(CsvExporter):
+    tool = "gnotkg"
+    zeilen = staticmethod(gnotkg_zeilen)
+
+
+@registriere
+class ErbfolgeXlsx(XlsxExporter):
+    tool = "erbfolge"
+    zeilen = staticmethod(erbfolge_zeilen)
+
+
+@registriere
+class ErbpachtzinsXlsx(XlsxExporter):
+    tool = "erbpachtzins"
+    zeilen = staticmethod(erbpachtzins_zeilen)
+
+
+@registriere
+class GnotkgXlsx(XlsxExporter):
+    tool = "gnotkg"
+    zeilen = staticmethod(gnotkg_zeilen)
@@ -0,0 +1,53 @@
+from typing import Dict, Iterator, List, Tuple
+import csv
+import io
+from sqlalchemy import select
+
+from backend.config import settings
+from backend.database.db import read_engine
+from backend.models.erbfolge import Erbfolge
+from backend.models.erbpachtzins import Erbpachtzins
+from backend.models.gnotkg import GNotKG
+
+# Tool -> (Modell, exportierte Spalten, Kopfzeile)
+HISTORIEN: Dict[str, Tuple[type, List[str], List[str]]] = {
+    "erbfolge": (
+        Erbfolge, ["id", "erblasser", "vermoegenswert", "ergebnis"],
+        ["ID", "Erblasser", "Vermögenswert (€)", "Ergebnis"]
+    ),
+    "erbpachtzins": (
+        Erbpachtzins, ["id", "aktueller_zins", "alter_index", "neuer_index", "neuer_zins"],
+        ["ID", "Aktueller Zins (€)", "Alter Index", "Neuer Index", "Neuer Zins (€)"]
+    ),
+    "gnotkg": (
+        GNotKG, ["id", "geschaeftswert", "vorgangsart", "gebuehr"],
+        ["ID", "Geschäftswert (€)", "Vorgangsart", "Gebühr (€)"]
+    ),
+}
+
+
+def historie_csv(tool: str, user_id: int, zeilen_je_block: int = 0, bind=None) -> Iterator[bytes]:
+    """
+    Streams the calculation history of a user as CSV. Rows come from a
+    server-side cursor in blocks of ``zeilen_je_block`` and each block is
+    encoded and yielded on its own, so memory use does not grow with the
+    number of rows. Uses its own connection because the generator outlives
+    the request's session.
+    """
+    modell, spalten, kopf = HISTORIEN[tool]
+    zeilen_je_block = zeilen_je_block or settings.EXPORT_ZEILEN_JE_BLOCK
+    tabelle = modell.__table__
+    abfrage = select(*(tabelle.c[s] for s in spalten)).where(tabelle.c.user_id == user_id).order_by(tabelle.c.id)
+    puffer = io.StringIO()
+    writer = csv.writer(puffer, delimiter=';')
+    writer.writerow(kopf)
+    with (bind or read_engine).connect() as conn:
+        ergebnis = conn.execution_options(stream_results=True, yield_per=zeilen_je_block).execute(abfrage)
+        for block in ergebnis.partitions():
+            writer.writerows(block)
+            yield puffer.getvalue().encode("utf-8")
+            puffer.seek(0)
+            puffer.truncate()
+    rest = puffer.getvalue()
+    if rest:
+        yield rest.encode("utf-8")
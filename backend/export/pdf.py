@@ -0,0 +1,93 @@
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from fpdf import FPDF
+
+# Core fonts of FPDF only cover Latin-1
+_ERSETZUNGEN = {"€": "EUR", "„": '"', "“": '"', "”": '"', "‚": "'", "‘": "'", "’": "'", "–": "-", "—": "-", "…": "..."}
+
+# (Layout, Daten) -> ein PDF
+PdfAuftrag = Tuple[str, Dict[str, Any]]
+
+
+def _latin1(text: str) -> str:
+    for zeichen, ersatz in _ERSETZUNGEN.items():
+        text = text.replace(zeichen, ersatz)
+    return text.encode("latin-1", "replace").decode("latin-1")
+
+
+def _zeilen(pdf: "FPDF", zeilen: Sequence[str]) -> None:
+    for zeile in zeilen:
+        pdf.cell(0, 10, _latin1(zeile), ln=True)
+
+
+def _erbfolge(pdf: "FPDF", daten: Dict[str, Any]) -> None:
+    ergebnisse = daten.get("ergebnisse", {})
+    _zeilen(pdf, [f"Erbfolge-Berechnung für {daten.get('erblasserName')}", "", "Name        Beziehung        Erbquote (%)"])
+    _zeilen(pdf, [
+        f"{erbe.get('name','')}        {erbe.get('beziehung','')}        {ergebnisse.get(erbe['id'], 0):.2f}"
+        for erbe in daten.get("erben", [])
+    ])
+
+
+def _erbpachtzins(pdf: "FPDF", daten: Dict[str, Any]) -> None:
+    _zeilen(pdf, [
+        "Erbpachtzins-Berechnung",
+        f"Aktueller Zins: {daten.get('aktueller_zins')} €",
+        f"Alter Index: {daten.get('alter_index')}",
+        f"Neuer Index: {daten.get('neuer_index')}",
+        f"Neuer Zins: {daten.get('neuer_zins')} €",
+    ])
+
+
+def _gnotkg(pdf: "FPDF", daten: Dict[str, Any]) -> None:
+    _zeilen(pdf, [
+        "GNotKG-Berechnung",
+        f"Geschäftswert: {daten.get('geschaeftswert')} €",
+        f"Vorgangsart: {daten.get('vorgangsart')}",
+        f"Gebühr: {daten.get('gebuehr')} €",
+    ])
+
+
+def _text(pdf: "FPDF", daten: Dict[str, Any]) -> None:
+    # Fließtext, Absätze durch Leerzeilen getrennt
+    if daten.get("titel"):
+        pdf.set_font("Arial", "B", size=14)
+        pdf.cell(0, 10, _latin1(daten["titel"]), ln=True)
+        pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 6, _latin1(daten.get("text", "")))
+
+
+LAYOUTS: Dict[str, Callable[["FPDF", Dict[str, Any]], None]] = {
+    "erbfolge": _erbfolge,
+    "erbpachtzins": _erbpachtzins,
+    "gnotkg": _gnotkg,
+    "text": _text,
+}
+
+
+def rendere_pdf(layout: str, daten: Dict[str, Any]) -> bytes:
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unbekanntes PDF-Layout: {layout}")
+    # Imported on first use, API processes that never render don't load FPDF
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    LAYOUTS[layout](pdf, daten)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def rendere_pdf_batch(auftraege: List[PdfAuftrag]) -> List[bytes]:
+    """Renders several reports in one call (one task per batch in the PDF pool)"""
+    return [rendere_pdf(layout, daten) for layout, daten in auftraege]
+
+
+def initialisiere_pdf_worker() -> None:
+    """
+    Pool initializer: renders every layout once so font metrics, modules
+    and code paths are loaded before the first real request arrives
+    """
+    for layout in LAYOUTS:
+        rendere_pdf(layout, {"titel": "x", "text": "x", "erben": []})
+
@@ -0,0 +1,79 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Union
+import importlib
+import pkgutil
+import threading
+
+
+class Exporter(ABC):
+    """
+    Base class for one export, a (tool, format) pair.
+
+    Subclasses set ``tool``, ``format``, ``media_type`` and ``endung`` and
+    implement ``erzeuge``; ``registriere`` instantiates the class, so an
+    incomplete exporter fails at import. Text formats that can be written
+    piecewise also implement ``strom``; the route then streams instead of
+    buffering. Heavy libraries are imported inside ``erzeuge`` so they are
+    only loaded when the format is actually requested.
+    """
+    tool: str = ""
+    format: str = ""
+    media_type: str = "application/octet-stream"
+    endung: str = ""
+
+    @property
+    def dateiname(self) -> str:
+        return f"{self.tool}.{self.endung or self.format}"
+
+    @abstractmethod
+    async def erzeuge(self, data: Dict[str, Any]) -> bytes:
+        """The whole export as bytes"""
+
+    def strom(self, data: Dict[str, Any]) -> Optional[Iterator[Union[str, bytes]]]:
+        """Chunks of the export, or None if the format is only built as a whole"""
+        return None
+
+
+class ExportNichtVerfuegbar(Exception):
+    """The backend library of a format is not installed"""
+
+
+_exporter: Dict[Tuple[str, str], Exporter] = {}
+_geladen = False
+_lock = threading.Lock()
+
+
+def registriere(cls: Type[Exporter]) -> Type[Exporter]:
+    """Class decorator: makes an exporter available under (tool, format)"""
+    _exporter[(cls.tool, cls.format)] = cls()
+    return cls
+
+
+def _lade_formate() -> None:
+    # Every module in backend/export/formate registers its exporters on import
+    global _geladen
+    if _geladen:
+        return
+    with _lock:
+        if not _geladen:
+            from backend.export import formate
+            for modul in pkgutil.iter_modules(formate.__path__):
+                importlib.import_module(f"{formate.__name__}.{modul.name}")
+            _geladen = True
+
+
+def exporter_fuer(tool: str, format: str) -> Exporter:
+    _lade_formate()
+    exporter = _exporter.get((tool, format))
+    if exporter is None:
+        raise KeyError((tool, format))
+    return exporter
+
+
+def formate() -> Dict[str, List[str]]:
+    """Available formats per tool"""
+    _lade_formate()
+    ergebnis: Dict[str, List[str]] = {}
+    for tool, format in sorted(_exporter):
+        ergebnis.setdefault(tool, []).append(format)
+    return ergebnis
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database.db import engine, Base
-from routes import erbfolge, miteigentum, history, erbpachtzins, textbaustein, fragebogen, gnotkg
+from backend.database.db import engine, Base
+from backend.database.migrationen import fuehre_migrationen_aus
+from backend.models.textbaustein import erstelle_suchindex
+from routes import erbfolge, miteigentum, history, erbpachtzins, textbaustein, fragebogen, gnotkg, statistik
 from export import exporter
 from feedback import email
 from auth import users
@@ -16,8 +18,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@app.on_event("startup")
+def init_database():
+    """Tabellen anlegen, Migrationen und Suchindex; vor allen anderen Startup-Hooks"""
+    Base.metadata.create_all(bind=engine)
+    fuehre_migrationen_aus(engine)
+    erstelle_suchindex(engine)
+
+@app.on_event("startup")
+def resume_export_jobs():
+    from backend.workers.jobs import setze_jobs_fort
+    setze_jobs_fort()
+
+@app.on_event("startup")
+def start_protokoll():
+    from backend.workers.protokoll import protokoll
+    protokoll.starte()
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    from backend.workers.jobs import stoppe_jobs
+    from backend.workers.pool import shutdown_pools
+    from backend.workers.protokoll import protokoll
+    stoppe_jobs()
+    # Noch gepufferte Berechnungen schreiben, bevor die Engines geschlossen werden
+    protokoll.stoppe()
+    shutdown_pools()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    from backend.database.db import async_engine, async_read_engine
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 
 # Auth
 app.include_router(users.router)
@@ -31,6 +63,9 @@ app.include_router(textbaustein.router, prefix="/tools/textbaustein", tags=["too
 app.include_router(fragebogen.router, prefix="/tools/fragebogen", tags=["tools"])
 app.include_router(gnotkg.router, prefix="/tools/gnotkg", tags=["tools"])
 
+# Auswertungen
+app.include_router(statistik.router, prefix="/statistik", tags=["statistik"])
+
 # Export
 app.include_router(exporter.router, prefix="/export", tags=["export"])
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 
@@ -10,6 +11,13 @@ class Erbfolge(Base):
     erblasser = Column(String)
     vermoegenswert = Column(Float)
     ergebnis = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="erbfolge_berechnungen")
-    erbpachtzins_berechnungen = relationship("Erbpachtzins", back_populates="user")
+    user = relationship("User", backref="erbfolge_berechnungen")
+
+    __table_args__ = (
+        # Keyset-Seiten der Historie: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_erbfolge_user_id_id", "user_id", "id"),
+        # Statistik: Zeitraum über created_at, gruppiert ohne Zugriff auf die Tabelle
+        Index("ix_erbfolge_created_at", "created_at", "user_id", "vermoegenswert"),
+    )
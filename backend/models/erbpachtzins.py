@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 
@@ -10,4 +11,12 @@ class Erbpachtzins(Base):
     alter_index = Column(Float)
     neuer_index = Column(Float)
     neuer_zins = Column(Float)
-    user = relationship("User", back_populates="erbpachtzins_berechnungen")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    user = relationship("User", backref="erbpachtzins_berechnungen")
+
+    __table_args__ = (
+        # Keyset-Seiten der Historie: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_erbpachtzins_user_id_id", "user_id", "id"),
+        # Statistik: Zeitraum über created_at, gruppiert ohne Zugriff auf die Tabelle
+        Index("ix_erbpachtzins_created_at", "created_at", "user_id"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from datetime import datetime
+from ..database.db import Base
+
+class ExportJob(Base):
+    __tablename__ = "export_job"
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    art = Column(String, nullable=False)  # z.B. "historie-csv", "pdf-batch"
+    parameter = Column(Text)  # JSON
+    status = Column(String, nullable=False, default="wartend")  # wartend, laeuft, fertig, fehler
+    erledigt = Column(Integer, default=0)
+    gesamt = Column(Integer, default=0)
+    datei = Column(String)
+    dateiname = Column(String)
+    media_type = Column(String)
+    groesse = Column(Integer)
+    fehler = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
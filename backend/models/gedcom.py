@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from datetime import datetime
+from ..database.db import Base
+
+class GedcomBaum(Base):
+    __tablename__ = "gedcom_baum"
+    id = Column(String, primary_key=True)  # SHA-256 des Dateiinhalts
+    # Je Benutzer gespeichert: Stammbäume sind nur für den Hochladenden sichtbar
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    erblasser_name = Column(String)
+    daten = Column(Text)  # Parse-Ergebnis als JSON
+    groesse = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
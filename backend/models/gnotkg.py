@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 
@@ -9,4 +10,12 @@ class GNotKG(Base):
     geschaeftswert = Column(Float)
     vorgangsart = Column(String)
     gebuehr = Column(Float)
-    user = relationship("User", back_populates="gnotkg_berechnungen")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    user = relationship("User", backref="gnotkg_berechnungen")
+
+    __table_args__ = (
+        # Keyset-Seiten der Historie: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_gnotkg_user_id_id", "user_id", "id"),
+        # Statistik: Zeitraum über created_at, gruppiert ohne Zugriff auf die Tabelle
+        Index("ix_gnotkg_created_at", "created_at", "user_id", "gebuehr"),
+    )
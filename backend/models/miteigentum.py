@@ -1,5 +1,6 @@
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 
@@ -11,5 +12,13 @@ class Miteigentum(Base):
     objekt = Column(String)
     anteil = Column(Float)
     ergebnis = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="miteigentum_berechnungen")
+    user = relationship("User", backref="miteigentum_berechnungen")
+
+    __table_args__ = (
+        # Keyset-Seiten der Historie: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_miteigentum_user_id_id", "user_id", "id"),
+        # Statistik: Zeitraum über created_at, gruppiert ohne Zugriff auf die Tabelle
+        Index("ix_miteigentum_created_at", "created_at", "user_id"),
+    )
@@ -1,10 +1,55 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, inspect, text
 from sqlalchemy.orm import relationship
 from ..database.db import Base
 
 class Textbaustein(Base):
     __tablename__ = "textbaustein"
-    id = Column(String, primary_key=True, index=True)
+    # INTEGER PRIMARY KEY is the rowid itself, so VACUUM never renumbers it;
+    # key of the FTS index. Rows are still identified by id in the ORM.
+    nr = Column(Integer, primary_key=True)
+    id = Column(String, unique=True, index=True, nullable=False)
     kategorie = Column(String)
     titel = Column(String)
     text = Column(Text)
+    # Incremented on every update, keys the compiled template cache
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"primary_key": [id]}
+
+
+class TextbausteinStand(Base):
+    """Version of the whole library, one row; bumped in the transaction of every change"""
+    __tablename__ = "textbaustein_stand"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+
+# FTS5 index over titel and text, an external-content table on nr of
+# textbaustein, kept in sync by triggers (SQLite only)
+TEXTBAUSTEIN_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS textbaustein_fts USING fts5(
+        titel, text, content='textbaustein', content_rowid='nr', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS textbaustein_fts_ai AFTER INSERT ON textbaustein BEGIN
+        INSERT INTO textbaustein_fts(rowid, titel, text) VALUES (new.nr, new.titel, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS textbaustein_fts_ad AFTER DELETE ON textbaustein BEGIN
+        INSERT INTO textbaustein_fts(textbaustein_fts, rowid, titel, text) VALUES ('delete', old.nr, old.titel, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS textbaustein_fts_au AFTER UPDATE ON textbaustein BEGIN
+        INSERT INTO textbaustein_fts(textbaustein_fts, rowid, titel, text) VALUES ('delete', old.nr, old.titel, old.text);
+        INSERT INTO textbaustein_fts(rowid, titel, text) VALUES (new.nr, new.titel, new.text);
+    END""",
+]
+
+
+def erstelle_suchindex(engine) -> None:
+    """Creates the FTS5 index and its triggers if missing; a new index is filled from existing rows"""
+    if engine.dialect.name != "sqlite":
+        return
+    neu = not inspect(engine).has_table("textbaustein_fts")
+    with engine.begin() as conn:
+        for ddl in TEXTBAUSTEIN_FTS_DDL:
+            conn.execute(text(ddl))
+        if neu:
+            conn.execute(text("INSERT INTO textbaustein_fts(textbaustein_fts) VALUES ('rebuild')"))
@@ -1,14 +1,26 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from backend.database.db import get_db
+import asyncio
+import json
+from backend.config import settings
+from backend.database.seiten import lade_seite
+from backend.database.db import get_async_db, get_async_read_db, AsyncSessionLocal
 from backend.models.erbfolge import Erbfolge
 from backend.auth.users import get_current_user, User
-from backend.tools.erbfolge import berechne_erbfolge
+from backend.tools.erbfolge import berechne_erbfolge, berechne_erbfolge_block, berechne_szenarien
+from backend.tools.gedcom import apply_person_overrides
+from backend.cache.gedcom import gedcom_hash, gedcom_hasher, lade_baum, speichere_baum
+from backend.workers.pool import get_process_pool
+from backend.workers.protokoll import protokoll
 
 router = APIRouter()
 
+# Spalten der Historienseiten
+HISTORIE_SPALTEN = ["id", "erblasser", "vermoegenswert", "ergebnis"]
+
 @router.get("/health-check")
 async def health_check():
     """Simple endpoint to check if the backend is running"""
@@ -18,42 +30,191 @@ async def health_check():
 async def calculate_erbfolge(
     erblasser: str = Body(...),
     vermoegenswert: float = Body(...),
-    erben: list = Body(...),
+    erben: Optional[list] = Body(None),
+    baum_id: Optional[str] = Body(None),
+    sofort: bool = Body(False),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Gespeicherter GEDCOM-Baum: erben enthält dann nur Korrekturen je Person-id
+    if baum_id:
+        baum = await lade_baum(db, current_user.id, baum_id)
+        if baum is None:
+            raise HTTPException(status_code=404, detail="GEDCOM-Baum nicht gefunden")
+        erben = apply_person_overrides(baum["personen"], erben or [])
+    elif erben is None:
+        raise HTTPException(status_code=400, detail="erben oder baum_id erforderlich")
     # Neue Logik: strukturierte Erbenliste
     ergebnis = berechne_erbfolge(erblasser, vermoegenswert, erben)
-    # Speicherung
-    calculation = Erbfolge(
-        user_id=current_user.id,
-        erblasser=erblasser,
-        vermoegenswert=vermoegenswert,
-        ergebnis=str(ergebnis["ergebnisse"])
-    )
-    db.add(calculation)
-    db.commit()
-    db.refresh(calculation)
+    # Speicherung im Hintergrund, mit sofort=true direkt und mit id
+    werte = {
+        "user_id": current_user.id,
+        "erblasser": erblasser,
+        "vermoegenswert": vermoegenswert,
+        "ergebnis": str(ergebnis["ergebnisse"])
+    }
+    if sofort:
+        calculation = await protokoll.schreibe_sofort(db, Erbfolge, werte)
+        return {**ergebnis, "id": calculation.id}
+    protokoll.schreibe(Erbfolge, werte)
     return ergebnis
 
-@router.get("/history", response_model=List[dict])
+@router.post("/calculate-batch")
+async def calculate_erbfolge_batch(
+    nachlaesse: List[dict] = Body(...),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Berechnet viele Nachlässe parallel im Prozess-Pool, in Blöcken von
+    BATCH_NACHLAESSE_JE_AUFGABE je Aufgabe.
+
+    Die Ergebnisse werden in Fertigstellungsreihenfolge als NDJSON gestreamt
+    (mit ``index`` des Nachlasses). Jeder fertige Block wird in einer
+    Transaktion gespeichert, bevor seine Zeilen gesendet werden; bricht der
+    Client ab, bleiben die bis dahin fertigen Blöcke gespeichert. Die letzte
+    Zeile nennt die Zahl der gespeicherten Berechnungen.
+    """
+    user_id = current_user.id
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    groesse = max(1, settings.BATCH_NACHLAESSE_JE_AUFGABE)
+    nummeriert = list(enumerate(nachlaesse))
+    bloecke = [nummeriert[i:i + groesse] for i in range(0, len(nummeriert), groesse)]
+
+    async def speichere(zeilen: List[dict]) -> Optional[str]:
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(Erbfolge.__table__.insert(), zeilen)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                return str(e)
+        return None
+
+    async def stream():
+        aufgaben = [loop.run_in_executor(pool, berechne_erbfolge_block, block) for block in bloecke]
+        gespeichert = 0
+        try:
+            for aufgabe in asyncio.as_completed(aufgaben):
+                try:
+                    ergebnisse = await aufgabe
+                except Exception as e:
+                    # Der Pool selbst ist ausgefallen, nicht ein einzelner Nachlass
+                    yield json.dumps({"error": str(e)}) + "\n"
+                    continue
+                zeilen = [{
+                    "user_id": user_id,
+                    "erblasser": ergebnis["erblasser"],
+                    "vermoegenswert": ergebnis["vermoegenswert"],
+                    "ergebnis": str(ergebnis["ergebnisse"])
+                } for _, ergebnis, fehler in ergebnisse if fehler is None]
+                if zeilen:
+                    fehler_speichern = await speichere(zeilen)
+                    if fehler_speichern is None:
+                        gespeichert += len(zeilen)
+                    else:
+                        yield json.dumps({
+                            "error": f"Speichern fehlgeschlagen: {fehler_speichern}",
+                            "indizes": [i for i, _, fehler in ergebnisse if fehler is None]
+                        }) + "\n"
+                for index, ergebnis, fehler in ergebnisse:
+                    if fehler is not None:
+                        yield json.dumps({"index": index, "error": fehler}) + "\n"
+                    else:
+                        yield json.dumps({"index": index, **ergebnis}) + "\n"
+            yield json.dumps({"gespeichert": gespeichert}) + "\n"
+        finally:
+            # Abbruch durch den Client: noch nicht gestartete Blöcke verwerfen
+            for aufgabe in aufgaben:
+                aufgabe.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/scenarios")
+async def calculate_erbfolge_scenarios(
+    erblasser: str = Body(...),
+    vermoegenswert: float = Body(...),
+    erben: list = Body(...),
+    szenarien: List[dict] = Body(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Basisberechnung plus Was-wäre-wenn-Varianten in einer Antwort"""
+    try:
+        return berechne_szenarien(erblasser, vermoegenswert, erben, szenarien)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/history")
 async def get_erbfolge_history(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    calculations = db.query(Erbfolge).filter(Erbfolge.user_id == current_user.id).all()
-    return calculations
+    """Seite der eigenen Berechnungen, neueste zuerst; weiter mit cursor=naechster_cursor"""
+    return await lade_seite(db, Erbfolge, HISTORIE_SPALTEN, current_user.id, cursor, limit)
 
 @router.post("/parse-gedcom")
 async def parse_gedcom(
     file_content: str = Body(...),
-    current_user: Optional[User] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Parse GEDCOM file and return structured data"""
     from backend.tools.gedcom import parse_gedcom_content
+    inhalt = file_content.encode("utf-8")
+    baum_id = gedcom_hash(inhalt)
+    cached = await lade_baum(db, current_user.id, baum_id)
+    if cached is not None:
+        return cached
     try:
         result = parse_gedcom_content(file_content)
-        return result
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"GEDCOM parsing failed: {str(e)}")
+    return await speichere_baum(db, current_user.id, baum_id, result, len(inhalt))
+
+@router.post("/parse-gedcom-upload")
+async def parse_gedcom_upload(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Parse an uploaded GEDCOM file chunk by chunk without buffering it as a whole"""
+    from backend.tools.gedcom import GedcomStreamParser, GEDCOM_CHUNK_SIZE
+    # First pass only hashes, a known file is served from the cache
+    hasher = gedcom_hasher()
+    groesse = 0
+    while True:
+        chunk = await file.read(GEDCOM_CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+        groesse += len(chunk)
+    baum_id = hasher.hexdigest()
+    cached = await lade_baum(db, current_user.id, baum_id)
+    if cached is not None:
+        return cached
+    await file.seek(0)
+    parser = GedcomStreamParser()
+    try:
+        while True:
+            chunk = await file.read(GEDCOM_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+        result = parser.close()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"GEDCOM parsing failed: {str(e)}")
+    return await speichere_baum(db, current_user.id, baum_id, result, groesse)
+
+@router.get("/gedcom/{baum_id}")
+async def get_gedcom_baum(
+    baum_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Previously parsed GEDCOM tree of the current user by its content hash"""
+    baum = await lade_baum(db, current_user.id, baum_id)
+    if baum is None:
+        raise HTTPException(status_code=404, detail="GEDCOM-Baum nicht gefunden")
+    return baum
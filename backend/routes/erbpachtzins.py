@@ -1,39 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.database.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+import numpy as np
+from backend.database.seiten import lade_seite
+from backend.database.db import get_async_db, get_async_read_db
 from backend.models.erbpachtzins import Erbpachtzins
-from backend.auth.users import get_current_user, User
-from backend.tools.erbpachtzins import berechne_erbpachtzins
+from backend.auth.users import get_current_user, get_current_admin_user, User
+from backend.config import settings
+from backend.tools.erbpachtzins import (
+    berechne_erbpachtzins, berechne_erbpachtzins_portfolio, berechne_schwellen_anpassung,
+    lade_vpi_reihe, VPIReihe
+)
+from backend.workers.protokoll import protokoll
 
 router = APIRouter()
 
+# Spalten der Historienseiten
+HISTORIE_SPALTEN = ["id", "aktueller_zins", "alter_index", "neuer_index", "neuer_zins"]
+
 @router.post("/calculate")
 async def calculate_erbpachtzins(
     aktueller_zins: float,
     alter_index: float,
     neuer_index: float,
+    sofort: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         ergebnis = berechne_erbpachtzins(aktueller_zins, alter_index, neuer_index)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    eintrag = Erbpachtzins(
-        user_id=current_user.id,
-        aktueller_zins=aktueller_zins,
-        alter_index=alter_index,
-        neuer_index=neuer_index,
-        neuer_zins=ergebnis["neuer_zins"]
-    )
-    db.add(eintrag)
-    db.commit()
-    db.refresh(eintrag)
+    werte = {
+        "user_id": current_user.id,
+        "aktueller_zins": aktueller_zins,
+        "alter_index": alter_index,
+        "neuer_index": neuer_index,
+        "neuer_zins": ergebnis["neuer_zins"]
+    }
+    if sofort:
+        eintrag = await protokoll.schreibe_sofort(db, Erbpachtzins, werte)
+        return {**ergebnis, "id": eintrag.id}
+    protokoll.schreibe(Erbpachtzins, werte)
+    return ergebnis
+
+@router.post("/calculate-portfolio")
+async def calculate_erbpachtzins_portfolio(
+    vertraege: List[dict] = Body(...),
+    vpi: Dict[str, float] = Body(...),
+    ziel_monat: Optional[str] = Body(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Passt ein ganzes Portfolio an eine neue VPI-Veröffentlichung an
+    (vpi: {"YYYY-MM": Wert}) und speichert alle Zeilen in einer Transaktion.
+    """
+    try:
+        ergebnis = berechne_erbpachtzins_portfolio(vertraege, VPIReihe.aus_dict(vpi), ziel_monat)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    zeilen = [
+        {
+            "user_id": current_user.id,
+            "aktueller_zins": v["aktueller_zins"],
+            "alter_index": v["alter_index"],
+            "neuer_index": v["neuer_index"],
+            "neuer_zins": v["neuer_zins"]
+        }
+        for v in ergebnis["vertraege"]
+    ]
+    if zeilen:
+        await db.execute(Erbpachtzins.__table__.insert(), zeilen)
+    await db.commit()
     return ergebnis
 
+@router.put("/vpi", dependencies=[Depends(get_current_admin_user)])
+async def update_vpi(vpi: Dict[str, float] = Body(...)):
+    """Ersetzt die gespeicherte VPI-Reihe ({"YYYY-MM": Wert})"""
+    try:
+        reihe = VPIReihe.aus_dict(vpi)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    reihe.speichern(settings.VPI_DATEI)
+    return {"start": str(np.datetime64(reihe.start, "M")), "letzter_monat": reihe.letzter_monat, "monate": int(reihe.werte.size)}
+
+@router.post("/threshold-search")
+async def threshold_search(
+    vertraege: List[dict] = Body(..., embed=True),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Erster Monat, in dem die Schwelle der Wertsicherungsklausel je Vertrag
+    erreicht wird, und der daraus folgende Zins (gegen die gespeicherte VPI-Reihe)
+    """
+    try:
+        reihe = lade_vpi_reihe(settings.VPI_DATEI)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Keine VPI-Reihe hinterlegt")
+    try:
+        return {"vertraege": berechne_schwellen_anpassung(vertraege, reihe)}
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/history")
 async def get_erbpachtzins_history(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    return db.query(Erbpachtzins).filter(Erbpachtzins.user_id == current_user.id).all()
+    """Seite der eigenen Berechnungen, neueste zuerst; weiter mit cursor=naechster_cursor"""
+    return await lade_seite(db, Erbpachtzins, HISTORIE_SPALTEN, current_user.id, cursor, limit)
@@ -1,34 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.database.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date
+from backend.database.seiten import lade_seite
+from backend.database.db import get_async_db, get_async_read_db
 from backend.models.gnotkg import GNotKG
-from backend.auth.users import get_current_user, User
-from backend.tools.gnotkg import berechne_gnotkg
+from backend.auth.users import get_current_user, get_current_admin_user, User
+from backend.tools.gnotkg import berechne_gnotkg, berechne_gnotkg_batch
+from backend.tools.gebuehrentabellen import gebuehrentabellen
+from backend.workers.protokoll import protokoll
 
 router = APIRouter()
 
+# Spalten der Historienseiten
+HISTORIE_SPALTEN = ["id", "geschaeftswert", "vorgangsart", "gebuehr"]
+
 @router.post("/calculate")
 async def calculate_gnotkg(
     geschaeftswert: float,
     vorgangsart: str,
+    stichtag: Optional[date] = None,
+    sofort: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    ergebnis = berechne_gnotkg(geschaeftswert, vorgangsart)
-    eintrag = GNotKG(
-        user_id=current_user.id,
-        geschaeftswert=geschaeftswert,
-        vorgangsart=vorgangsart,
-        gebuehr=ergebnis["gebuehr"]
-    )
-    db.add(eintrag)
-    db.commit()
-    db.refresh(eintrag)
+    try:
+        ergebnis = berechne_gnotkg(geschaeftswert, vorgangsart, stichtag=stichtag)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    werte = {
+        "user_id": current_user.id,
+        "geschaeftswert": geschaeftswert,
+        "vorgangsart": vorgangsart,
+        "gebuehr": ergebnis["gebuehr"]
+    }
+    if sofort:
+        eintrag = await protokoll.schreibe_sofort(db, GNotKG, werte)
+        return {**ergebnis, "id": eintrag.id}
+    protokoll.schreibe(GNotKG, werte)
     return ergebnis
 
+@router.post("/calculate-batch")
+async def calculate_gnotkg_batch(
+    geschaeftswerte: List[float] = Body(...),
+    gebuehrensaetze: Optional[List[float]] = Body(None),
+    vorgangsarten: Optional[List[str]] = Body(None),
+    tabelle: str = Body("B"),
+    kreuzprodukt: bool = Body(False),
+    stichtag: Optional[date] = Body(None),
+    stichtage: Optional[List[date]] = Body(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bepreist viele Geschäftswerte in einem vektorisierten Aufruf, elementweise
+    oder mit ``kreuzprodukt`` als Matrix Geschäftswerte x Gebührensätze.
+    Mit ``stichtage`` (je Geschäftswert) gilt jeweils die Tabellenfassung am
+    Datum der Urkunde.
+    """
+    try:
+        gebuehren = berechne_gnotkg_batch(
+            geschaeftswerte, gebuehrensaetze, vorgangsarten, tabelle, kreuzprodukt,
+            stichtage if stichtage is not None else stichtag
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tabelle": tabelle, "gebuehren": gebuehren.tolist()}
+
+def tabellen_fassungen() -> dict:
+    """Geladene Tabellenfassungen je Tabelle mit Gültigkeitsbeginn"""
+    stand = gebuehrentabellen.stand()
+    return {
+        name: [v.gueltig_ab.isoformat() for v in versionen]
+        for name, versionen in stand.versionen.items()
+    }
+
+@router.get("/tabellen")
+async def list_gebuehrentabellen(current_user: User = Depends(get_current_user)):
+    """Geladene Tabellenfassungen mit Gültigkeitsbeginn"""
+    return tabellen_fassungen()
+
+@router.post("/tabellen/reload", dependencies=[Depends(get_current_admin_user)])
+async def reload_gebuehrentabellen():
+    """Tabellen sofort neu einlesen (andere Worker folgen beim nächsten Prüfintervall)"""
+    try:
+        gebuehrentabellen.neu_laden()
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Gebührentabellen fehlerhaft: {e}")
+    return tabellen_fassungen()
+
 @router.get("/history")
 async def get_gnotkg_history(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    return db.query(GNotKG).filter(GNotKG.user_id == current_user.id).all()
+    """Seite der eigenen Berechnungen, neueste zuerst; weiter mit cursor=naechster_cursor"""
+    return await lade_seite(db, GNotKG, HISTORIE_SPALTEN, current_user.id, cursor, limit)
@@ -1,62 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from backend.database.db import get_db
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import APIRouter, Depends, HTTPException
+from functools import lru_cache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.db import ToolHistory, get_async_db, get_async_read_db
+from backend.database.engine import insert_mit_konflikt
 from backend.auth.users import get_current_user
 
 router = APIRouter()
 
-def get_history_table(db: Session):
-    db.execute("""
-    CREATE TABLE IF NOT EXISTS tool_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        tool_id TEXT,
-        tool_name TEXT,
-        data TEXT,
-        last_accessed INTEGER
+
+@lru_cache(maxsize=None)
+def upsert_history(dialect: str):
+    """
+    Ein Statement: INSERT ... ON CONFLICT (user_id, tool_id) DO UPDATE.
+    Einmal je Dialekt gebaut, die Werte kommen als Parameter beim execute.
+    """
+    anweisung = insert_mit_konflikt(dialect, ToolHistory)
+    return anweisung.on_conflict_do_update(
+        index_elements=[ToolHistory.user_id, ToolHistory.tool_id],
+        set_={
+            "tool_name": anweisung.excluded.tool_name,
+            "data": anweisung.excluded.data,
+            "last_accessed": anweisung.excluded.last_accessed,
+        }
     )
-    """)
-    db.commit()
 
 @router.get("/history")
-def get_history(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    get_history_table(db)
-    result = db.execute(
-        "SELECT tool_id, tool_name, data, last_accessed FROM tool_history WHERE user_id = ? ORDER BY last_accessed DESC",
-        (current_user.id,)
+async def get_history(db: AsyncSession = Depends(get_async_read_db), current_user=Depends(get_current_user)):
+    # Nur Spalten aus ix_tool_history_zuletzt, die Tabelle selbst wird nicht gelesen
+    rows = await db.execute(
+        select(ToolHistory.tool_id, ToolHistory.tool_name, ToolHistory.data, ToolHistory.last_accessed)
+        .where(ToolHistory.user_id == current_user.id)
+        .order_by(ToolHistory.last_accessed.desc())
     )
-    rows = result.fetchall()
     return [
         {
-            "toolId": row[0],
-            "toolName": row[1],
-            "data": row[2],
-            "lastAccessed": row[3]
+            "toolId": row.tool_id,
+            "toolName": row.tool_name,
+            "data": row.data,
+            "lastAccessed": row.last_accessed
         } for row in rows
     ]
 
 @router.post("/history")
-def save_history(entry: dict, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    get_history_table(db)
-    # Upsert: falls vorhanden, update, sonst insert
-    tool_id = entry.get("toolId")
-    tool_name = entry.get("toolName")
-    data = entry.get("data")
-    last_accessed = entry.get("lastAccessed")
-    exists = db.execute(
-        "SELECT id FROM tool_history WHERE user_id = ? AND tool_id = ?",
-        (current_user.id, tool_id)
-    ).fetchone()
-    if exists:
-        db.execute(
-            "UPDATE tool_history SET tool_name = ?, data = ?, last_accessed = ? WHERE user_id = ? AND tool_id = ?",
-            (tool_name, data, last_accessed, current_user.id, tool_id)
-        )
-    else:
-        db.execute(
-            "INSERT INTO tool_history (user_id, tool_id, tool_name, data, last_accessed) VALUES (?, ?, ?, ?, ?)",
-            (current_user.id, tool_id, tool_name, data, last_accessed)
-        )
-    db.commit()
+async def save_history(entry: dict, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    if not entry.get("toolId"):
+        raise HTTPException(status_code=400, detail="toolId erforderlich")
+    await db.execute(upsert_history(db.bind.dialect.name), {
+        "user_id": current_user.id,
+        "tool_id": entry.get("toolId"),
+        "tool_name": entry.get("toolName"),
+        "data": entry.get("data"),
+        "last_accessed": entry.get("lastAccessed")
+    })
+    await db.commit()
     return {"status": "ok"}
@@ -1,37 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from backend.database.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from backend.database.seiten import lade_seite
+from backend.database.db import get_async_db, get_async_read_db
 from backend.models.miteigentum import Miteigentum
 from backend.auth.users import get_current_user, User
 from backend.tools.miteigentum import berechne_miteigentum
+from backend.workers.protokoll import protokoll
 
 router = APIRouter()
 
+# Spalten der Historienseiten
+HISTORIE_SPALTEN = ["id", "objekt", "anteil", "ergebnis"]
+
 @router.post("/calculate")
 async def calculate_miteigentum(
     objekt: str,
     anteil: float,
+    sofort: bool = True,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Dummy-Logik aus tools.miteigentum nutzen
     ergebnis = berechne_miteigentum(objekt, anteil)
-    calculation = Miteigentum(
-        user_id=current_user.id,
-        objekt=objekt,
-        anteil=anteil,
-        ergebnis=ergebnis["ergebnis"]
-    )
-    db.add(calculation)
-    db.commit()
-    db.refresh(calculation)
-    return calculation
+    werte = {
+        "user_id": current_user.id,
+        "objekt": objekt,
+        "anteil": anteil,
+        "ergebnis": ergebnis["ergebnis"]
+    }
+    # Die Antwort ist die gespeicherte Zeile samt id, daher standardmäßig sofort
+    if sofort:
+        return await protokoll.schreibe_sofort(db, Miteigentum, werte)
+    protokoll.schreibe(Miteigentum, werte)
+    return werte
 
-@router.get("/history", response_model=List[dict])
+@router.get("/history")
 async def get_miteigentum_history(
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    calculations = db.query(Miteigentum).filter(Miteigentum.user_id == current_user.id).all()
-    return calculations
+    """Seite der eigenen Berechnungen, neueste zuerst; weiter mit cursor=naechster_cursor"""
+    return await lade_seite(db, Miteigentum, HISTORIE_SPALTEN, current_user.id, cursor, limit)
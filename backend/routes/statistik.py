@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import date, datetime, time, timedelta
+from backend.database.db import get_async_read_db
+from backend.database.statistik import berechne_statistik
+from backend.auth.users import get_current_admin_user
+from backend.cache.statistik import lade_statistik
+
+router = APIRouter()
+
+@router.get("", dependencies=[Depends(get_current_admin_user)])
+async def get_statistik(
+    von: Optional[date] = None,
+    bis: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Nutzung je Tool und Benutzer, GNotKG-Gebühren und durchschnittliche
+    Erbfolge-Vermögenswerte je Monat, von/bis einschließlich. Die Zahlen
+    werden je Zeitfenster (STATISTIK_CACHE_SEKUNDEN) einmal berechnet.
+    """
+    if von is not None and bis is not None and bis < von:
+        raise HTTPException(status_code=400, detail="bis liegt vor von")
+    beginn = datetime.combine(von, time.min) if von else None
+    ende = datetime.combine(bis + timedelta(days=1), time.min) if bis else None
+    ergebnis = await lade_statistik((von, bis), lambda: berechne_statistik(db, beginn, ende))
+    return {"von": von, "bis": bis, **ergebnis}
@@ -1,19 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, File, Form, Header, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, func, or_, select, text as sql
 from sqlalchemy.orm import Session
-from typing import Optional
-from backend.database.db import get_db
+from typing import List, Optional
+from backend.database.db import get_db, get_read_db
+from backend.export.archiv import zip_strom
+from backend.config import settings
+from backend.workers.pdf import rendere_pdfs_sync
 from backend.models.textbaustein import Textbaustein
-from backend.tools.textbaustein import generiere_textbaustein, lade_textbausteine
+from backend.tools.textbaustein import fts_ausdruck, lese_platzhalter_zeilen, rendere_vorlagen, suchbegriffe
+from backend.cache.textbaustein import katalog, lade_vorlagen, vergiss_vorlage
 from backend.auth.users import get_current_user, User
+import json
+import re
 import uuid
 
 router = APIRouter()
 @router.get("/list")
-def list_textbausteine(kategorie: Optional[str] = None, db: Session = Depends(get_db)):
+def list_textbausteine(
+    response: Response,
+    kategorie: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Bausteine aus dem In-Process-Katalog; mit passendem If-None-Match
+    antwortet die Route nach einer Abfrage des Versionszählers mit 304
+    """
+    etag = katalog.etag(katalog.version(db), kategorie)
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"], eintraege = katalog.eintraege(db, kategorie)
+    return eintraege
+
+@router.get("/search")
+def search_textbausteine(
+    q: str,
+    kategorie: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Volltextsuche über Titel und Text (FTS5, BM25-Rang, Titeltreffer zählen
+    stärker) mit hervorgehobenem Ausschnitt; "Phrasen" und Präfixe (wort*).
+    Ohne FTS5 (PostgreSQL) wird per ILIKE gesucht, ohne Ausschnitt und Rang.
+    """
+    ausdruck = fts_ausdruck(q)
+    if not ausdruck:
+        raise HTTPException(status_code=400, detail="Leere Suchanfrage")
+    if db.bind.dialect.name != "sqlite":
+        return suche_ohne_fts(db, q, kategorie, limit, offset)
+    filter_kategorie = "AND t.kategorie = :kategorie" if kategorie else ""
+    parameter = {"ausdruck": ausdruck, "kategorie": kategorie, "limit": limit, "offset": offset}
+    gesamt = db.execute(sql(f"""
+        SELECT count(*) FROM textbaustein_fts JOIN textbaustein t ON t.nr = textbaustein_fts.rowid
+        WHERE textbaustein_fts MATCH :ausdruck {filter_kategorie}
+    """), parameter).scalar()
+    zeilen = db.execute(sql(f"""
+        SELECT t.id, t.kategorie, t.titel,
+               snippet(textbaustein_fts, -1, '<mark>', '</mark>', '…', 16) AS ausschnitt,
+               bm25(textbaustein_fts, 5.0, 1.0) AS rang
+        FROM textbaustein_fts JOIN textbaustein t ON t.nr = textbaustein_fts.rowid
+        WHERE textbaustein_fts MATCH :ausdruck {filter_kategorie}
+        ORDER BY rang
+        LIMIT :limit OFFSET :offset
+    """), parameter).mappings().all()
+    return {"gesamt": gesamt, "limit": limit, "offset": offset, "treffer": [dict(z) for z in zeilen]}
+
+def suche_ohne_fts(db: Session, q: str, kategorie: Optional[str], limit: int, offset: int):
+    """
+    Suche für Datenbanken ohne den FTS5-Index: jeder Begriff muss als
+    Teilzeichenkette in Titel oder Text vorkommen (ILIKE), Bausteine mit
+    mehr Treffern im Titel zuerst
+    """
+    t = Textbaustein.__table__
+    bedingungen, titeltreffer = [], []
+    for inhalt, _ in suchbegriffe(q):
+        muster = "%" + re.sub(r"([\\%_])", r"\\\1", inhalt) + "%"
+        im_titel = t.c.titel.ilike(muster, escape="\\")
+        bedingungen.append(or_(im_titel, t.c.text.ilike(muster, escape="\\")))
+        titeltreffer.append(case((im_titel, 1), else_=0))
     if kategorie:
-        return db.query(Textbaustein).filter(Textbaustein.kategorie == kategorie).all()
-    return db.query(Textbaustein).all()
-    return db.query(Textbaustein).all()
+        bedingungen.append(t.c.kategorie == kategorie)
+    filter_ = and_(*bedingungen)
+    gesamt = db.execute(select(func.count()).select_from(t).where(filter_)).scalar()
+    zeilen = db.execute(
+        select(t.c.id, t.c.kategorie, t.c.titel)
+        .where(filter_)
+        .order_by(sum(titeltreffer).desc(), t.c.titel, t.c.id)
+        .limit(limit).offset(offset)
+    ).mappings().all()
+    treffer = [{**z, "ausschnitt": None, "rang": None} for z in zeilen]
+    return {"gesamt": gesamt, "limit": limit, "offset": offset, "treffer": treffer}
 
 @router.post("/add")
 def add_textbaustein(
@@ -24,16 +103,111 @@ def add_textbaustein(
 ):
     baustein = Textbaustein(id=str(uuid.uuid4()), kategorie=kategorie, titel=titel, text=text)
     db.add(baustein)
+    katalog.erhoehe_version(db)
     db.commit()
     db.refresh(baustein)
     return baustein
 
+@router.put("/{baustein_id}")
+def update_textbaustein(
+    baustein_id: str,
+    kategorie: Optional[str] = Body(None),
+    titel: Optional[str] = Body(None),
+    text: Optional[str] = Body(None),
+    db: Session = Depends(get_db)
+):
+    baustein = db.query(Textbaustein).filter(Textbaustein.id == baustein_id).first()
+    if baustein is None:
+        raise HTTPException(status_code=404, detail="Textbaustein nicht gefunden")
+    alte_version = baustein.version
+    if kategorie is not None:
+        baustein.kategorie = kategorie
+    if titel is not None:
+        baustein.titel = titel
+    if text is not None:
+        baustein.text = text
+    baustein.version = alte_version + 1
+    katalog.erhoehe_version(db)
+    db.commit()
+    db.refresh(baustein)
+    vergiss_vorlage(baustein_id, alte_version)
+    return baustein
+
 @router.post("/generate")
 def generate_text(
     baustein_ids: list = Body(...),
     platzhalter: dict = Body(...),
     db: Session = Depends(get_db)
 ):
-    blocks = db.query(Textbaustein).filter(Textbaustein.id.in_(baustein_ids)).all()
-    blocks_dict = [ {"text": b.text} for b in blocks ]
-    return {"text": generiere_textbaustein(blocks_dict, platzhalter)}
+    """
+    Setzt die Bausteine in der angegebenen Reihenfolge zusammen und meldet
+    fehlende und unbekannte Platzhalter
+    """
+    vorlagen, unbekannt = lade_vorlagen(db, baustein_ids)
+    if unbekannt:
+        raise HTTPException(status_code=404, detail=f"Unbekannte Textbausteine: {', '.join(unbekannt)}")
+    return rendere_vorlagen(vorlagen, platzhalter)
+
+@router.post("/merge")
+def merge_textbausteine(
+    baustein_ids: List[str] = Form(...),
+    datei: UploadFile = File(...),
+    ausgabe: str = Form("txt"),
+    eingabe: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Serienbrief: die Bausteine werden einmal geladen und für jede Zeile der
+    CSV- oder NDJSON-Datei gerendert. Die Dokumente (txt oder pdf) werden als
+    ZIP gestreamt; eine optionale Spalte "dateiname" benennt das Dokument.
+    Zeilen mit fehlenden oder unbekannten Platzhaltern stehen in protokoll.ndjson.
+    """
+    if ausgabe not in ("txt", "pdf"):
+        raise HTTPException(status_code=400, detail="Unbekanntes Ausgabeformat")
+    if eingabe is None:
+        eingabe = "ndjson" if (datei.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv"
+    if eingabe not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Unbekanntes Eingabeformat")
+    vorlagen, unbekannt = lade_vorlagen(db, baustein_ids)
+    if unbekannt:
+        raise HTTPException(status_code=404, detail=f"Unbekannte Textbausteine: {', '.join(unbekannt)}")
+
+    def dokumente():
+        protokoll = []
+        offen = []
+
+        def pdfs():
+            # PDFs entstehen blockweise im PDF-Pool
+            for (name, _), pdf in zip(offen, rendere_pdfs_sync([("text", {"text": t}) for _, t in offen])):
+                yield f"{name}.pdf", pdf
+            offen.clear()
+
+        try:
+            for nummer, werte in enumerate(lese_platzhalter_zeilen(datei.file, eingabe), 1):
+                dateiname = re.sub(r'[^\w.-]+', "_", str(werte.pop("dateiname", "") or ""))
+                name = f"{nummer:05d}_{dateiname}" if dateiname else f"{nummer:05d}"
+                ergebnis = rendere_vorlagen(vorlagen, werte)
+                if ergebnis["fehlende_platzhalter"] or ergebnis["unbekannte_platzhalter"]:
+                    protokoll.append({"zeile": nummer, "dokument": name,
+                                      "fehlende_platzhalter": ergebnis["fehlende_platzhalter"],
+                                      "unbekannte_platzhalter": ergebnis["unbekannte_platzhalter"]})
+                if ausgabe == "pdf":
+                    offen.append((name, ergebnis["text"]))
+                    if len(offen) >= settings.PDF_BATCH_GROESSE * settings.PDF_MAX_WORKERS:
+                        yield from pdfs()
+                else:
+                    yield f"{name}.txt", ergebnis["text"].encode("utf-8")
+        except ValueError as e:
+            yield from pdfs()
+            # Der Status ist bereits gesendet, der Fehler landet im Archiv
+            yield "fehler.txt", str(e).encode("utf-8")
+        else:
+            yield from pdfs()
+        if protokoll:
+            yield "protokoll.ndjson", "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in protokoll).encode("utf-8")
+
+    return StreamingResponse(
+        zip_strom(dokumente()),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=serienbrief.zip"}
+    )
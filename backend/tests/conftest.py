@@ -1,6 +1,24 @@
+import os
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
-from backend.main import app
+
+# Eigene Datenbank je Testlauf, bevor backend.database.db die Engines baut;
+# die versionierte sql_app.db bleibt unberührt
+_TESTVERZEICHNIS = tempfile.mkdtemp(prefix="notary-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TESTVERZEICHNIS, 'test.db')}"
+os.environ["PROTOKOLL_FEHLERDATEI"] = os.path.join(_TESTVERZEICHNIS, "protokoll_fehler.ndjson")
+
+from backend.main import app, init_database  # noqa: E402
+
+@pytest.fixture(scope="session", autouse=True)
+def datenbank():
+    # Tests ohne TestClient nutzen die Tabellen ebenfalls
+    init_database()
+    yield
+    shutil.rmtree(_TESTVERZEICHNIS, ignore_errors=True)
 
 @pytest.fixture
 def client():
@@ -0,0 +1,197 @@
+from backend.cache import LRUCache
+
+def test_lru_cache_verdraengt_aeltesten_eintrag():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+def test_gedcom_hash_stabil():
+    from backend.cache.gedcom import gedcom_hash
+    assert gedcom_hash(b"0 HEAD\n") == gedcom_hash(b"0 HEAD\n")
+    assert gedcom_hash(b"0 HEAD\n") != gedcom_hash(b"0 HEAD\n0 TRLR\n")
+
+def test_gedcom_baum_je_benutzer_und_gleichzeitig(tmp_path):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from backend.cache import gedcom
+    from backend.database.db import Base
+    from backend.models.gedcom import GedcomBaum
+
+    async def ablauf():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'gedcom.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[GedcomBaum.__table__])
+
+        async def hochladen(user_id):
+            async with AsyncSession(engine) as db:
+                return await gedcom.speichere_baum(db, user_id, "h1", {"personen": [], "erblasserName": "A"})
+
+        # Zwei gleichzeitige Uploads derselben Datei, dazu ein anderer Benutzer
+        await asyncio.gather(hochladen(1), hochladen(1), hochladen(2))
+        gedcom._baeume.clear()
+        async with AsyncSession(engine) as db:
+            eigener = await gedcom.lade_baum(db, 1, "h1")
+            fremder = await gedcom.lade_baum(db, 3, "h1")
+            anzahl = len((await db.execute(GedcomBaum.__table__.select())).all())
+        await engine.dispose()
+        return eigener, fremder, anzahl
+
+    eigener, fremder, anzahl = asyncio.run(ablauf())
+    assert eigener["baumId"] == "h1" and fremder is None and anzahl == 2
+    gedcom._baeume.clear()
+
+def test_textbaustein_vorlagen_nach_version():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.database.db import Base
+    from backend.models.textbaustein import Textbaustein
+    from backend.cache.textbaustein import lade_vorlagen, vergiss_vorlage
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[Textbaustein.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add_all([Textbaustein(id="a", kategorie="k", titel="A", text="{{x}}"), Textbaustein(id="b", kategorie="k", titel="B", text="b")])
+    db.commit()
+    vorlagen, unbekannt = lade_vorlagen(db, ["b", "a", "c"])
+    assert [v.teile for v in vorlagen] == [("b",), ("", "x", "")]
+    assert unbekannt == ["c"]
+    assert lade_vorlagen(db, ["a"])[0][0] is vorlagen[1]
+    baustein = db.get(Textbaustein, "a")
+    baustein.text, baustein.version = "neu", 2
+    db.commit()
+    vergiss_vorlage("a", 1)
+    assert lade_vorlagen(db, ["a"])[0][0].teile == ("neu",)
+
+def test_textbaustein_katalog_version():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from backend.database.db import Base
+    from backend.models.textbaustein import Textbaustein, TextbausteinStand
+    from backend.cache.textbaustein import Katalog
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[Textbaustein.__table__, TextbausteinStand.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add(Textbaustein(id="a", kategorie="Erbschein", titel="A", text="a"))
+    db.commit()
+    katalog = Katalog()
+    etag, eintraege = katalog.eintraege(db, "Erbschein")
+    assert [e["id"] for e in eintraege] == ["a"]
+    assert katalog.eintraege(db, "Testament")[1] == []
+    db.add(Textbaustein(id="b", kategorie="Erbschein", titel="B", text="b"))
+    db.commit()
+    # Ohne Versionssprung bleibt der Schnappschuss bestehen
+    assert katalog.eintraege(db, "Erbschein") == (etag, eintraege)
+    # Ein anderer Worker (eigener Katalog) erhöht die Version in der Datenbank
+    Katalog.erhoehe_version(db)
+    db.commit()
+    neues_etag, eintraege = katalog.eintraege(db, "Erbschein")
+    assert neues_etag != etag and len(eintraege) == 2
+    assert len(katalog.eintraege(db)[1]) == 2
+    Katalog.erhoehe_version(db)
+    db.commit()
+    assert Katalog.version(db) == 2
+    # Ein neuer Prozess vergibt für denselben Stand dasselbe ETag
+    assert Katalog().eintraege(db, "Erbschein")[0] == katalog.eintraege(db, "Erbschein")[0] == Katalog.etag(2, "Erbschein")
+
+def test_textbaustein_suchindex_triggers():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from backend.database.db import Base
+    from backend.models.textbaustein import Textbaustein, erstelle_suchindex
+    from backend.routes.textbaustein import search_textbausteine, suche_ohne_fts
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[Textbaustein.__table__])
+    db = sessionmaker(bind=engine)()
+    db.add(Textbaustein(id="alt", kategorie="Erbschein", titel="Eingang", text="Vor dem Notar erschien"))
+    db.commit()
+    # Bestehende Zeilen werden beim Anlegen des Index übernommen
+    erstelle_suchindex(engine)
+    db.add_all([
+        Textbaustein(id="a", kategorie="Erbschein", titel="Erbfolge", text="Es gilt die gesetzliche Erbfolge."),
+        Textbaustein(id="b", kategorie="Testament", titel="Widerruf", text="Die gesetzliche Regelung der Erbfolge bleibt.")
+    ])
+    db.commit()
+    suche = lambda q, **kw: search_textbausteine(q, kw.get("kategorie"), kw.get("limit", 20), kw.get("offset", 0), db)
+    assert [t["id"] for t in suche("notar")["treffer"]] == ["alt"]
+    assert [t["id"] for t in suche('"gesetzliche Erbfolge"')["treffer"]] == ["a"]
+    treffer = suche("erbf*")
+    assert treffer["gesamt"] == 2 and treffer["treffer"][0]["id"] == "a"
+    assert "<mark>" in treffer["treffer"][0]["ausschnitt"]
+    assert [t["id"] for t in suche("erbf*", limit=1, offset=1)["treffer"]] == ["b"]
+    assert suche("erbf*", kategorie="Testament")["gesamt"] == 1
+    # Suche ohne FTS5 (PostgreSQL-Profil): Teilzeichenketten, Titeltreffer zuerst
+    ohne_fts = suche_ohne_fts(db, "ERBF* gesetzliche", None, 20, 0)
+    assert ohne_fts["gesamt"] == 2 and [t["id"] for t in ohne_fts["treffer"]] == ["a", "b"]
+    assert suche_ohne_fts(db, '"gesetzliche Erbfolge"', "Testament", 20, 0)["gesamt"] == 0
+    assert suche_ohne_fts(db, "_", None, 20, 0)["gesamt"] == 0
+    db.get(Textbaustein, "b").text = "Widerrufen."
+    db.delete(db.get(Textbaustein, "a"))
+    db.commit()
+    assert suche("erbf*")["gesamt"] == 0
+    assert suche("widerrufen")["gesamt"] == 1
+    # VACUUM nummeriert nr nicht um, der Index zeigt weiter auf die richtigen Zeilen
+    db.close()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+    assert [t["id"] for t in suche("widerrufen")["treffer"]] == ["b"]
+    assert [t["id"] for t in suche("notar")["treffer"]] == ["alt"]
+
+def test_benutzer_cache_version_und_ttl(monkeypatch):
+    from backend.cache import benutzer
+    from backend.config import settings
+    benutzer.leere()
+    aufrufe = []
+    def laden(username):
+        aufrufe.append(username)
+        return {"username": username, "stand": len(aufrufe)}
+    assert benutzer.lade_benutzer("anna", laden)["stand"] == 1
+    assert benutzer.lade_benutzer("anna", laden)["stand"] == 1
+    assert aufrufe == ["anna"]
+    benutzer.vergiss_benutzer("anna")
+    assert benutzer.lade_benutzer("anna", laden)["stand"] == 2
+    # Invalidierung während des Ladens: veraltetes Ergebnis wird nicht gecacht
+    def laden_mit_aenderung(username):
+        benutzer.vergiss_benutzer(username)
+        return laden(username)
+    benutzer.vergiss_benutzer("anna")
+    benutzer.lade_benutzer("anna", laden_mit_aenderung)
+    assert benutzer.lade_benutzer("anna", laden)["stand"] == 4
+    # Invalidierungen halten keinen Zustand je Benutzername
+    for i in range(settings.USER_CACHE_SIZE * 2):
+        benutzer.vergiss_benutzer(f"weg{i}")
+    assert len(benutzer._benutzer) <= settings.USER_CACHE_SIZE and not hasattr(benutzer, "_versionen")
+    monkeypatch.setattr(settings, "USER_CACHE_TTL", 0)
+    benutzer.vergiss_benutzer("anna")
+    benutzer.lade_benutzer("anna", laden)
+    assert benutzer.lade_benutzer("anna", laden)["stand"] == 6
+    assert benutzer.lade_benutzer("niemand", lambda u: None) is None
+    benutzer.leere()
+
+def test_statistik_cache_je_zeitfenster(monkeypatch):
+    import asyncio
+    from backend.cache import statistik
+    statistik.leere()
+    jetzt = [1000.0]
+    monkeypatch.setattr(statistik.time, "time", lambda: jetzt[0])
+    aufrufe = []
+    async def berechnen():
+        aufrufe.append(1)
+        return {"je_tool": {"gnotkg": len(aufrufe)}}
+    def lade(schluessel):
+        return asyncio.run(statistik.lade_statistik(schluessel, berechnen))
+    assert lade((None, None))["je_tool"]["gnotkg"] == 1
+    jetzt[0] += 1
+    assert lade((None, None))["je_tool"]["gnotkg"] == 1
+    # Andere Parameter und ein neues Zeitfenster berechnen neu
+    assert lade(("2026-01-01", None))["je_tool"]["gnotkg"] == 2
+    jetzt[0] += 300
+    ergebnis = lade((None, None))
+    assert ergebnis["je_tool"]["gnotkg"] == 3 and "stand" in ergebnis
+    statistik.leere()
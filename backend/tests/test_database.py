@@ -0,0 +1,184 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+def test_sqlite_profil_und_lese_pool(tmp_path):
+    from backend.config import settings
+    from backend.database.engine import async_url, erstelle_engine
+    url = f"sqlite:///{tmp_path / 'profil.db'}"
+    engine = erstelle_engine(url)
+    with engine.begin() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    lesen = erstelle_engine(url, nur_lesen=True)
+    with lesen.connect() as conn:
+        assert conn.execute(text("SELECT x FROM t")).scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+    assert async_url(url).startswith("sqlite+aiosqlite:///")
+    assert async_url("postgresql://u@h/db") == "postgresql+asyncpg://u@h/db"
+    # Ein ausdrücklich angegebener Sync-Treiber wird ersetzt
+    assert async_url("postgresql+psycopg2://u:p%40w@h:5432/db") == "postgresql+asyncpg://u:p%40w@h:5432/db"
+    assert async_url("sqlite+pysqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+    assert async_url("postgresql+asyncpg://u@h/db") == "postgresql+asyncpg://u@h/db"
+    engine.dispose()
+    lesen.dispose()
+
+def test_tool_history_migration_und_upsert():
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+    from backend.database.migrationen import fuehre_migrationen_aus
+    from backend.routes.history import upsert_history
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Layout aus dem früheren CREATE TABLE in routes/history.py, mit Dubletten
+        conn.execute(text("CREATE TABLE tool_history (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, tool_id TEXT, tool_name TEXT, data TEXT, last_accessed INTEGER)"))
+        conn.execute(text("INSERT INTO tool_history (user_id, tool_id, tool_name, data, last_accessed) VALUES (1, 'gnotkg', 'GNotKG', 'alt', 1), (1, 'gnotkg', 'GNotKG', 'neu', 2), (1, 'erbfolge', 'Erbfolge', '{}', 3)"))
+    assert "0001_tool_history_autosave" in fuehre_migrationen_aus(engine)
+    assert fuehre_migrationen_aus(engine) == []
+    with engine.begin() as conn:
+        zeilen = conn.execute(text("SELECT tool_id, data FROM tool_history ORDER BY tool_id")).fetchall()
+        assert zeilen == [("erbfolge", "{}"), ("gnotkg", "neu")]
+        conn.execute(upsert_history("sqlite"), {"user_id": 1, "tool_id": "gnotkg", "tool_name": "GNotKG", "data": "x", "last_accessed": 5})
+        conn.execute(upsert_history("sqlite"), {"user_id": 2, "tool_id": "gnotkg", "tool_name": "GNotKG", "data": "y", "last_accessed": 6})
+        assert conn.execute(text("SELECT count(*) FROM tool_history WHERE user_id = 1")).scalar() == 2
+        assert conn.execute(text("SELECT data FROM tool_history WHERE user_id = 1 AND tool_id = 'gnotkg'")).scalar() == "x"
+        plan = " ".join(str(z[-1]) for z in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT tool_id, tool_name, data, last_accessed FROM tool_history WHERE user_id = 1 ORDER BY last_accessed DESC"
+        )))
+        assert "COVERING INDEX ix_tool_history_zuletzt" in plan and "TEMP B-TREE" not in plan
+
+def test_historie_keyset_seiten(monkeypatch):
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from backend.config import settings
+    from backend.database.db import Base
+    from backend.database.seiten import lade_seite
+    from backend.models.gnotkg import GNotKG
+    monkeypatch.setattr(settings, "HISTORY_SEITE_MAX", 4)
+
+    async def ablauf():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[GNotKG.__table__])
+            await conn.execute(GNotKG.__table__.insert(), [{"user_id": 1 + i % 2, "gebuehr": float(i)} for i in range(20)])
+        seiten = []
+        async with AsyncSession(engine) as db:
+            cursor = None
+            while True:
+                seite = await lade_seite(db, GNotKG, ["id", "gebuehr"], 1, cursor, limit=100)
+                seiten.append(seite["eintraege"])
+                cursor = seite["naechster_cursor"]
+                if cursor is None:
+                    break
+        await engine.dispose()
+        return seiten
+
+    seiten = asyncio.run(ablauf())
+    # limit auf HISTORY_SEITE_MAX begrenzt, neueste zuerst, nur eigene Zeilen
+    assert [len(s) for s in seiten] == [4, 4, 2]
+    gebuehren = [z["gebuehr"] for s in seiten for z in s]
+    assert gebuehren == [float(i) for i in range(18, -1, -2)]
+    assert set(seiten[0][0]) == {"id", "gebuehr"}
+
+def test_statistik_group_by_und_migration(tmp_path):
+    import asyncio
+    from datetime import datetime
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from backend.database.migrationen import fuehre_migrationen_aus
+    from backend.database.statistik import berechne_statistik
+    from backend.models.erbfolge import Erbfolge
+    from backend.models.gnotkg import GNotKG
+
+    # Rechnertabellen im Layout vor created_at, eine alte Zeile ohne Datum
+    datei = tmp_path / "statistik.db"
+    engine = create_engine(f"sqlite:///{datei}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, password_hash TEXT, role TEXT, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO users (id, username, password_hash) VALUES (1, 'anna', ''), (2, 'bernd', '')"))
+        conn.execute(text("CREATE TABLE erbfolge (id INTEGER PRIMARY KEY, user_id INTEGER, erblasser TEXT, vermoegenswert FLOAT, ergebnis TEXT)"))
+        conn.execute(text("CREATE TABLE gnotkg (id INTEGER PRIMARY KEY, user_id INTEGER, geschaeftswert FLOAT, vorgangsart TEXT, gebuehr FLOAT)"))
+        conn.execute(text("CREATE TABLE erbpachtzins (id INTEGER PRIMARY KEY, user_id INTEGER, aktueller_zins FLOAT, alter_index FLOAT, neuer_index FLOAT, neuer_zins FLOAT)"))
+        conn.execute(text("CREATE TABLE miteigentum (id INTEGER PRIMARY KEY, user_id INTEGER, objekt TEXT, anteil FLOAT, ergebnis TEXT)"))
+        conn.execute(text("INSERT INTO gnotkg (user_id, gebuehr) VALUES (1, 7.0)"))
+    assert "0003_berechnungen_created_at" in fuehre_migrationen_aus(engine)
+    with engine.begin() as conn:
+        t = datetime
+        conn.execute(GNotKG.__table__.insert(), [
+            {"user_id": 1, "gebuehr": 10.0, "created_at": t(2026, 1, 5, 10)},
+            {"user_id": 2, "gebuehr": 20.0, "created_at": t(2026, 1, 31, 23, 59, 59)},
+            {"user_id": 1, "gebuehr": 5.0, "created_at": t(2026, 2, 1)},
+        ])
+        conn.execute(Erbfolge.__table__.insert(), [
+            {"user_id": 1, "vermoegenswert": 100.0, "created_at": t(2026, 1, 10)},
+            {"user_id": 1, "vermoegenswert": 300.0, "created_at": t(2026, 1, 20)},
+            {"user_id": 2, "vermoegenswert": 50.0, "created_at": t(2026, 2, 2)},
+        ])
+        plan = " ".join(str(z[-1]) for z in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT strftime('%Y-%m', created_at), count(*), sum(gebuehr) FROM gnotkg "
+            "WHERE created_at >= '2026-01-01' GROUP BY 1"
+        )))
+        assert "COVERING INDEX ix_gnotkg_created_at" in plan
+
+    async def ablauf(von=None, bis=None):
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{datei}")
+        async with AsyncSession(async_engine) as db:
+            ergebnis = await berechne_statistik(db, von, bis)
+        await async_engine.dispose()
+        return ergebnis
+
+    alles = asyncio.run(ablauf())
+    assert alles["je_tool"] == {"erbfolge": 3, "gnotkg": 4, "erbpachtzins": 0, "miteigentum": 0}
+    assert {(z["tool"], z["username"], z["anzahl"]) for z in alles["nutzung"]} == {
+        ("erbfolge", "anna", 2), ("erbfolge", "bernd", 1), ("gnotkg", "anna", 3), ("gnotkg", "bernd", 1)
+    }
+    assert [(z["monat"], z["anzahl"], z["summe"]) for z in alles["gnotkg_gebuehren"]] == [
+        (None, 1, 7.0), ("2026-01", 2, 30.0), ("2026-02", 1, 5.0)
+    ]
+    assert [(z["monat"], z["durchschnitt"]) for z in alles["erbfolge_vermoegen"]] == [("2026-01", 200.0), ("2026-02", 50.0)]
+    januar = asyncio.run(ablauf(datetime(2026, 1, 1), datetime(2026, 2, 1)))
+    assert januar["je_tool"]["gnotkg"] == 2
+    assert [z["monat"] for z in januar["gnotkg_gebuehren"]] == ["2026-01"]
+
+def test_textbaustein_version_migration():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+    from backend.database.migrationen import fuehre_migrationen_aus
+    from backend.cache.textbaustein import lade_vorlagen
+    from backend.models.textbaustein import Textbaustein
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Schema des Ausgangsstands, ohne version
+        conn.execute(text("CREATE TABLE textbaustein (id VARCHAR PRIMARY KEY, kategorie VARCHAR, titel VARCHAR, text TEXT)"))
+        conn.execute(text("INSERT INTO textbaustein VALUES ('tb-alt', 'Kauf', 'Auflassung', 'Hallo {{ name }}')"))
+    assert "0004_textbaustein_version" in fuehre_migrationen_aus(engine)
+    with Session(engine) as db:
+        assert db.query(Textbaustein.version).filter(Textbaustein.id == "tb-alt").scalar() == 1
+        vorlagen, unbekannt = lade_vorlagen(db, ["tb-alt"])
+        assert unbekannt == [] and len(vorlagen) == 1
+
+def test_textbaustein_nr_migration():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import StaticPool
+    from backend.database.migrationen import fuehre_migrationen_aus
+    from backend.models.textbaustein import erstelle_suchindex
+    from backend.routes.textbaustein import search_textbausteine
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        # String-Primärschlüssel und FTS-Index auf der impliziten rowid
+        conn.execute(text("CREATE TABLE textbaustein (id VARCHAR PRIMARY KEY, kategorie VARCHAR, titel VARCHAR, text TEXT)"))
+        conn.execute(text("INSERT INTO textbaustein VALUES ('x', 'Kauf', 'Auflassung', 'Die Beteiligten sind einig'), ('y', 'Kauf', 'Vollmacht', 'Der Notar wird bevollmächtigt')"))
+        conn.execute(text("CREATE VIRTUAL TABLE textbaustein_fts USING fts5(titel, text, content='textbaustein', content_rowid='rowid')"))
+        conn.execute(text("INSERT INTO textbaustein_fts(textbaustein_fts) VALUES ('rebuild')"))
+    assert {"0004_textbaustein_version", "0005_textbaustein_nr"} <= set(fuehre_migrationen_aus(engine))
+    erstelle_suchindex(engine)
+    with Session(engine) as db:
+        assert [t["id"] for t in search_textbausteine("notar", None, 20, 0, db)["treffer"]] == ["y"]
+        assert db.execute(text("SELECT id, version FROM textbaustein ORDER BY nr")).fetchall() == [("x", 1), ("y", 1)]
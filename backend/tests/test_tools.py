@@ -42,3 +42,609 @@ def test_berechne_gnotkg():
     assert result["gebuehr"] > 0
     result2 = berechne_gnotkg(30000, "Beglaubigung")
     assert result2["gebuehr"] < result["gebuehr"]
+
+GEDCOM_BEISPIEL = """0 HEAD
+0 @I1@ INDI
+1 NAME Max /Mustermann/
+1 BIRT
+2 DATE 12 JAN 1940
+1 DEAT
+2 DATE 2020
+1 FAMS @F1@
+0 @I2@ INDI
+1 NAME Erika /Mustermann/
+1 FAMS @F1@
+0 @I3@ INDI
+1 NAME Anna /Mustermann/
+1 FAMC @F1@
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+0 TRLR
+"""
+
+def test_parse_gedcom_content():
+    from backend.tools.gedcom import parse_gedcom_content
+    result = parse_gedcom_content(GEDCOM_BEISPIEL)
+    assert result["erblasserName"] == "Max Mustermann"
+    beziehungen = {p["vorname"]: p["beziehung"] for p in result["personen"]}
+    assert beziehungen == {"Erika": "ehepartner", "Anna": "kind", "Max": "geschwister"}
+    max_ = next(p for p in result["personen"] if p["vorname"] == "Max")
+    assert max_["geburtsdatum"] == "1940-01-12"
+    assert max_["sterbedatum"] == "2020-01-01"
+
+def test_parse_gedcom_stream_chunk_grenzen():
+    from backend.tools.gedcom import parse_gedcom_content, parse_gedcom_stream
+    daten = GEDCOM_BEISPIEL.replace("\n", "\r\n").encode("utf-8")
+    # Chunks of 7 bytes split lines, CRLF pairs and tokens arbitrarily
+    chunks = [daten[i:i + 7] for i in range(0, len(daten), 7)]
+    gestreamt = parse_gedcom_stream(chunks)
+    komplett = parse_gedcom_content(GEDCOM_BEISPIEL)
+    ohne_id = lambda r: [{k: v for k, v in p.items() if k != "id"} for p in r["personen"]]
+    assert ohne_id(gestreamt) == ohne_id(komplett)
+
+def test_write_gedcom_stream_familien():
+    from backend.tools.gedcom import GedcomStreamParser, write_gedcom_stream
+    erben = [
+        {"id": "s", "beziehung": "ehepartner", "vorname": "Erika", "nachname": "Muster"},
+        {"id": "k1", "beziehung": "kind", "vorname": "Anna", "geburtsdatum": "1990-03-04"},
+        {"id": "k2", "beziehung": "kind", "vorname": "Paul", "sterbedatum": "2010-01-01"},
+        {"id": "e1", "beziehung": "enkel", "parentId": "k2", "vorname": "Lena"},
+        {"id": "e2", "beziehung": "enkel", "stammId": "x", "vorname": "Tom"},
+    ]
+    chunks = list(write_gedcom_stream(erben, "Max /Muster/", {"k1": 50.0}, chunk_size=64))
+    assert len(chunks) > 1
+    parser = GedcomStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    indi, fam = parser.individuals, parser.families
+    name = {i["id"]: i.get("first_name") for i in indi.values()}
+    ref = {v: k for k, v in name.items() if v}
+    ehe = fam[indi[ref["Max"]]["spouse_in_family"]]
+    assert (ehe["husband"], ehe["wife"]) == (ref["Max"], ref["Erika"])
+    assert {ref["Anna"], ref["Paul"]} <= set(ehe["children"])
+    assert fam[indi[ref["Lena"]]["child_in_family"]]["husband"] == ref["Paul"]
+    # Nicht erfasster, vorverstorbener Stamm von Tom
+    stamm = indi[fam[indi[ref["Tom"]]["child_in_family"]]["husband"]]
+    assert stamm["death"] == {"known": True} and stamm["child_in_family"] == ehe["id"]
+    assert indi[ref["Anna"]]["birth"]["date"] == "1990-03-04"
+    assert indi[ref["Paul"]]["death"]["date"] == "2010-01-01"
+
+def test_berechne_erbfolge_urenkel_nach_staemmen():
+    erben = [
+        {"id": "k1", "beziehung": "kind"},
+        {"id": "k2", "beziehung": "kind", "sterbedatum": "2010-01-01"},
+        {"id": "e1", "beziehung": "enkel", "parentId": "k2", "sterbedatum": "2015-01-01"},
+        {"id": "e2", "beziehung": "enkel", "parentId": "k2"},
+        {"id": "u1", "beziehung": "urenkel", "parentId": "e1"},
+        {"id": "u2", "beziehung": "urenkel", "parentId": "e1"},
+    ]
+    ergebnisse = berechne_erbfolge("Max", 100000, erben)["ergebnisse"]
+    assert ergebnisse == {"k1": 50.0, "e2": 25.0, "u1": 12.5, "u2": 12.5}
+
+def test_berechne_erbfolge_enkel_ueber_stamm_id():
+    erben = [
+        {"id": "1", "beziehung": "ehepartner"},
+        {"id": "2", "beziehung": "kind", "stammId": "s1", "sterbedatum": "2010-01-01"},
+        {"id": "3", "beziehung": "enkel", "stammId": "s1"},
+        {"id": "4", "beziehung": "enkel", "stammId": "s1"},
+        {"id": "5", "beziehung": "kind", "stammId": "s2"},
+    ]
+    ergebnisse = berechne_erbfolge("Max", 100000, erben)["ergebnisse"]
+    assert ergebnisse == {"1": 50.0, "3": 12.5, "4": 12.5, "5": 25.0}
+
+def test_berechne_erbfolge_zweite_ordnung_mit_neffen():
+    erben = [
+        {"id": "v", "beziehung": "elternteil"},
+        {"id": "g1", "beziehung": "geschwister"},
+        {"id": "g2", "beziehung": "geschwister", "sterbedatum": "2000-01-01"},
+        {"id": "n1", "beziehung": "neffe", "parentId": "g2"},
+    ]
+    ergebnisse = berechne_erbfolge("Max", 100000, erben)["ergebnisse"]
+    # Lebender Elternteil 1/2, Hälfte des vorverstorbenen Elternteils an dessen Stämme
+    assert ergebnisse == {"v": 50.0, "g1": 25.0, "n1": 25.0}
+
+def test_berechne_erbfolge_ehepartner_neben_grosseltern():
+    erben = [
+        {"id": "e", "beziehung": "ehepartner"},
+        {"id": "g1", "beziehung": "großelternteil", "linie": "vaeterlich"},
+        {"id": "g2", "beziehung": "großelternteil", "linie": "vaeterlich", "sterbedatum": "1990-01-01"},
+        {"id": "o1", "beziehung": "onkel", "parentId": "g2"},
+    ]
+    ergebnisse = berechne_erbfolge("Max", 100000, erben)["ergebnisse"]
+    # Anteil des Onkels fällt dem Ehegatten zu (§ 1931 Abs. 1 S. 2 BGB)
+    assert ergebnisse == {"e": 87.5, "g1": 12.5}
+
+def test_berechne_quoten_exakt_bei_vielen_staemmen():
+    from fractions import Fraction
+    from backend.tools.verwandtschaft import Verwandtschaftsgraph, berechne_quoten
+    erben = [{"id": f"k{i}", "beziehung": "kind", "sterbedatum": "2000-01-01"} for i in range(3)]
+    erben += [{"id": f"e{i}{j}", "beziehung": "enkel", "parentId": f"k{i}"} for i in range(3) for j in range(i + 1)]
+    quoten = berechne_quoten(Verwandtschaftsgraph(erben))
+    assert sum(quoten.values()) == 1
+    assert quoten["e00"] == Fraction(1, 3)
+    assert quoten["e21"] == Fraction(1, 9)
+
+def test_berechne_szenarien_entspricht_vollberechnung():
+    from backend.tools.erbfolge import berechne_szenarien
+    erben = [
+        {"id": "e", "beziehung": "ehepartner"},
+        {"id": "k1", "beziehung": "kind"},
+        {"id": "k2", "beziehung": "kind"},
+        {"id": "n1", "beziehung": "enkel", "parentId": "k1"},
+    ]
+    szenarien = [
+        {"name": "k1 vorverstorben", "deltas": [{"typ": "verstorben", "id": "k1"}]},
+        {"name": "Ausschlagung", "deltas": [{"typ": "ausschlagung", "id": "e"}]},
+        {"name": "Urenkel", "deltas": [
+            {"typ": "verstorben", "id": "n1"},
+            {"typ": "hinzufuegen", "person": {"id": "u1", "beziehung": "urenkel", "parentId": "n1"}},
+        ]},
+        {"name": "ohne k2", "deltas": [{"typ": "entfernen", "id": "k2"}]},
+    ]
+    result = berechne_szenarien("Max", 100000, erben, szenarien)
+    assert result["ergebnisse"] == berechne_erbfolge("Max", 100000, erben)["ergebnisse"]
+    varianten = [v["ergebnisse"] for v in result["szenarien"]]
+    assert varianten[0] == {"e": 50.0, "n1": 25.0, "k2": 25.0}
+    assert varianten[1] == {"k1": 50.0, "k2": 50.0}
+    assert varianten[2] == result["ergebnisse"]
+    assert varianten[3] == {"e": 50.0, "k1": 50.0}
+    # Der Basisgraph bleibt unverändert
+    assert berechne_szenarien("Max", 100000, erben, [])["ergebnisse"] == result["ergebnisse"]
+
+def test_verwandtschaft_tiefe_kette_und_entfernen_mit_repraesentation():
+    from fractions import Fraction
+    from backend.tools.verwandtschaft import Verwandtschaftsgraph, Szenario, berechne_quoten
+    # 5000 vorverstorbene Generationen: keine Rekursion, der letzte Abkömmling erbt allein
+    tiefe = 5000
+    erben = [{"id": "g0", "beziehung": "kind", "sterbedatum": "1900-01-01"}]
+    erben += [{"id": f"g{i}", "beziehung": "urenkel", "parentId": f"g{i - 1}", "sterbedatum": "1900-01-01"} for i in range(1, tiefe)]
+    erben.append({"id": "letzter", "beziehung": "urenkel", "parentId": f"g{tiefe - 1}"})
+    erben.append({"id": "k2", "beziehung": "kind"})
+    graph = Verwandtschaftsgraph(erben)
+    assert berechne_quoten(graph) == {"letzter": Fraction(1, 2), "k2": Fraction(1, 2)}
+    assert berechne_quoten(Szenario(graph, [{"typ": "verstorben", "id": "letzter"}])) == {"k2": 1}
+    # Entfernen schneidet die Abkömmlinge nicht ab, sie treten an die Stelle des Kindes
+    erben = [
+        {"id": "k1", "beziehung": "kind"},
+        {"id": "k2", "beziehung": "kind"},
+        {"id": "n1", "beziehung": "enkel", "parentId": "k1"},
+        {"id": "n2", "beziehung": "enkel", "parentId": "k1"},
+    ]
+    quoten = berechne_quoten(Szenario(Verwandtschaftsgraph(erben), [{"typ": "entfernen", "id": "k1"}]))
+    assert quoten == {"n1": Fraction(1, 4), "n2": Fraction(1, 4), "k2": Fraction(1, 2)}
+    # Zirkuläre parentId-Angaben enden mit einem Fehler statt einer Endlosschleife
+    zirkel = [
+        {"id": "a", "beziehung": "enkel", "parentId": "b", "sterbedatum": "1900-01-01"},
+        {"id": "b", "beziehung": "enkel", "parentId": "a", "sterbedatum": "1900-01-01"},
+        {"id": "c", "beziehung": "enkel", "parentId": "b"},
+    ]
+    graph = Verwandtschaftsgraph(zirkel)
+    assert graph.hat_erben("a") and graph.hat_erben("b")
+    with pytest.raises(ValueError):
+        graph.verteile_stamm("a", Fraction(1), {})
+
+def test_parse_gedcom_stabile_ids_und_korrekturen():
+    from backend.tools.gedcom import parse_gedcom_content, apply_person_overrides
+    erste = parse_gedcom_content(GEDCOM_BEISPIEL)["personen"]
+    zweite = parse_gedcom_content(GEDCOM_BEISPIEL)["personen"]
+    assert [p["id"] for p in erste] == [p["id"] for p in zweite] == ["I2", "I3", "I1"]
+    personen = apply_person_overrides(erste, [
+        {"id": "I1", "beziehung": "elternteil"},
+        {"id": "x", "beziehung": "kind", "vorname": "Neu"},
+    ])
+    assert [p["beziehung"] for p in personen] == ["ehepartner", "kind", "elternteil", "kind"]
+    assert erste[2]["beziehung"] == "geschwister"
+
+def test_berechne_gnotkg_tabelle_b():
+    # Volle Gebühr nach Tabelle B an Stufengrenzen und darüber
+    from backend.tools.gebuehrentabellen import gebuehrentabellen
+    tabelle = gebuehrentabellen.tabelle("B")
+    assert tabelle.gebuehr(500) == 15
+    assert tabelle.gebuehr(2000) == 27
+    assert tabelle.gebuehr(2001) == 33
+    assert tabelle.gebuehr(1000000) == 1735
+    assert tabelle.gebuehr(30000000) == 22985
+    assert tabelle.gebuehr(30000001) == 23105
+
+def test_berechne_gnotkg_batch_entspricht_einzelberechnung():
+    from backend.tools.gnotkg import berechne_gnotkg_batch
+    werte = [100, 4999, 30000, 250000, 7500000, 90000000]
+    arten = ["Beurkundung", "Beglaubigung", "Sonstiges"]
+    matrix = berechne_gnotkg_batch(werte, vorgangsarten=arten, kreuzprodukt=True)
+    assert matrix.shape == (len(werte), len(arten))
+    for i, wert in enumerate(werte):
+        for j, art in enumerate(arten):
+            assert matrix[i, j] == berechne_gnotkg(wert, art)["gebuehr"]
+    elementweise = berechne_gnotkg_batch(werte, gebuehrensaetze=[0.5] * len(werte))
+    assert elementweise.tolist() == [max(15, round(0.5 * v, 2)) for v in berechne_gnotkg_batch(werte)]
+
+def test_gebuehrentabellen_nach_stichtag(tmp_path):
+    import json, os
+    from datetime import date
+    from backend.tools.gebuehrentabellen import Gebuehrentabellen, STANDARD_VERZEICHNIS
+    tabellen = Gebuehrentabellen(STANDARD_VERZEICHNIS)
+    assert tabellen.tabelle("A", date(2020, 12, 31)).gebuehr(500) == 35
+    assert tabellen.tabelle("A", date(2021, 1, 1)).gebuehr(500) == 38
+    versionen, index = tabellen.versionen_fuer("A", [date(2014, 1, 1), date(2022, 1, 1)])
+    assert index.tolist() == [0, 1]
+    with pytest.raises(ValueError):
+        tabellen.tabelle("A", date(2013, 7, 31))
+
+    # Neue Fassung im Verzeichnis wird ohne Neustart übernommen
+    tabellen = Gebuehrentabellen(str(tmp_path), reload_sekunden=0)
+    fassung = {"tabelle": "B", "gueltig_ab": "2013-08-01", "grundgebuehr": 15, "stufen": [{"bis": None, "je": 500, "um": 4}]}
+    (tmp_path / "b_2013.json").write_text(json.dumps(fassung))
+    assert tabellen.tabelle("B", date(2030, 1, 1)).gebuehr(1000) == 19
+    (tmp_path / "b_2030.json").write_text(json.dumps({**fassung, "gueltig_ab": "2030-01-01", "grundgebuehr": 20}))
+    assert tabellen.tabelle("B", date(2030, 1, 1)).gebuehr(1000) == 24
+    assert tabellen.tabelle("B", date(2029, 12, 31)).gebuehr(1000) == 19
+    # Halb geschriebene Datei: der bisherige Stand bleibt aktiv
+    (tmp_path / "b_2030.json").write_text('{"tabelle": "B", "gueltig_ab": "2030-')
+    assert tabellen.tabelle("B", date(2030, 1, 1)).gebuehr(1000) == 24
+    (tmp_path / "b_2030.json").write_text(json.dumps({**fassung, "gueltig_ab": "2030-01-01", "grundgebuehr": 25}))
+    assert tabellen.tabelle("B", date(2030, 1, 1)).gebuehr(1000) == 29
+    # Ohne bisherigen Stand wird der Fehler gemeldet
+    (tmp_path / "b_2013.json").write_text("{")
+    with pytest.raises(ValueError):
+        Gebuehrentabellen(str(tmp_path)).tabelle("B")
+
+def test_berechne_gnotkg_batch_mit_stichtagen():
+    from datetime import date
+    from backend.tools.gnotkg import berechne_gnotkg_batch
+    gebuehren = berechne_gnotkg_batch([500, 500, 500], tabelle="A", stichtage=[date(2015, 1, 1), date(2022, 1, 1), date(2015, 6, 1)])
+    assert gebuehren.tolist() == [35, 38, 35]
+
+def test_berechne_erbpachtzins_portfolio():
+    from backend.tools.erbpachtzins import berechne_erbpachtzins_portfolio, VPIReihe
+    vpi = VPIReihe.aus_dict({"2020-01": 100.0, "2021-06": 104.0, "2023-12": 120.0})
+    vertraege = [
+        {"id": "a", "aktueller_zins": 1000, "basis_monat": "2020-01", "klausel": "voll"},
+        {"id": "b", "aktueller_zins": 1000, "basis_monat": "2020-01", "klausel": "anteilig", "anteil": 0.5},
+        {"id": "c", "aktueller_zins": 500, "basis_monat": "2021-06", "schwelle": 0.2},
+    ]
+    ergebnis = berechne_erbpachtzins_portfolio(vertraege, vpi)
+    assert ergebnis["ziel_monat"] == "2023-12"
+    zinsen = [v["neuer_zins"] for v in ergebnis["vertraege"]]
+    assert zinsen == [1200.0, 1100.0, 500.0]
+    assert zinsen[0] == berechne_erbpachtzins(1000, 100, 120)["neuer_zins"]
+    with pytest.raises(ValueError):
+        berechne_erbpachtzins_portfolio([{"aktueller_zins": 1, "basis_monat": "2020-02"}], vpi)
+    # Nicht endliche oder nicht numerische Werte werden vor der Berechnung abgewiesen
+    for fehler in ({"aktueller_zins": None}, {"aktueller_zins": {}}, {"schwelle": float("nan")},
+                   {"klausel": "anteilig", "anteil": "0.5"}, {"aktueller_zins": True}):
+        with pytest.raises(ValueError, match="Vertrag 1"):
+            berechne_erbpachtzins_portfolio([vertraege[0], {**vertraege[0], **fehler}], vpi)
+
+def test_erbpachtzins_portfolio_route_ungueltige_werte(client):
+    from backend.auth.users import get_current_user
+    from backend.main import app
+    app.dependency_overrides[get_current_user] = lambda: type("Benutzer", (), {"id": 1, "role": "user"})()
+    try:
+        antwort = client.post("/tools/erbpachtzins/calculate-portfolio", json={
+            "vertraege": [{"aktueller_zins": None, "basis_monat": "2020-01"}],
+            "vpi": {"2020-01": 100.0, "2021-01": 110.0}
+        })
+    finally:
+        app.dependency_overrides.pop(get_current_user)
+    assert antwort.status_code == 400 and "Vertrag 0" in antwort.json()["detail"]
+
+def test_vpi_schwellen_suche(tmp_path):
+    import numpy as np
+    from backend.tools.erbpachtzins import berechne_schwellen_anpassung, lade_vpi_reihe, VPIReihe
+    rng = np.random.default_rng(7)
+    werte = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.01, 360)))
+    monate = np.arange(np.datetime64("1995-01"), np.datetime64("1995-01") + 360).astype(str)
+    pfad = str(tmp_path / "vpi.npy")
+    VPIReihe(list(monate), werte).speichern(pfad)
+    vpi = lade_vpi_reihe(pfad)
+    assert isinstance(vpi.werte, np.memmap)
+    assert vpi.letzter_monat == monate[-1]
+
+    vertraege = [
+        {"id": i, "aktueller_zins": 1000, "basis_monat": monate[b], "schwelle": s}
+        for i, (b, s) in enumerate(zip(rng.integers(0, 360, 300), rng.choice([0.01, 0.02, 0.05, 0.1, 0.5], 300)))
+    ]
+    for v, e in zip(vertraege, berechne_schwellen_anpassung(vertraege, vpi)):
+        # Referenz: linearer Scan ab dem Monat nach der Basis
+        b = list(monate).index(v["basis_monat"])
+        aenderung = np.abs(werte[b + 1:] / werte[b] - 1)
+        treffer = np.flatnonzero(aenderung >= v["schwelle"] - 1e-12)
+        if treffer.size:
+            t = b + 1 + treffer[0]
+            assert e["erster_monat"] == monate[t]
+            assert e["neuer_zins"] == round(1000 * werte[t] / werte[b], 2)
+        else:
+            assert e["erster_monat"] is None and e["neuer_zins"] == 1000
+    for ungueltig in ({"schwelle": 0}, {"schwelle": -0.1}, {"klausel": "staffel"}):
+        with pytest.raises(ValueError):
+            berechne_schwellen_anpassung([{**vertraege[0], "schwelle": 0.05, **ungueltig}], vpi)
+
+    # Neue Reihe: Startmonat und Werte in einer Datei, atomar ersetzt
+    VPIReihe(list(monate[12:]), werte[12:] * 2).speichern(pfad)
+    neu = lade_vpi_reihe(pfad)
+    assert neu.letzter_monat == monate[-1] and float(neu.index_fuer(monate[12])) == werte[12] * 2
+    assert not (tmp_path / "vpi.npy.tmp").exists()
+    # Früheres Format: nur Werte, Startmonat in der .json daneben
+    alt = str(tmp_path / "alt.npy")
+    np.save(alt, werte)
+    (tmp_path / "alt.npy.json").write_text('{"start": "1995-01"}')
+    assert float(lade_vpi_reihe(alt).index_fuer("1995-03")) == werte[2]
+    VPIReihe.laden(alt).speichern(alt)
+    assert not (tmp_path / "alt.npy.json").exists() and float(lade_vpi_reihe(alt).index_fuer("1995-03")) == werte[2]
+
+def test_rendere_vorlagen_ein_durchlauf():
+    from backend.tools.textbaustein import generiere_textbaustein, kompiliere_textbaustein, rendere_vorlagen
+    vorlagen = [kompiliere_textbaustein("Erblasser: {{name}}, {{ort}}"), kompiliere_textbaustein("Am {{datum}} durch {{name}}.")]
+    ergebnis = rendere_vorlagen(vorlagen, {"name": "{{datum}}", "datum": "1.1.2024", "notar": "X"})
+    # Eingesetzte Werte werden nicht erneut ersetzt
+    assert ergebnis["text"] == "Erblasser: {{datum}}, {{ort}}\n\nAm 1.1.2024 durch {{datum}}."
+    assert ergebnis["fehlende_platzhalter"] == ["ort"]
+    assert ergebnis["unbekannte_platzhalter"] == ["notar"]
+    assert generiere_textbaustein([{"text": "am {{{datum}}}"}], {"datum": 1}) == "am {1}"
+
+def test_fts_ausdruck():
+    from backend.tools.textbaustein import fts_ausdruck
+    assert fts_ausdruck('Erb* "gesetzliche Erbfolge" AND-Vermerk') == '"Erb"* "gesetzliche Erbfolge" "AND Vermerk"'
+    assert fts_ausdruck('" * ') == ""
+
+def test_lese_platzhalter_zeilen():
+    import io
+    from backend.tools.textbaustein import lese_platzhalter_zeilen
+    csv_daten = "﻿name;ort\nMüller;Köln\n\"Schmidt; Anna\";Bonn\n".encode("utf-8")
+    assert list(lese_platzhalter_zeilen(io.BytesIO(csv_daten))) == [
+        {"name": "Müller", "ort": "Köln"}, {"name": "Schmidt; Anna", "ort": "Bonn"}
+    ]
+    ndjson = b'{"name": "A"}\n\n{"name": "B"}\n'
+    assert [z["name"] for z in lese_platzhalter_zeilen(io.BytesIO(ndjson), "ndjson")] == ["A", "B"]
+    with pytest.raises(ValueError):
+        list(lese_platzhalter_zeilen(io.BytesIO(b"[1]\n"), "ndjson"))
+
+def test_zip_strom():
+    import io
+    import zipfile
+    from backend.export.archiv import zip_strom
+    teile = list(zip_strom((f"{i}.txt", f"Dokument {i}".encode() * 100) for i in range(50)))
+    assert len(teile) > 1
+    archiv = zipfile.ZipFile(io.BytesIO(b"".join(teile)))
+    assert archiv.testzip() is None
+    assert archiv.read("7.txt") == b"Dokument 7" * 100
+
+def test_historie_csv_blockweise():
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+    from backend.database.db import Base
+    from backend.models.gnotkg import GNotKG
+    from backend.export.historie import historie_csv
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[GNotKG.__table__])
+    with engine.begin() as conn:
+        conn.execute(GNotKG.__table__.insert(), [
+            {"user_id": 1 + i % 2, "geschaeftswert": 1000 * i, "vorgangsart": "Beurkundung", "gebuehr": 15.0} for i in range(25)
+        ])
+    bloecke = list(historie_csv("gnotkg", 1, zeilen_je_block=5, bind=engine))
+    assert len(bloecke) == 3
+    zeilen = b"".join(bloecke).decode("utf-8").splitlines()
+    assert zeilen[0] == "ID;Geschäftswert (€);Vorgangsart;Gebühr (€)"
+    assert len(zeilen) == 14 and zeilen[2] == "3;2000.0;Beurkundung;15.0"
+
+def test_rendere_pdf_batch():
+    from backend.export.pdf import rendere_pdf_batch, rendere_pdf
+    pdfs = rendere_pdf_batch([("gnotkg", {"geschaeftswert": 1000, "gebuehr": 15}), ("text", {"titel": "Vollmacht", "text": "Betrag: 5 €"})])
+    assert len(pdfs) == 2 and all(p.startswith(b"%PDF") for p in pdfs)
+    with pytest.raises(ValueError):
+        rendere_pdf("unbekannt", {})
+
+def test_exporter_registry():
+    import asyncio
+    from backend.export.registry import Exporter, _exporter, exporter_fuer, formate, registriere
+    assert formate()["gnotkg"] == ["csv", "pdf", "xlsx"]
+    exporter = exporter_fuer("erbpachtzins", "csv")
+    assert exporter.dateiname == "erbpachtzins.csv"
+    assert asyncio.run(exporter.erzeuge({"aktueller_zins": 100})).startswith("Aktueller Zins (€);100".encode())
+    with pytest.raises(KeyError):
+        exporter_fuer("gnotkg", "gedcom")
+
+    @registriere
+    class GnotkgJson(Exporter):
+        tool, format, media_type = "gnotkg", "json", "application/json"
+
+        async def erzeuge(self, data):
+            return b"{}"
+    assert exporter_fuer("gnotkg", "json").dateiname == "gnotkg.json"
+    _exporter.pop(("gnotkg", "json"))
+    # Unvollständige Exporter scheitern schon bei der Registrierung
+    from backend.export.formate.tabelle import CsvExporter
+    with pytest.raises(TypeError):
+        @registriere
+        class OhneZeilen(CsvExporter):
+            tool = "miteigentum"
+    assert ("miteigentum", "csv") not in _exporter
+
+def test_export_job_lebenszyklus(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from backend.config import settings
+    from backend.database.db import Base
+    from backend.models.exportjob import ExportJob
+    from backend.workers import jobs
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[ExportJob.__table__])
+    monkeypatch.setattr(jobs, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(settings, "EXPORT_JOB_DIR", str(tmp_path))
+
+    @jobs.job_art("test-zeilen")
+    def _zeilen(parameter, user_id, datei, fortschritt):
+        for i in range(parameter["anzahl"]):
+            datei.write(f"{i}\n".encode())
+            fortschritt(i + 1, parameter["anzahl"])
+        return "zeilen.txt", "text/plain"
+
+    db = jobs.SessionLocal()
+    for job_id, anzahl in (("a", 3), ("b", 2)):
+        db.add(ExportJob(id=job_id, user_id=1, art="test-zeilen", parameter=f'{{"anzahl": {anzahl}}}'))
+    db.commit()
+    # Ein vorheriger TestClient hat beim Herunterfahren stoppe_jobs aufgerufen
+    jobs._stopp.clear()
+    jobs.fuehre_job_aus("a")
+    job = db.get(ExportJob, "a")
+    db.refresh(job)
+    assert (job.status, job.erledigt, job.gesamt, job.dateiname) == ("fertig", 3, 3, "zeilen.txt")
+    assert open(job.datei, "rb").read() == b"0\n1\n2\n"
+
+    # Fortgesetzter Download: Teilbereich mit 206, unerfüllbarer Bereich mit 416
+    from fastapi.testclient import TestClient
+    from backend.auth.users import get_current_user
+    from backend.database.db import get_read_db
+    from backend.main import app
+    app.dependency_overrides[get_current_user] = lambda: type("Benutzer", (), {"id": 1, "role": "user"})()
+    app.dependency_overrides[get_read_db] = lambda: db
+    try:
+        url = "/export/export/jobs/a/download"
+        teil = TestClient(app).get(url, headers={"Range": "bytes=2-"})
+        assert teil.status_code == 206 and teil.content == b"1\n2\n"
+        assert teil.headers["content-range"] == "bytes 2-5/6"
+        assert TestClient(app).get(url, headers={"Range": "bytes=100-"}).status_code == 416
+    finally:
+        app.dependency_overrides.pop(get_current_user)
+        app.dependency_overrides.pop(get_read_db)
+
+    # Beim Herunterfahren abgebrochene Jobs bleiben in der Warteschlange
+    jobs.stoppe_jobs()
+    jobs.fuehre_job_aus("b")
+    job = db.get(ExportJob, "b")
+    db.refresh(job)
+    assert job.status == "wartend" and not (tmp_path / "b.tmp").exists()
+    jobs._stopp.clear()
+    jobs.JOB_ARTEN.pop("test-zeilen")
+
+def test_protokoll_schreibt_gebuendelt():
+    from sqlalchemy import create_engine, event, func, select
+    from sqlalchemy.pool import StaticPool
+    from backend.database.db import Base
+    from backend.models.erbpachtzins import Erbpachtzins
+    from backend.workers.protokoll import Protokoll
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[Erbpachtzins.__table__])
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    protokoll = Protokoll(batch_groesse=3, intervall_ms=50, bind=engine)
+    def anzahl():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(Erbpachtzins.__table__)).scalar()
+    for i in range(7):
+        protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": float(i)})
+    protokoll.leere()
+    assert anzahl() == 7
+    assert len(commits) <= 3
+    protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": 7.0})
+    # Herunterfahren schreibt noch gepufferte Zeilen
+    protokoll.stoppe()
+    assert anzahl() == 8
+
+def test_erbfolge_batch_stream_blockweise(client, monkeypatch):
+    import json
+    from sqlalchemy import func, select
+    from backend.auth.users import get_current_user
+    from backend.config import settings
+    from backend.database.db import SessionLocal
+    from backend.main import app
+    from backend.models.erbfolge import Erbfolge
+    class Benutzer:
+        id = 4242
+        role = "user"
+        username = "batch"
+    monkeypatch.setattr(settings, "BATCH_NACHLAESSE_JE_AUFGABE", 2)
+    app.dependency_overrides[get_current_user] = lambda: Benutzer()
+    erben = [{"id": "k1", "name": "Kind 1", "beziehung": "Kind"}, {"id": "k2", "name": "Kind 2", "beziehung": "Kind"}]
+    nachlaesse = [{"erblasser": f"E{i}", "vermoegenswert": 1000.0 * i, "erben": erben} for i in range(5)]
+    nachlaesse.insert(3, {"vermoegenswert": 1.0})  # ohne erblasser
+    try:
+        antwort = client.post("/tools/erbfolge/calculate-batch", json=nachlaesse)
+    finally:
+        app.dependency_overrides.pop(get_current_user)
+    zeilen = [json.loads(z) for z in antwort.text.splitlines()]
+    assert zeilen[-1] == {"gespeichert": 5}
+    ergebnisse = {z["index"]: z for z in zeilen[:-1]}
+    assert sorted(ergebnisse) == list(range(6)) and len(zeilen) == 7
+    assert "erblasser" in ergebnisse[3]["error"]
+    for index, nachlass in enumerate(nachlaesse):
+        if index != 3:
+            assert ergebnisse[index]["erblasser"] == nachlass["erblasser"]
+            assert ergebnisse[index]["ergebnisse"] == {"k1": 50.0, "k2": 50.0}
+    # Zeilen eines Blocks folgen aufeinander, in Reihenfolge des Blocks
+    reihenfolge = [z["index"] for z in zeilen[:-1]]
+    for block in ([0, 1], [2, 3], [4, 5]):
+        start = reihenfolge.index(block[0])
+        assert reihenfolge[start:start + 2] == block
+    with SessionLocal() as db:
+        assert db.execute(select(func.count()).select_from(Erbfolge).where(Erbfolge.user_id == 4242)).scalar() == 5
+
+def test_protokoll_behaelt_fehlgeschlagene_zeilen(tmp_path):
+    import json
+    import time
+    from datetime import datetime
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.pool import StaticPool
+    from backend.database.db import Base
+    from backend.models.erbpachtzins import Erbpachtzins
+    from backend.workers.protokoll import Protokoll
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    fehlerdatei = tmp_path / "fehler.ndjson"
+    protokoll = Protokoll(batch_groesse=10, intervall_ms=10, bind=engine, fehlerdatei=str(fehlerdatei))
+    protokoll.wiederholen_nach = 0.05
+    def anzahl():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(Erbpachtzins.__table__)).scalar()
+    # Tabelle fehlt: der Batch bleibt erhalten und wird später geschrieben
+    protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": 1.0})
+    protokoll.leere()
+    Base.metadata.create_all(bind=engine, tables=[Erbpachtzins.__table__])
+    protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": 2.0})
+    protokoll.leere()
+    assert anzahl() == 2
+    # Beim Herunterfahren nicht schreibbare Zeilen landen in der Fehlerdatei
+    Erbpachtzins.__table__.drop(engine)
+    protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": 3.0})
+    protokoll.stoppe()
+    erfasst = datetime.fromisoformat(json.loads(fehlerdatei.read_text())["werte"]["created_at"])
+    assert [json.loads(z)["werte"]["neuer_zins"] for z in fehlerdatei.read_text().splitlines()] == [3.0]
+    # Nach stoppe wird synchron geschrieben, nichts bleibt in der Warteschlange
+    Base.metadata.create_all(bind=engine, tables=[Erbpachtzins.__table__])
+    protokoll.schreibe(Erbpachtzins, {"user_id": 1, "neuer_zins": 4.0})
+    assert anzahl() == 1
+    # starte übernimmt die Fehlerdatei wieder, mit dem ursprünglichen Zeitstempel
+    time.sleep(0.01)
+    protokoll.starte()
+    protokoll.leere()
+    assert anzahl() == 2 and not fehlerdatei.exists()
+    with engine.connect() as conn:
+        zeitpunkt = conn.execute(select(Erbpachtzins.created_at).where(Erbpachtzins.neuer_zins == 3.0)).scalar()
+    assert zeitpunkt == erfasst
+    protokoll.stoppe()
+
+def test_pdf_batch_auth_und_dateinamen(client):
+    import io, zipfile
+    from backend.auth.users import get_current_user
+    from backend.main import app
+    url = "/export/export/pdf-batch"
+    bericht = {"layout": "text", "daten": {"titel": "T", "text": "x"}}
+    assert client.post(url, json={"berichte": [bericht]}).status_code == 401
+    assert client.get("/export/export/pdf/stats").status_code == 401
+    app.dependency_overrides[get_current_user] = lambda: type("Benutzer", (), {"id": 1, "role": "user"})()
+    try:
+        # Pool-Statistik nur für Administratoren
+        assert client.get("/export/export/pdf/stats").status_code == 403
+        assert client.post(url, json={"berichte": ["kein Objekt"]}).status_code == 422
+        antwort = client.post(url, json={"berichte": [
+            {**bericht, "dateiname": "../../etc/passwd"}, {**bericht, "dateiname": "vertrag"},
+            {**bericht, "dateiname": "vertrag.pdf"}, bericht
+        ]})
+    finally:
+        app.dependency_overrides.pop(get_current_user)
+    assert antwort.status_code == 200
+    namen = zipfile.ZipFile(io.BytesIO(antwort.content)).namelist()
+    assert namen == ["passwd.pdf", "vertrag.pdf", "vertrag-2.pdf", "00004_text.pdf"]
@@ -1,4 +1,9 @@
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import json
+import math
+import os
+import threading
+import numpy as np
 
 def berechne_erbpachtzins(aktueller_zins: float, alter_index: float, neuer_index: float) -> Dict:
     """
@@ -14,3 +19,266 @@ def berechne_erbpachtzins(aktueller_zins: float, alter_index: float, neuer_index
         "neuer_index": neuer_index,
         "neuer_zins": round(neuer_zins, 2)
     }
+
+# Klauseltypen: "voll" (Gleitklausel, volle Indexänderung) oder "anteilig"
+# (nur der im Feld "anteil" angegebene Teil der Änderung, z.B. 0.6)
+KLAUSELN = ("voll", "anteilig")
+
+
+def vertragswert(vertrag: Dict, feld: str, index: int, standard: Optional[float] = None) -> float:
+    """Endlicher Zahlenwert eines Vertragsfelds, sonst ValueError mit der Vertragsnummer"""
+    wert = vertrag.get(feld, standard)
+    if isinstance(wert, bool) or not isinstance(wert, (int, float)) or not math.isfinite(wert):
+        raise ValueError(f"{feld} von Vertrag {index} muss eine endliche Zahl sein.")
+    return float(wert)
+
+
+def monat_nummer(monate: Union[str, Sequence[str]]) -> np.ndarray:
+    """Monate im Format YYYY-MM als fortlaufende Nummer (Monate seit 1970-01)"""
+    return np.asarray(monate, dtype="datetime64[M]").astype(np.int64)
+
+
+class VPIReihe:
+    """
+    Verbraucherpreisindex als dichtes Array, ein Eintrag je Monat ab dem
+    ersten Monat der Reihe. Fehlende Monate sind NaN; der Zugriff auf einen
+    Monat ist ein Array-Index.
+    """
+
+    def __init__(self, monate: Sequence[str], werte: Sequence[float]):
+        nummern = monat_nummer(monate)
+        if nummern.size == 0:
+            raise ValueError("VPI-Reihe ist leer.")
+        self.start = int(nummern.min())
+        self.werte = np.full(int(nummern.max()) - self.start + 1, np.nan)
+        self.werte[nummern - self.start] = np.asarray(werte, dtype=float)
+
+    @classmethod
+    def aus_dict(cls, reihe: Dict[str, float]) -> "VPIReihe":
+        return cls(list(reihe.keys()), list(reihe.values()))
+
+    @classmethod
+    def laden(cls, pfad: str) -> "VPIReihe":
+        """
+        Lädt eine mit ``speichern`` abgelegte Reihe. Die Werte werden nicht
+        eingelesen, sondern schreibgeschützt in den Speicher eingeblendet
+        (mmap) und so von allen Anfragen eines Workers geteilt. Dateien im
+        früheren Format (nur Werte, Startmonat in <pfad>.json) werden
+        weiterhin gelesen.
+        """
+        daten = np.load(pfad, mmap_mode="r")
+        reihe = cls.__new__(cls)
+        if daten.dtype.names:
+            reihe.start = int(daten["start"])
+            reihe.werte = daten["werte"]
+        else:
+            with open(pfad + ".json", encoding="utf-8") as f:
+                reihe.start = int(monat_nummer(json.load(f)["start"]))
+            reihe.werte = daten
+        return reihe
+
+    def speichern(self, pfad: str) -> None:
+        """
+        Schreibt Startmonat und Werte in eine .npy-Datei (ein Datensatz mit
+        den Feldern ``start`` und ``werte``) und ersetzt die bisherige Datei
+        atomar. Leser sehen so immer Startmonat und Werte desselben Stands.
+        """
+        werte = np.asarray(self.werte, dtype=np.float64)
+        daten = np.zeros((), dtype=[("start", np.int64), ("werte", np.float64, (werte.size,))])
+        daten["start"] = self.start
+        daten["werte"] = werte
+        tmp = pfad + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, daten)
+        os.replace(tmp, pfad)
+        # Startmonat des früheren Formats, wird nicht mehr gelesen
+        if os.path.exists(pfad + ".json"):
+            os.remove(pfad + ".json")
+
+    @property
+    def letzter_monat(self) -> str:
+        return str(np.datetime64(self.start + self.werte.size - 1, "M"))
+
+    def index_fuer(self, monate: Union[str, Sequence[str]]) -> np.ndarray:
+        """Indexwerte für Monate (vektorisiert), NaN außerhalb der Reihe"""
+        pos = monat_nummer(monate) - self.start
+        gueltig = (pos >= 0) & (pos < self.werte.size)
+        return np.where(gueltig, self.werte[np.clip(pos, 0, self.werte.size - 1)], np.nan)
+
+    def _suchtabellen(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Kumulierte Log-Verhältnisse L[t] = log(I[t]), damit I[t] / I[b] = exp(L[t] - L[b]),
+        und Sparse Tables (Stufe x Monat) für Bereichsmaximum und -minimum von L
+        """
+        tabellen = getattr(self, "_tabellen", None)
+        if tabellen is None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                log = np.log(np.asarray(self.werte, dtype=float))
+            stufen = max(int(log.size).bit_length(), 1)
+            maxima = np.full((stufen, log.size), -np.inf)
+            minima = np.full((stufen, log.size), np.inf)
+            maxima[0] = np.where(np.isnan(log), -np.inf, log)
+            minima[0] = np.where(np.isnan(log), np.inf, log)
+            for k in range(1, stufen):
+                breite = 1 << (k - 1)
+                maxima[k, :-breite] = np.maximum(maxima[k - 1, :-breite], maxima[k - 1, breite:])
+                minima[k, :-breite] = np.minimum(minima[k - 1, :-breite], minima[k - 1, breite:])
+            tabellen = self._tabellen = (log, maxima, minima)
+        return tabellen
+
+    def erste_ueberschreitung(self, basis_pos: np.ndarray, schwellen: np.ndarray) -> np.ndarray:
+        """
+        Erste Position t > b, an der sich der Index gegenüber der Basis b um
+        mindestens die Schwelle (nach oben oder unten) verändert hat, -1 wenn
+        keine. Binäre Suche mit Bereichsmaximum/-minimum, vektorisiert über
+        alle Basispositionen: O(log n) je Vertrag statt eines linearen Scans.
+        """
+        log, maxima, minima = self._suchtabellen()
+        n = log.size
+        basis_pos = np.asarray(basis_pos, dtype=np.int64)
+        basis_log = log[basis_pos]
+        oben = basis_log + np.log1p(schwellen)
+        with np.errstate(divide="ignore"):
+            unten = basis_log + np.log1p(-np.minimum(schwellen, 1.0))
+        von = np.minimum(basis_pos + 1, n - 1)
+
+        def ueberschritten(bis: np.ndarray) -> np.ndarray:
+            # Bereich [basis + 1, bis] über zwei sich überlappende Zweierpotenz-Fenster
+            stufe = np.log2(np.maximum(bis - von + 1, 1)).astype(np.int64)
+            rechts = bis - (1 << stufe) + 1
+            hoch = np.maximum(maxima[stufe, von], maxima[stufe, rechts])
+            tief = np.minimum(minima[stufe, von], minima[stufe, rechts])
+            return (hoch >= oben) | (tief <= unten)
+
+        lo = von.copy()
+        hi = np.full(basis_pos.size, n - 1)
+        moeglich = (basis_pos + 1 < n) & ueberschritten(hi)
+        while True:
+            offen = moeglich & (lo < hi)
+            if not offen.any():
+                break
+            mitte = (lo + hi) // 2
+            treffer = ueberschritten(mitte)
+            hi = np.where(offen & treffer, mitte, hi)
+            lo = np.where(offen & ~treffer, mitte + 1, lo)
+        return np.where(moeglich, lo, -1)
+
+
+def berechne_erbpachtzins_portfolio(vertraege: List[Dict], vpi: VPIReihe, ziel_monat: Optional[str] = None) -> Dict:
+    """
+    Passt alle Verträge eines Portfolios in einem vektorisierten Durchlauf an.
+
+    Jeder Vertrag enthält ``aktueller_zins``, ``basis_monat`` (YYYY-MM, Monat
+    des zuletzt zugrunde gelegten Index) und ``klausel`` (siehe KLAUSELN).
+    Optional sind ``anteil`` für anteilige Klauseln und ``schwelle`` (z.B.
+    0.05): Ändert sich der Index um weniger, bleibt der Zins unverändert.
+    Fehlende oder nicht endliche Zahlenwerte ergeben einen ValueError.
+    """
+    ziel_monat = ziel_monat or vpi.letzter_monat
+    neuer_index = float(vpi.index_fuer(ziel_monat))
+    if np.isnan(neuer_index):
+        raise ValueError(f"Kein VPI-Wert für {ziel_monat}.")
+
+    zins = np.empty(len(vertraege))
+    anteil = np.empty(len(vertraege))
+    schwelle = np.empty(len(vertraege))
+    for i, v in enumerate(vertraege):
+        klausel = v.get("klausel", "voll")
+        if klausel not in KLAUSELN:
+            raise ValueError(f"Unbekannter Klauseltyp: {klausel}")
+        zins[i] = vertragswert(v, "aktueller_zins", i)
+        anteil[i] = vertragswert(v, "anteil", i, 1.0) if klausel == "anteilig" else 1.0
+        schwelle[i] = vertragswert(v, "schwelle", i, 0.0)
+    alter_index = vpi.index_fuer([v["basis_monat"] for v in vertraege])
+
+    fehlend = np.flatnonzero(np.isnan(alter_index) | (alter_index == 0))
+    if fehlend.size:
+        raise ValueError(f"Kein VPI-Wert für basis_monat der Verträge {fehlend.tolist()}.")
+
+    aenderung = neuer_index / alter_index - 1
+    angepasst = np.abs(aenderung) >= schwelle
+    neuer_zins = np.round(np.where(angepasst, zins * (1 + anteil * aenderung), zins), 2)
+
+    return {
+        "ziel_monat": ziel_monat,
+        "neuer_index": neuer_index,
+        "vertraege": [
+            {
+                "id": v.get("id"),
+                "aktueller_zins": v["aktueller_zins"],
+                "alter_index": a,
+                "neuer_index": neuer_index,
+                "angepasst": g,
+                "neuer_zins": z
+            }
+            for v, a, g, z in zip(vertraege, alter_index.tolist(), angepasst.tolist(), neuer_zins.tolist())
+        ]
+    }
+
+
+def berechne_schwellen_anpassung(vertraege: List[Dict], vpi: VPIReihe) -> List[Dict]:
+    """
+    Sucht für Wertsicherungsklauseln mit Schwelle (z.B. ``"schwelle": 0.05``
+    für "mehr als 5 % seit der letzten Anpassung") den ersten Monat nach
+    ``basis_monat``, in dem die Schwelle erreicht wird, und den daraus
+    folgenden Zins. Klauseln wie in ``berechne_erbpachtzins_portfolio``;
+    jede Klausel braucht hier eine Schwelle größer als 0 (ValueError).
+    """
+    for i, v in enumerate(vertraege):
+        klausel = v.get("klausel", "voll")
+        if klausel not in KLAUSELN:
+            raise ValueError(f"Unbekannter Klauseltyp in Vertrag {i}: {klausel}")
+        if not vertragswert(v, "schwelle", i, 0.0) > 0:
+            raise ValueError(f"Schwelle von Vertrag {i} muss größer als 0 sein.")
+    zins = np.array([vertragswert(v, "aktueller_zins", i) for i, v in enumerate(vertraege)])
+    basis_pos = monat_nummer([v["basis_monat"] for v in vertraege]) - vpi.start
+    schwellen = np.array([v["schwelle"] for v in vertraege], dtype=float)
+    anteil = np.array([
+        vertragswert(v, "anteil", i, 1.0) if v.get("klausel", "voll") == "anteilig" else 1.0
+        for i, v in enumerate(vertraege)
+    ])
+
+    ausserhalb = np.flatnonzero((basis_pos < 0) | (basis_pos >= vpi.werte.size))
+    if ausserhalb.size == 0:
+        ausserhalb = np.flatnonzero(np.isnan(vpi.werte[basis_pos]))
+    if ausserhalb.size:
+        raise ValueError(f"Kein VPI-Wert für basis_monat der Verträge {ausserhalb.tolist()}.")
+
+    treffer = vpi.erste_ueberschreitung(basis_pos, schwellen)
+    gefunden = treffer >= 0
+    alter_index = np.asarray(vpi.werte[basis_pos], dtype=float)
+    neuer_index = np.where(gefunden, vpi.werte[np.maximum(treffer, 0)], np.nan)
+    neuer_zins = np.round(np.where(gefunden, zins * (1 + anteil * (neuer_index / alter_index - 1)), zins), 2)
+
+    erster_monat = np.where(gefunden, (vpi.start + treffer).astype("datetime64[M]").astype(str), None).tolist()
+    neuer_index = np.where(gefunden, neuer_index, None).tolist()
+    alter_index = alter_index.tolist()
+    neuer_zins = neuer_zins.tolist()
+    return [
+        {
+            "id": v.get("id"),
+            "basis_monat": v["basis_monat"],
+            "alter_index": alter_index[i],
+            "erster_monat": erster_monat[i],
+            "neuer_index": neuer_index[i],
+            "neuer_zins": neuer_zins[i]
+        }
+        for i, v in enumerate(vertraege)
+    ]
+
+
+_vpi_lock = threading.Lock()
+_vpi_geladen: Dict[str, Tuple[tuple, VPIReihe]] = {}
+
+
+def lade_vpi_reihe(pfad: str) -> VPIReihe:
+    """Gespeicherte Reihe, neu eingeblendet sobald die Datei ersetzt wurde"""
+    info = os.stat(pfad)
+    # os.replace in speichern legt eine neue Datei (neue Inode) an
+    stand = (info.st_ino, info.st_mtime_ns, info.st_size)
+    geladen = _vpi_geladen.get(pfad)
+    if geladen is None or geladen[0] != stand:
+        with _vpi_lock:
+            geladen = (stand, VPIReihe.laden(pfad))
+            _vpi_geladen[pfad] = geladen
+    return geladen[1]
@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_left, bisect_right
+from datetime import date
+import json
+import logging
+import math
+import os
+import threading
+import time
+import numpy as np
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Mitgelieferte Tabellen, überschreibbar über settings.GEBUEHRENTABELLEN_DIR
+STANDARD_VERZEICHNIS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "gebuehrentabellen")
+
+
+class Gebuehrentabelle:
+    """
+    Gebührentabelle als sortierte Arrays.
+
+    Für jede Stufe werden Untergrenze, Gebühr an der Untergrenze, Schrittweite
+    und Erhöhung einmalig vorberechnet; eine Gebühr ergibt sich dann aus einer
+    binären Suche und einer Rechenoperation. ``gebuehr`` arbeitet auf einem
+    einzelnen Wert, ``gebuehren`` vektorisiert auf NumPy-Arrays.
+    """
+
+    def __init__(self, grundgebuehr: float, stufen: Sequence[Tuple[float, float, float]], grundwert: float = 500,
+                 name: str = "", gueltig_ab: Optional[date] = None):
+        self.name = name
+        self.gueltig_ab = gueltig_ab
+        self.grundgebuehr = float(grundgebuehr)
+        untergrenzen, basis = [], []
+        untergrenze, gebuehr = float(grundwert), float(grundgebuehr)
+        for obergrenze, schritt, erhoehung in stufen:
+            untergrenzen.append(untergrenze)
+            basis.append(gebuehr)
+            if obergrenze != math.inf:
+                gebuehr += math.ceil((obergrenze - untergrenze) / schritt) * erhoehung
+                untergrenze = float(obergrenze)
+        self._untergrenzen = untergrenzen
+        self._basis = basis
+        self._schritte = [float(s[1]) for s in stufen]
+        self._erhoehungen = [float(s[2]) for s in stufen]
+        self.untergrenzen = np.array(untergrenzen)
+        self.basis = np.array(basis)
+        self.schritte = np.array(self._schritte)
+        self.erhoehungen = np.array(self._erhoehungen)
+
+    @classmethod
+    def aus_datei(cls, pfad: str) -> "Gebuehrentabelle":
+        with open(pfad, encoding="utf-8") as f:
+            daten = json.load(f)
+        stufen = [
+            (math.inf if s["bis"] is None else s["bis"], s["je"], s["um"])
+            for s in daten["stufen"]
+        ]
+        return cls(
+            daten["grundgebuehr"], stufen, daten.get("grundwert", 500),
+            name=daten["tabelle"], gueltig_ab=date.fromisoformat(daten["gueltig_ab"])
+        )
+
+    def gebuehr(self, geschaeftswert: float) -> float:
+        """Volle (1,0) Gebühr für einen Geschäftswert"""
+        i = bisect_left(self._untergrenzen, geschaeftswert) - 1
+        if i < 0:
+            return self.grundgebuehr
+        schritte = math.ceil((geschaeftswert - self._untergrenzen[i]) / self._schritte[i])
+        return self._basis[i] + schritte * self._erhoehungen[i]
+
+    def gebuehren(self, geschaeftswerte: np.ndarray) -> np.ndarray:
+        """Volle (1,0) Gebühren für ein Array von Geschäftswerten"""
+        werte = np.asarray(geschaeftswerte, dtype=float)
+        i = np.searchsorted(self.untergrenzen, werte, side="left") - 1
+        j = np.maximum(i, 0)
+        schritte = np.ceil((werte - self.untergrenzen[j]) / self.schritte[j])
+        return np.where(i < 0, self.grundgebuehr, self.basis[j] + schritte * self.erhoehungen[j])
+
+
+class _Stand:
+    """Unveränderlicher Ladestand: je Tabelle die Versionen sortiert nach Gültigkeitsbeginn"""
+
+    def __init__(self, versionen: Dict[str, List[Gebuehrentabelle]], signatur: tuple):
+        self.signatur = signatur
+        self.versionen = versionen
+        self.ab_ordinal = {
+            name: np.array([v.gueltig_ab.toordinal() for v in liste])
+            for name, liste in versionen.items()
+        }
+
+
+class Gebuehrentabellen:
+    """
+    Versionierte Gebührentabellen mit Intervallindex über das Gültigkeitsdatum.
+
+    Jede JSON-Datei im Verzeichnis beschreibt eine Tabelle (A oder B) ab einem
+    Stichtag; sie gilt bis zum Beginn der nächsten Version derselben Tabelle.
+    Geänderte Dateien werden spätestens nach ``reload_sekunden`` erkannt. Ein
+    neuer Stand wird vollständig aufgebaut und dann mit einer einzigen
+    Zuweisung aktiviert, Anfragen sehen also immer einen konsistenten Stand.
+    Unveränderte Dateien behalten ihre vorberechneten Arrays. Ist ein
+    geänderter Stand fehlerhaft (z.B. halb geschriebene Datei), bleibt der
+    bisherige aktiv, bis sich die Dateien erneut ändern.
+    """
+
+    def __init__(self, verzeichnis: str, reload_sekunden: float = 30):
+        self.verzeichnis = verzeichnis
+        self.reload_sekunden = reload_sekunden
+        self._lock = threading.Lock()
+        self._geprueft = 0.0
+        self._fehlerhaft: Optional[tuple] = None
+        self._stand: Optional[_Stand] = None
+        self._dateien: Dict[tuple, Gebuehrentabelle] = {}
+
+    def _signatur(self) -> tuple:
+        eintraege = []
+        for name in sorted(os.listdir(self.verzeichnis)):
+            if name.endswith(".json"):
+                info = os.stat(os.path.join(self.verzeichnis, name))
+                eintraege.append((name, info.st_mtime_ns, info.st_size))
+        return tuple(eintraege)
+
+    def neu_laden(self, signatur: Optional[tuple] = None) -> None:
+        """Liest das Verzeichnis ein und aktiviert den neuen Stand atomar"""
+        with self._lock:
+            signatur = signatur if signatur is not None else self._signatur()
+            dateien, versionen = {}, {}
+            for eintrag in signatur:
+                tabelle = self._dateien.get(eintrag)
+                if tabelle is None:
+                    tabelle = Gebuehrentabelle.aus_datei(os.path.join(self.verzeichnis, eintrag[0]))
+                dateien[eintrag] = tabelle
+                versionen.setdefault(tabelle.name, []).append(tabelle)
+            for liste in versionen.values():
+                liste.sort(key=lambda t: t.gueltig_ab)
+            self._dateien = dateien
+            self._stand = _Stand(versionen, signatur)
+            self._fehlerhaft = None
+            self._geprueft = time.monotonic()
+
+    def stand(self) -> _Stand:
+        stand = self._stand
+        if stand is None:
+            self.neu_laden()
+            return self._stand
+        if time.monotonic() - self._geprueft >= self.reload_sekunden:
+            self._geprueft = time.monotonic()
+            try:
+                signatur = self._signatur()
+            except OSError:
+                logger.exception("Gebührentabellen in %s nicht lesbar, bisheriger Stand bleibt aktiv", self.verzeichnis)
+                return stand
+            if signatur != stand.signatur and signatur != self._fehlerhaft:
+                try:
+                    self.neu_laden(signatur)
+                except Exception:
+                    # Anders als beim ersten Laden gibt es einen Stand, der weiter gilt
+                    logger.exception("Gebührentabellen in %s fehlerhaft, bisheriger Stand bleibt aktiv", self.verzeichnis)
+                    self._fehlerhaft = signatur
+                    return stand
+                return self._stand
+        return stand
+
+    def tabelle(self, name: str, stichtag: Optional[date] = None) -> Gebuehrentabelle:
+        """Die am Stichtag gültige Version einer Tabelle, O(log n)"""
+        stand = self.stand()
+        versionen = stand.versionen.get(name)
+        if not versionen:
+            raise ValueError(f"Unbekannte Gebührentabelle: {name}")
+        stichtag = stichtag or date.today()
+        i = bisect_right(stand.ab_ordinal[name], stichtag.toordinal()) - 1
+        if i < 0:
+            raise ValueError(f"Keine Gebührentabelle {name} gültig am {stichtag.isoformat()}")
+        return versionen[i]
+
+    def versionen_fuer(self, name: str, stichtage: Sequence[date]) -> Tuple[List[Gebuehrentabelle], np.ndarray]:
+        """Versionsindex je Stichtag (vektorisiert) und die Liste der Versionen"""
+        stand = self.stand()
+        versionen = stand.versionen.get(name)
+        if not versionen:
+            raise ValueError(f"Unbekannte Gebührentabelle: {name}")
+        ordinale = np.fromiter((d.toordinal() for d in stichtage), dtype=np.int64, count=len(stichtage))
+        index = np.searchsorted(stand.ab_ordinal[name], ordinale, side="right") - 1
+        if (index < 0).any():
+            raise ValueError(f"Keine Gebührentabelle {name} gültig am {stichtage[int(np.argmin(index))].isoformat()}")
+        return versionen, index
+
+
+gebuehrentabellen = Gebuehrentabellen(
+    settings.GEBUEHRENTABELLEN_DIR or STANDARD_VERZEICHNIS,
+    settings.GEBUEHRENTABELLEN_RELOAD_SEKUNDEN
+)
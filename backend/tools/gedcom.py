@@ -1,166 +1,422 @@
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Hashable, Union
+import codecs
 import re
-import uuid
 
-def parse_gedcom_content(content: str) -> Dict[str, Any]:
+# Bump when the parse result changes, invalidates stored trees
+GEDCOM_PARSER_VERSION = 3
+
+# Default read size for streamed uploads (1 MiB)
+GEDCOM_CHUNK_SIZE = 1 << 20
+
+# GEDCOM line format: LEVEL [@XREF@] TAG [VALUE], one match per line of a chunk
+_LINE_RE = re.compile(r'^[ \t]*(\d+)[ \t]+(?:@([^@\s]+)@[ \t]*)?(\w+)(?:[ \t]+([^\n]*))?', re.M)
+# Name formats like "John /Doe/" or "John Doe"
+_NAME_RE = re.compile(r'([^/]*)(?:/([^/]*)/?)?(.*)')
+_ISO_DATE_RE = re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})')
+_GEDCOM_DATE_RE = re.compile(r'(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})')
+_YEAR_RE = re.compile(r'\b(\d{4})\b')
+
+_MONTH_MAP = {
+    'JAN': '01', 'FEB': '02', 'MAR': '03', 'APR': '04', 'MAY': '05', 'JUN': '06',
+    'JUL': '07', 'AUG': '08', 'SEP': '09', 'OCT': '10', 'NOV': '11', 'DEC': '12'
+}
+_MONTH_NAMES = {number: name for name, number in _MONTH_MAP.items()}
+
+# Level-1 event tags whose DATE sub-record is kept
+_EVENTS = {"BIRT": "birth", "DEAT": "death"}
+
+
+class GedcomStreamParser:
     """
-    Parse a GEDCOM file content and return structured data
-    for the Erbfolge calculator
+    Incremental GEDCOM parser.
+
+    Chunks (bytes or str) are fed in arbitrary sizes; only the trailing
+    partial line of the previous chunk is buffered. Individuals and families
+    are indexed by xref while reading, so memory grows with the number of
+    records instead of the size of the raw file.
     """
-    lines = content.split('\n')
-    individuals = {}
-    families = {}
-    current_entity = None
-    current_type = None
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # Parse GEDCOM line format: LEVEL [XREF] TAG [VALUE]
-        parts = re.match(r'(\d+)\s+(?:@(\w+)@)?\s*(\w+)(?:\s+(.*))?', line)
-        if not parts:
-            continue
-            
-        level, xref, tag, value = parts.groups()
-        level = int(level)
-        
-        if level == 0:
+
+    def __init__(self, encoding: str = "utf-8-sig"):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._rest = ""
+        self.individuals: Dict[str, Dict[str, Any]] = {}
+        self.families: Dict[str, Dict[str, Any]] = {}
+        self.bytes_read = 0
+        self.lines_read = 0
+        self._entity: Optional[Dict[str, Any]] = None
+        self._type: Optional[str] = None
+        self._event: Optional[str] = None
+
+    def feed(self, chunk: Union[bytes, str]) -> None:
+        """Consume the next chunk of the file"""
+        if isinstance(chunk, bytes):
+            self.bytes_read += len(chunk)
+            chunk = self._decoder.decode(chunk)
+        else:
+            self.bytes_read += len(chunk)
+        if not chunk:
+            return
+        text = self._rest + chunk
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        cut = text.rfind("\n")
+        if cut < 0:
+            self._rest = text
+            return
+        self._rest = text[cut + 1:]
+        self._tokenize(text[:cut])
+
+    def close(self) -> Dict[str, Any]:
+        """Flush the remaining buffer and return the Erbfolge data"""
+        text = self._rest + self._decoder.decode(b"", final=True)
+        self._rest = ""
+        if text:
+            self._tokenize(text.replace("\r", "\n"))
+        return build_erbfolge_daten(self.individuals, self.families)
+
+    def _tokenize(self, text: str) -> None:
+        tokens = _LINE_RE.findall(text)
+        self.lines_read += len(tokens)
+        handle = self._handle
+        for level, xref, tag, value in tokens:
+            handle(level, xref, tag, value)
+
+    def _handle(self, level: str, xref: str, tag: str, value: str) -> None:
+        if level == "0":
+            self._event = None
             if tag == "INDI" and xref:
                 # Individual record
-                current_type = "INDI"
-                current_entity = {"id": xref, "type": "individual"}
-                individuals[xref] = current_entity
+                self._type = "INDI"
+                self._entity = {"id": xref}
+                self.individuals[xref] = self._entity
             elif tag == "FAM" and xref:
                 # Family record
-                current_type = "FAM"
-                current_entity = {"id": xref, "type": "family", "children": []}
-                families[xref] = current_entity
+                self._type = "FAM"
+                self._entity = {"id": xref, "children": []}
+                self.families[xref] = self._entity
             else:
-                current_type = None
-                current_entity = None
-        elif current_entity:
-            # Add data to current entity
-            if current_type == "INDI":
-                if tag == "NAME" and value:
-                    # Parse name formats like "John /Doe/" or "John Doe"
-                    name_parts = re.match(r'(.*?)(?:/(.*)/)?(.*)?', value)
-                    if name_parts:
-                        first, last, suffix = name_parts.groups()
-                        current_entity["first_name"] = first.strip() if first else ""
-                        current_entity["last_name"] = last.strip() if last else ""
-                elif tag == "BIRT":
-                    current_entity["birth"] = {}
-                elif tag == "DEAT":
-                    current_entity["death"] = {}
-                elif tag == "DATE" and value:
-                    # Check parent context (birth or death)
-                    if "birth" in current_entity and not current_entity.get("birth", {}).get("date"):
-                        current_entity["birth"]["date"] = normalize_date(value)
-                    elif "death" in current_entity and not current_entity.get("death", {}).get("date"):
-                        current_entity["death"]["date"] = normalize_date(value)
+                self._type = None
+                self._entity = None
+            return
+
+        entity = self._entity
+        if entity is None:
+            return
+
+        if self._type == "INDI":
+            if level == "1":
+                self._event = _EVENTS.get(tag)
+                if self._event:
+                    event = entity.setdefault(self._event, {})
+                    if value.strip() == "Y":
+                        # Event known to have happened, date unknown ("1 DEAT Y")
+                        event["known"] = True
+                elif tag == "NAME" and value:
+                    name_parts = _NAME_RE.match(value)
+                    first, last, suffix = name_parts.groups()
+                    entity["first_name"] = first.strip() if first else ""
+                    entity["last_name"] = last.strip() if last else ""
                 elif tag == "FAMC" and value:
                     # Child in family
-                    current_entity["child_in_family"] = value.strip("@")
+                    entity["child_in_family"] = value.strip().strip("@")
                 elif tag == "FAMS" and value:
                     # Spouse in family
-                    current_entity["spouse_in_family"] = value.strip("@")
-            elif current_type == "FAM":
-                if tag == "HUSB" and value:
-                    current_entity["husband"] = value.strip("@")
-                elif tag == "WIFE" and value:
-                    current_entity["wife"] = value.strip("@")
-                elif tag == "CHIL" and value:
-                    current_entity["children"].append(value.strip("@"))
-    
-    # Convert to Erbfolge format
+                    entity["spouse_in_family"] = value.strip().strip("@")
+            elif tag == "DATE" and self._event and level == "2" and value:
+                event = entity[self._event]
+                if not event.get("date"):
+                    event["date"] = normalize_date(value)
+        elif self._type == "FAM" and level == "1" and value:
+            value = value.strip()
+            if tag == "HUSB":
+                entity["husband"] = value.strip("@")
+            elif tag == "WIFE":
+                entity["wife"] = value.strip("@")
+            elif tag == "CHIL":
+                entity["children"].append(value.strip("@"))
+
+
+def parse_gedcom_stream(chunks: Iterable[Union[bytes, str]]) -> Dict[str, Any]:
+    """
+    Parse GEDCOM data from an iterable of chunks (e.g. a file opened in
+    binary mode and read block-wise) without loading it as a whole
+    """
+    parser = GedcomStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def parse_gedcom_content(content: str) -> Dict[str, Any]:
+    """
+    Parse a GEDCOM file content and return structured data
+    for the Erbfolge calculator
+    """
+    return parse_gedcom_stream((content,))
+
+
+def _person(individual: Dict[str, Any], beziehung: str) -> Dict[str, Any]:
+    # The xref is used as id so results stay stable across re-uploads
+    return {
+        "id": individual["id"],
+        "beziehung": beziehung,
+        "vorname": individual.get("first_name", ""),
+        "nachname": individual.get("last_name", ""),
+        "geburtsdatum": individual.get("birth", {}).get("date", ""),
+        "sterbedatum": individual.get("death", {}).get("date", "") or ("verstorben" if individual.get("death", {}).get("known") else "")
+    }
+
+
+def build_erbfolge_daten(individuals: Dict[str, Dict[str, Any]], families: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert the INDI/FAM indexes into the Erbfolge format
+    """
     erben = []
     erblasser_name = "Erblasser"  # Default name
-    
+
     # First individual as default erblasser
-    if individuals and list(individuals.keys()):
-        first_indi = individuals[list(individuals.keys())[0]]
+    if individuals:
+        first_indi = next(iter(individuals.values()))
         erblasser_name = f"{first_indi.get('first_name', '')} {first_indi.get('last_name', '')}".strip()
-    
+
     # Process families to determine relationships
-    for fam_id, family in families.items():
+    added_ids = set()
+    for family in families.values():
         husband_id = family.get("husband")
         wife_id = family.get("wife")
-        children = family.get("children", [])
-        
+
         # Add spouse relationship
-        if husband_id and wife_id and husband_id in individuals and wife_id in individuals:
-            spouse = individuals[wife_id]
-            erben.append({
-                "id": str(uuid.uuid4()),
-                "beziehung": "ehepartner",
-                "vorname": spouse.get("first_name", ""),
-                "nachname": spouse.get("last_name", ""),
-                "geburtsdatum": spouse.get("birth", {}).get("date", ""),
-                "sterbedatum": spouse.get("death", {}).get("date", "")
-            })
-        
+        if husband_id and wife_id and husband_id in individuals and wife_id in individuals and wife_id not in added_ids:
+            erben.append(_person(individuals[wife_id], "ehepartner"))
+            added_ids.add(wife_id)
+
         # Add children relationship
-        for child_id in children:
-            if child_id in individuals:
-                child = individuals[child_id]
-                erben.append({
-                    "id": str(uuid.uuid4()),
-                    "beziehung": "kind",
-                    "vorname": child.get("first_name", ""),
-                    "nachname": child.get("last_name", ""),
-                    "geburtsdatum": child.get("birth", {}).get("date", ""),
-                    "sterbedatum": child.get("death", {}).get("date", "")
-                })
-    
+        for child_id in family.get("children", []):
+            if child_id in individuals and child_id not in added_ids:
+                erben.append(_person(individuals[child_id], "kind"))
+                added_ids.add(child_id)
+
     # Add other individuals as relatives
-    added_ids = set([person.get("id", "") for person in erben])
     for indi_id, individual in individuals.items():
         if indi_id not in added_ids:
-            erben.append({
-                "id": str(uuid.uuid4()),
-                "beziehung": "geschwister",  # Default to siblings for simplicity
-                "vorname": individual.get("first_name", ""),
-                "nachname": individual.get("last_name", ""),
-                "geburtsdatum": individual.get("birth", {}).get("date", ""),
-                "sterbedatum": individual.get("death", {}).get("date", "")
-            })
-    
+            erben.append(_person(individual, "geschwister"))  # Default to siblings for simplicity
+
     return {
         "personen": erben,
         "erblasserName": erblasser_name
     }
 
+def apply_person_overrides(personen: List[Dict[str, Any]], overrides: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Patch the persons of a stored tree by id (e.g. corrected "beziehung");
+    overrides with an unknown id are appended as additional persons
+    """
+    by_id = {p["id"]: p for p in overrides if "id" in p}
+    merged = [{**p, **by_id.pop(p["id"])} if p["id"] in by_id else p for p in personen]
+    merged.extend(p for p in overrides if p.get("id") in by_id)
+    return merged
+
 def normalize_date(date_string: str) -> str:
     """
     Attempt to normalize GEDCOM date formats into YYYY-MM-DD
     """
     # Try to parse common date formats
     date_string = date_string.strip()
-    
+
     # Handle ISO format
-    iso_match = re.match(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})', date_string)
+    iso_match = _ISO_DATE_RE.match(date_string)
     if iso_match:
         year, month, day = iso_match.groups()
         return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    
+
     # Handle GEDCOM format like "12 JAN 1980"
-    gedcom_match = re.match(r'(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})', date_string)
+    gedcom_match = _GEDCOM_DATE_RE.match(date_string)
     if gedcom_match:
         day, month, year = gedcom_match.groups()
-        month_map = {
-            'JAN': '01', 'FEB': '02', 'MAR': '03', 'APR': '04', 'MAY': '05', 'JUN': '06',
-            'JUL': '07', 'AUG': '08', 'SEP': '09', 'OCT': '10', 'NOV': '11', 'DEC': '12'
-        }
-        month_num = month_map.get(month.upper(), '01')
+        month_num = _MONTH_MAP.get(month.upper(), '01')
         return f"{year}-{month_num}-{day.zfill(2)}"
-    
+
     # If only year is available
-    year_match = re.match(r'\b(\d{4})\b', date_string)
+    year_match = _YEAR_RE.match(date_string)
     if year_match:
         return f"{year_match.group(1)}-01-01"
-    
+
     # Return as is if no matches
     return date_string
+
+
+def gedcom_date(date_string: str) -> str:
+    """
+    Convert YYYY-MM-DD (as produced by normalize_date) into the GEDCOM
+    form "12 JAN 1980"; anything else is passed through
+    """
+    iso_match = _ISO_DATE_RE.match(date_string or "")
+    if iso_match:
+        year, month, day = iso_match.groups()
+        return f"{int(day)} {_MONTH_NAMES.get(month.zfill(2), 'JAN')} {year}"
+    return date_string
+
+
+def _gedcom_name(person: Dict[str, Any]) -> str:
+    if person.get("vorname") or person.get("nachname"):
+        return f"{person.get('vorname', '')} /{person.get('nachname', '')}/".strip()
+    return person.get("name") or "//"
+
+
+class _Familie:
+    __slots__ = ("xref", "husband", "wife", "children")
+
+    def __init__(self, xref: str):
+        self.xref = xref
+        self.husband: Optional[str] = None
+        self.wife: Optional[str] = None
+        self.children: List[str] = []
+
+
+def write_gedcom_stream(
+    erben: List[Dict[str, Any]],
+    erblasser_name: str = "Erblasser",
+    ergebnisse: Optional[Dict[Any, float]] = None,
+    chunk_size: int = GEDCOM_CHUNK_SIZE
+) -> Iterator[str]:
+    """
+    Write the heirs as a GEDCOM 5.5.1 lineage-linked file, chunk by chunk.
+
+    The parent links are taken from the Verwandtschaftsgraph (parentId,
+    stammId, beziehung), so descendants, siblings and grandparents end up
+    in FAM records with HUSB/WIFE/CHIL and matching FAMC/FAMS on the INDI
+    records. The erblasser is written first as @I0@. Predeceased stamm
+    roots that are not listed (e.g. the parent of a listed grandchild) are
+    written as unnamed deceased individuals so the line stays connected.
+    Everything is linear in the number of persons; output is yielded in
+    chunks of about ``chunk_size`` characters.
+    """
+    from backend.tools.verwandtschaft import Verwandtschaftsgraph
+
+    ergebnisse = ergebnisse or {}
+    graph = Verwandtschaftsgraph(erben)
+    xrefs: Dict[Hashable, str] = {}
+    virtuell: List[Hashable] = []
+
+    def xref(knoten: Hashable) -> str:
+        ref = xrefs.get(knoten)
+        if ref is None:
+            ref = xrefs[knoten] = f"I{len(xrefs) + 1}"
+            if knoten not in graph.personen:
+                virtuell.append(knoten)
+        return ref
+
+    familien: Dict[Hashable, _Familie] = {}
+    famc: Dict[str, str] = {}
+    fams: Dict[str, List[str]] = {}
+
+    def familie(schluessel: Hashable, eltern: Iterable[str]) -> _Familie:
+        fam = familien.get(schluessel)
+        if fam is None:
+            fam = familien[schluessel] = _Familie(f"F{len(familien) + 1}")
+            for ref in eltern:
+                if fam.husband is None:
+                    fam.husband = ref
+                elif fam.wife is None:
+                    fam.wife = ref
+                else:
+                    break
+                fams.setdefault(ref, []).append(fam.xref)
+        return fam
+
+    def kind(fam: _Familie, ref: str) -> None:
+        fam.children.append(ref)
+        famc.setdefault(ref, fam.xref)
+
+    for person in erben:
+        xref(person.get("id"))
+
+    # Ehe(n) des Erblassers, Kinder in der ersten Ehe
+    ehepartner = [xrefs[pid] for pid in graph.ehepartner]
+    eigene = familie("erblasser", ["I0"] + ehepartner[:1])
+    for weiterer in ehepartner[1:]:
+        familie(("ehe", weiterer), ["I0", weiterer])
+    for wurzel in graph.wurzeln[1]:
+        kind(eigene, xref(wurzel))
+
+    # Eltern des Erblassers: Erblasser und vollbürtige Geschwister
+    eltern_schluessel = tuple(graph.wurzeln[2])
+    eltern = familie(eltern_schluessel, [xrefs[e] for e in eltern_schluessel if e in graph.personen])
+    kind(eltern, "I0")
+
+    # Großeltern je Linie mit dem Elternteil dieser Linie als Kind
+    for nummer, grosseltern in enumerate(graph.linien.values()):
+        fam = familie(("linie", nummer), [xrefs[g] for g in grosseltern])
+        if nummer < len(graph.wurzeln[2]) and graph.wurzeln[2][nummer] in graph.personen:
+            kind(fam, xrefs[graph.wurzeln[2][nummer]])
+
+    # Übrige Abstammung (parentId, Stämme, Geschwister) in einem Durchlauf,
+    # nicht erfasste Stammwurzeln eingeschlossen
+    for knoten, eltern_knoten in list(graph.eltern.items()):
+        eltern_knoten = tuple(eltern_knoten)
+        if not eltern_knoten:
+            continue
+        if eltern_knoten == eltern_schluessel:
+            fam = eltern
+        else:
+            fam = familie(eltern_knoten, [xref(e) for e in eltern_knoten])
+        kind(fam, xref(knoten))
+
+    teile: List[str] = []
+    groesse = 0
+
+    def schreibe(record: List[str]) -> Optional[str]:
+        # Whole records are buffered, a chunk never ends inside a record
+        nonlocal groesse
+        text = "\n".join(record) + "\n"
+        teile.append(text)
+        groesse += len(text)
+        if groesse >= chunk_size:
+            chunk = "".join(teile)
+            teile.clear()
+            groesse = 0
+            return chunk
+        return None
+
+    def indi(ref: str, name: str, person: Dict[str, Any], notiz: Optional[str]) -> List[str]:
+        record = [f"0 @{ref}@ INDI", f"1 NAME {name}"]
+        if person.get("geburtsdatum"):
+            record += ["1 BIRT", f"2 DATE {gedcom_date(person['geburtsdatum'])}"]
+        if person.get("sterbedatum"):
+            datum = normalize_date(person["sterbedatum"])
+            record += ["1 DEAT", f"2 DATE {gedcom_date(datum)}"] if _ISO_DATE_RE.match(datum) else ["1 DEAT Y"]
+        if ref in famc:
+            record.append(f"1 FAMC @{famc[ref]}@")
+        record += [f"1 FAMS @{f}@" for f in fams.get(ref, ())]
+        if notiz:
+            record.append(f"1 NOTE {notiz}")
+        return record
+
+    def records() -> Iterator[List[str]]:
+        yield ["0 HEAD", "1 SOUR NOTARY-CRAFT-SUITE", "1 GEDC", "2 VERS 5.5.1", "2 FORM LINEAGE-LINKED", "1 CHAR UTF-8"]
+        yield indi("I0", _gedcom_name({"name": erblasser_name}), {}, "Erblasser")
+        for person in erben:
+            pid = person.get("id")
+            notiz = f"Beziehung: {person.get('beziehung', '')}"
+            if pid in ergebnisse:
+                notiz += f", Erbquote: {ergebnisse[pid]:.2f}%"
+            yield indi(xrefs[pid], _gedcom_name(person), person, notiz)
+        for knoten in virtuell:
+            yield indi(xrefs[knoten], "//", {"sterbedatum": "Y"}, f"Beziehung: {knoten[0]} (nicht erfasst)")
+        for fam in familien.values():
+            record = [f"0 @{fam.xref}@ FAM"]
+            if fam.husband:
+                record.append(f"1 HUSB @{fam.husband}@")
+            if fam.wife:
+                record.append(f"1 WIFE @{fam.wife}@")
+            record += [f"1 CHIL @{c}@" for c in fam.children]
+            yield record
+        yield ["0 TRLR"]
+
+    for record in records():
+        chunk = schreibe(record)
+        if chunk:
+            yield chunk
+    if teile:
+        yield "".join(teile)
@@ -1,28 +1,79 @@
-from typing import Dict
-
-def berechne_gnotkg(geschaeftswert: float, vorgangsart: str) -> Dict:
-    # Beispielhafte Gebührentabelle (vereinfachte Werte!)
-    gebuehrentabelle = [
-        (5000, 15),
-        (25000, 35),
-        (50000, 70),
-        (100000, 120),
-        (500000, 300),
-        (1000000, 500),
-        (float('inf'), 1000)
-    ]
-    gebuehr = 0
-    for grenze, betrag in gebuehrentabelle:
-        if geschaeftswert <= grenze:
-            gebuehr = betrag
-            break
-    # Vorgangsart kann Zuschläge/Abschläge auslösen
-    if vorgangsart == 'Beurkundung':
-        gebuehr *= 2
-    elif vorgangsart == 'Beglaubigung':
-        gebuehr *= 0.5
+from typing import Dict, Optional, Sequence, Tuple, Union
+from datetime import date
+import math
+import numpy as np
+
+from backend.tools.gebuehrentabellen import gebuehrentabellen
+
+# Mindestbetrag einer Gebühr (§ 34 Abs. 5 GNotKG)
+MINDESTGEBUEHR = 15.0
+# Höchstgeschäftswert, wenn kein niedrigerer bestimmt ist (§ 35 Abs. 2 GNotKG)
+HOECHSTWERT = 60000000
+
+# Vorgangsart -> (Gebührensatz, Mindestgebühr, Höchstgebühr) nach KV GNotKG
+VORGANGSARTEN: Dict[str, Tuple[float, float, float]] = {
+    "Beurkundung": (2.0, 120.0, math.inf),                # Nr. 21100 KV
+    "Beglaubigung": (0.2, 20.0, 70.0),                    # Nr. 25100 KV
+}
+STANDARD_VORGANG = (1.0, MINDESTGEBUEHR, math.inf)
+
+
+def berechne_gnotkg(geschaeftswert: float, vorgangsart: str, tabelle: str = "B", stichtag: Optional[date] = None) -> Dict:
+    """
+    Berechnet die Gebühr mit der am Stichtag (z.B. Datum der Urkunde, sonst
+    heute) gültigen Fassung der Gebührentabelle.
+    """
+    satz, mindestens, hoechstens = VORGANGSARTEN.get(vorgangsart, STANDARD_VORGANG)
+    version = gebuehrentabellen.tabelle(tabelle, stichtag)
+    wert = min(geschaeftswert, HOECHSTWERT)
+    gebuehr = satz * version.gebuehr(wert)
+    gebuehr = min(max(gebuehr, mindestens), hoechstens)
     return {
         "geschaeftswert": geschaeftswert,
         "vorgangsart": vorgangsart,
+        "gebuehrensatz": satz,
+        "tabelle": tabelle,
+        "tabelle_gueltig_ab": version.gueltig_ab.isoformat(),
         "gebuehr": round(gebuehr, 2)
     }
+
+
+def berechne_gnotkg_batch(
+    geschaeftswerte: Sequence[float],
+    gebuehrensaetze: Optional[Sequence[float]] = None,
+    vorgangsarten: Optional[Sequence[str]] = None,
+    tabelle: str = "B",
+    kreuzprodukt: bool = False,
+    stichtage: Union[None, date, Sequence[date]] = None
+) -> np.ndarray:
+    """
+    Berechnet viele Gebühren in einem vektorisierten Durchlauf.
+
+    Gebührensätze werden entweder direkt oder über Vorgangsarten angegeben.
+    Ohne ``kreuzprodukt`` werden Werte und Sätze elementweise (mit
+    NumPy-Broadcasting) kombiniert, mit ``kreuzprodukt`` entsteht eine
+    Matrix Geschäftswerte x Gebührensätze. ``stichtage`` ist ein Datum für
+    alle Werte oder eines je Geschäftswert; je Tabellenversion wird ein
+    vektorisierter Aufruf ausgeführt.
+    """
+    werte = np.minimum(np.asarray(geschaeftswerte, dtype=float), HOECHSTWERT)
+    if vorgangsarten is not None:
+        parameter = np.array([VORGANGSARTEN.get(v, STANDARD_VORGANG) for v in vorgangsarten], dtype=float).reshape(-1, 3)
+        saetze, mindestens, hoechstens = parameter.T
+    else:
+        saetze = np.asarray(gebuehrensaetze if gebuehrensaetze is not None else [1.0], dtype=float)
+        mindestens, hoechstens = MINDESTGEBUEHR, math.inf
+    if stichtage is None or isinstance(stichtage, date):
+        volle = gebuehrentabellen.tabelle(tabelle, stichtage).gebuehren(werte)
+    else:
+        if len(stichtage) != len(werte):
+            raise ValueError("Anzahl der Stichtage muss der Anzahl der Geschäftswerte entsprechen")
+        versionen, index = gebuehrentabellen.versionen_fuer(tabelle, stichtage)
+        volle = np.empty_like(werte)
+        for i in np.unique(index):
+            maske = index == i
+            volle[maske] = versionen[i].gebuehren(werte[maske])
+    if kreuzprodukt:
+        volle = volle[:, np.newaxis]
+    gebuehren = np.clip(volle * saetze, mindestens, hoechstens)
+    return np.round(gebuehren, 2)
@@ -1,17 +1,115 @@
-from typing import List, Dict, Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
+import re
 import uuid
 
+# Platzhalter im Format {{name}}
+_PLATZHALTER_RE = re.compile(r'\{\{([^{}]+)\}\}')
+# Suchanfrage: "Phrase in Anführungszeichen" oder einzelnes Wort, optional mit * als Präfix
+_SUCHBEGRIFF_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+class Vorlage:
+    """
+    Einmal zerlegter Textbaustein: ``teile`` enthält abwechselnd Literaltext
+    und Platzhalternamen (gerade Indizes Text, ungerade Indizes Namen).
+    """
+    __slots__ = ("teile", "platzhalter")
+
+    def __init__(self, text: str):
+        self.teile: Tuple[str, ...] = tuple(_PLATZHALTER_RE.split(text))
+        self.platzhalter = frozenset(self.teile[1::2])
+
+
+def kompiliere_textbaustein(text: str) -> Vorlage:
+    return Vorlage(text)
+
+
+def rendere_vorlagen(vorlagen: List[Vorlage], platzhalter: Dict) -> Dict:
+    """
+    Setzt die Platzhalter in einem Durchlauf über alle Token ein und fügt
+    die Bausteine zusammen. Platzhalter ohne Wert bleiben stehen und werden
+    als ``fehlende_platzhalter`` gemeldet, übergebene Werte, die in keinem
+    Baustein vorkommen, als ``unbekannte_platzhalter``.
+    """
+    werte = {key: str(value) for key, value in platzhalter.items()}
+    verwendet, fehlend = set(), set()
+    bloecke = []
+    for vorlage in vorlagen:
+        teile = list(vorlage.teile)
+        for i in range(1, len(teile), 2):
+            name = teile[i]
+            wert = werte.get(name)
+            if wert is None:
+                fehlend.add(name)
+                teile[i] = f"{{{{{name}}}}}"
+            else:
+                verwendet.add(name)
+                teile[i] = wert
+        bloecke.append("".join(teile))
+    return {
+        "text": "\n\n".join(bloecke),
+        "fehlende_platzhalter": sorted(fehlend),
+        "unbekannte_platzhalter": sorted(werte.keys() - verwendet)
+    }
+
+
 def generiere_textbaustein(textbausteine: List[Dict], platzhalter: Dict) -> str:
     """
     Fügt Platzhalter in die ausgewählten Textbausteine ein und gibt den zusammengesetzten Text zurück.
     """
-    result = []
-    for block in textbausteine:
-        text = block['text']
-        for key, value in platzhalter.items():
-            text = text.replace(f'{{{{{key}}}}}', str(value))
-        result.append(text)
-    return '\n\n'.join(result)
+    vorlagen = [kompiliere_textbaustein(block['text']) for block in textbausteine]
+    return rendere_vorlagen(vorlagen, platzhalter)["text"]
+
+def lese_platzhalter_zeilen(datei: BinaryIO, format: str = "csv") -> Iterator[Dict]:
+    """
+    Liest Platzhalterwerte zeilenweise aus einer CSV-Datei (Kopfzeile mit
+    den Platzhalternamen, Trennzeichen ; oder ,) oder aus NDJSON (ein
+    JSON-Objekt je Zeile), ohne die Datei vollständig einzulesen.
+    """
+    text = io.TextIOWrapper(datei, encoding="utf-8-sig", newline="")
+    if format == "ndjson":
+        for nummer, zeile in enumerate(text, 1):
+            if zeile.strip():
+                try:
+                    werte = json.loads(zeile)
+                except ValueError:
+                    raise ValueError(f"Zeile {nummer}: kein gültiges JSON")
+                if not isinstance(werte, dict):
+                    raise ValueError(f"Zeile {nummer}: JSON-Objekt erwartet")
+                yield werte
+        return
+    if format != "csv":
+        raise ValueError(f"Unbekanntes Eingabeformat: {format}")
+    kopf = text.readline()
+    trennzeichen = ";" if kopf.count(";") >= kopf.count(",") else ","
+    spalten = next(csv.reader([kopf], delimiter=trennzeichen), [])
+    for werte in csv.DictReader(text, fieldnames=spalten, delimiter=trennzeichen):
+        yield {k: v for k, v in werte.items() if k is not None}
+
+def suchbegriffe(anfrage: str) -> List[Tuple[str, bool]]:
+    """
+    Begriffe einer Suchanfrage als (Inhalt, Präfix). Phrasen in
+    Anführungszeichen bleiben zusammen, ``wort*`` sucht nach Präfixen;
+    vom Inhalt bleiben nur Wortzeichen.
+    """
+    begriffe = []
+    for phrase, wort in _SUCHBEGRIFF_RE.findall(anfrage):
+        praefix = not phrase and wort.endswith("*")
+        inhalt = " ".join(re.findall(r'\w+', phrase or wort))
+        if inhalt:
+            begriffe.append((inhalt, praefix))
+    return begriffe
+
+def fts_ausdruck(anfrage: str) -> str:
+    """
+    Übersetzt eine Suchanfrage in einen FTS5-MATCH-Ausdruck, alle Begriffe
+    müssen vorkommen. Sonderzeichen werden nicht als FTS5-Syntax
+    interpretiert.
+    """
+    return " ".join(f'"{inhalt}"' + ("*" if praefix else "") for inhalt, praefix in suchbegriffe(anfrage))
 
 # Beispiel-Textbausteine (könnten aus DB kommen)
 BEISPIEL_BAUSTEINE = [
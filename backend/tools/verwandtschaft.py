@@ -0,0 +1,374 @@
+
+from collections import ChainMap, defaultdict
+from fractions import Fraction
+from typing import Dict, List, Hashable, Iterable, Optional
+
+# Beziehung -> Parentel (Ordnung), deren Wurzel die Person bildet
+ORDNUNG_WURZELN = {
+    "kind": 1,
+    "elternteil": 2,
+    "großelternteil": 3,
+    "urgroßelternteil": 4,
+}
+
+# Beziehung -> Beziehung der Stammwurzel, an die eine Person ohne parentId
+# über ihre stammId gehängt wird
+STAMM_WURZELN = {
+    "enkel": "kind",
+    "urenkel": "kind",
+    "neffe": "geschwister",
+    "nichte": "geschwister",
+}
+
+# Ehegattenanteil neben Verwandten der jeweiligen Ordnung (§ 1931 BGB,
+# Zugewinngemeinschaft mit pauschalem Zugewinnausgleich nach § 1371 BGB)
+EHEGATTEN_QUOTE = {
+    1: Fraction(1, 2),
+    2: Fraction(3, 4),
+    3: Fraction(3, 4),
+}
+
+
+def ist_verstorben(person: Dict) -> bool:
+    """Prüft, ob eine Person verstorben ist"""
+    return bool(person.get("sterbedatum"))
+
+
+class Verwandtschaftsgraph:
+    """
+    Verwandtschaftsgraph des Erblassers.
+
+    Aus der flachen Erbenliste wird in einem indizierten Durchlauf eine
+    Eltern->Kinder-Adjazenz aufgebaut. Die Verknüpfung erfolgt über
+    ``parentId``, ersatzweise über den Stamm-Index (``stammId``). Nicht
+    erfasste, vorverstorbene Zwischenglieder (z.B. die Eltern bei
+    Geschwistern) werden als virtuelle Knoten ergänzt.
+    """
+
+    def __init__(self, erben: Iterable[Dict]):
+        self.personen: Dict[Hashable, Dict] = {}
+        self.kinder: Dict[Hashable, List[Hashable]] = defaultdict(list)
+        self.ehepartner: List[Hashable] = []
+        self.wurzeln: Dict[int, List[Hashable]] = {1: [], 2: [], 3: [], 4: []}
+        # Großelternteile nach Linie (väterlich/mütterlich), § 1926 Abs. 3 BGB
+        self.linien: Dict[str, List[Hashable]] = defaultdict(list)
+        self.eltern: Dict[Hashable, List[Hashable]] = defaultdict(list)
+        self._stamm_index: Dict[tuple, Hashable] = {}
+        self._hat_erben: Dict[Hashable, bool] = {}
+        # Aufteilung je Stamm (Anteil 1), Grundlage für Szenario-Neuberechnungen
+        self._stamm_cache: Dict[Hashable, Dict[Hashable, Fraction]] = {}
+        self._skaliert_cache: Dict[tuple, Dict[Hashable, Fraction]] = {}
+
+        erben = list(erben)
+        for person in erben:
+            pid = person.get("id")
+            self.personen[pid] = person
+            beziehung = person.get("beziehung")
+            if beziehung == "ehepartner":
+                self.ehepartner.append(pid)
+            elif beziehung in ORDNUNG_WURZELN:
+                self.wurzeln[ORDNUNG_WURZELN[beziehung]].append(pid)
+                if beziehung == "großelternteil":
+                    self.linien[person.get("linie", "")].append(pid)
+            if "stammId" in person:
+                self._stamm_index.setdefault((beziehung, person["stammId"]), pid)
+
+        # Zweite Ordnung: bis zu zwei Elternteile, fehlende gelten als vorverstorben
+        eltern = self.wurzeln[2]
+        for slot in range(len(eltern), 2):
+            eltern.append(("elternteil", slot))
+
+        for person in erben:
+            self._verknuepfe(person)
+
+    def _verknuepfe(self, person: Dict) -> None:
+        pid = person.get("id")
+        for elternteil in self._eltern_von(person):
+            self.kinder[elternteil].append(pid)
+            self.eltern[pid].append(elternteil)
+
+    def _eltern_von(self, person: Dict) -> List[Hashable]:
+        beziehung = person.get("beziehung")
+        parent_id = person.get("parentId")
+        if beziehung in ORDNUNG_WURZELN or beziehung == "ehepartner":
+            return []
+        if parent_id is not None and parent_id in self.personen:
+            return [parent_id]
+        if beziehung == "geschwister":
+            # Vollbürtige Geschwister stammen von beiden Elternteilen ab
+            return list(self.wurzeln[2])
+        if beziehung in STAMM_WURZELN:
+            wurzel_beziehung = STAMM_WURZELN[beziehung]
+            stamm_id = person.get("stammId")
+            wurzel = self._stamm_index.get((wurzel_beziehung, stamm_id))
+            if wurzel is None:
+                # Stammwurzel nicht erfasst: als vorverstorben ergänzen
+                wurzel = (wurzel_beziehung, stamm_id)
+                self._stamm_index[wurzel] = wurzel
+                if wurzel_beziehung == "kind":
+                    self.wurzeln[1].append(wurzel)
+                else:
+                    self._verknuepfe({"id": wurzel, "beziehung": wurzel_beziehung})
+            return [wurzel]
+        return []
+
+    def lebt(self, knoten: Hashable) -> bool:
+        person = self.personen.get(knoten)
+        return person is not None and not ist_verstorben(person)
+
+    def _hat_erben_bekannt(self, knoten: Hashable) -> Optional[bool]:
+        """Bereits ermitteltes Ergebnis von ``hat_erben``, sonst None"""
+        return self._hat_erben.get(knoten)
+
+    def hat_erben(self, knoten: Hashable) -> bool:
+        """
+        Lebt der Knoten selbst oder hinterlässt er lebende Abkömmlinge?
+
+        Iterativer Durchlauf mit eigenem Stapel, damit auch sehr lange
+        Abstammungsketten nicht an der Rekursionsgrenze scheitern. Knoten,
+        die sich über fehlerhafte parentId-Angaben selbst enthalten, zählen
+        auf diesem Weg nicht als Erben.
+        """
+        ergebnis = self._hat_erben_bekannt(knoten)
+        if ergebnis is not None:
+            return ergebnis
+        stapel = [knoten]
+        # Knoten, deren Kinder gerade ausgewertet werden (aktueller Pfad)
+        pfad = set()
+        while stapel:
+            aktuell = stapel[-1]
+            if self._hat_erben_bekannt(aktuell) is not None:
+                stapel.pop()
+                continue
+            if self.lebt(aktuell):
+                ergebnis = True
+            else:
+                kinder = [k for k in self.kinder.get(aktuell, ()) if k not in pfad]
+                bekannt = [self._hat_erben_bekannt(k) for k in kinder]
+                offen = [k for k, b in zip(kinder, bekannt) if b is None]
+                if aktuell not in pfad and offen and not any(bekannt):
+                    pfad.add(aktuell)
+                    stapel.extend(offen)
+                    continue
+                ergebnis = any(bekannt)
+            self._hat_erben[aktuell] = ergebnis
+            pfad.discard(aktuell)
+            stapel.pop()
+        return self._hat_erben[knoten]
+
+    def _verteile_knoten(self, knoten: Hashable, anteil: Fraction, quoten: Dict[Hashable, Fraction]) -> List[tuple]:
+        """Ein Schritt von ``verteile_stamm``: Anteil des Knotens selbst oder (Kind, Teil) je erbendem Kind"""
+        if self.lebt(knoten):
+            quoten[knoten] = quoten.get(knoten, 0) + anteil
+            return []
+        erben = [k for k in self.kinder.get(knoten, ()) if self.hat_erben(k)]
+        if not erben:
+            return []
+        teil = anteil / len(erben)
+        return [(kind, teil) for kind in erben]
+
+    def verteile_stamm(self, knoten: Hashable, anteil: Fraction, quoten: Dict[Hashable, Fraction]) -> None:
+        """Verteilt einen Stammanteil nach Stämmen (Repräsentation) bis in beliebige Tiefe, ohne Rekursion"""
+        # Jeder Knoten hat im Stamm höchstens einen Elternteil; mehr Schritte
+        # als Knoten gibt es nur bei zirkulären parentId-Angaben
+        schritte = len(self.personen) + len(self.kinder)
+        stapel = [(knoten, anteil)]
+        while stapel:
+            schritte -= 1
+            if schritte < 0:
+                raise ValueError("Zirkuläre Abstammung im Verwandtschaftsgraphen")
+            stapel.extend(reversed(self._verteile_knoten(*stapel.pop(), quoten)))
+
+    def stamm_verteilung(self, knoten: Hashable) -> Dict[Hashable, Fraction]:
+        """Aufteilung eines ganzen Stammes (Anteil 1) auf seine Erben, zwischengespeichert"""
+        verteilung = self._stamm_cache.get(knoten)
+        if verteilung is None:
+            verteilung = {}
+            self.verteile_stamm(knoten, Fraction(1), verteilung)
+            self._stamm_cache[knoten] = verteilung
+        return verteilung
+
+    def skalierte_verteilung(self, knoten: Hashable, anteil: Fraction) -> Dict[Hashable, Fraction]:
+        """Stammaufteilung multipliziert mit dem Anteil des Stammes, zwischengespeichert"""
+        schluessel = (knoten, anteil)
+        verteilung = self._skaliert_cache.get(schluessel)
+        if verteilung is None:
+            verteilung = {k: q * anteil for k, q in self.stamm_verteilung(knoten).items()}
+            self._skaliert_cache[schluessel] = verteilung
+        return verteilung
+
+    def verteile_gruppe(self, wurzeln: List[Hashable], anteil: Fraction, quoten: Dict[Hashable, Fraction]) -> bool:
+        """Gleiche Teile für alle Wurzeln mit Erben; Anteile weggefallener Wurzeln wachsen den übrigen an"""
+        staemme = [w for w in wurzeln if self.hat_erben(w)]
+        if not staemme:
+            return False
+        teil = anteil / len(staemme)
+        for stamm in staemme:
+            verteilung = self.skalierte_verteilung(stamm, teil)
+            if quoten.keys().isdisjoint(verteilung):
+                quoten.update(verteilung)
+            else:
+                # Überschneidende Stämme, z.B. vollbürtige Geschwister
+                for knoten, quote in verteilung.items():
+                    quoten[knoten] = quoten.get(knoten, 0) + quote
+        return True
+
+    def ordnung_vorhanden(self, ordnung: int) -> bool:
+        return any(self.hat_erben(w) for w in self.wurzeln[ordnung])
+
+
+def berechne_quoten(graph: Verwandtschaftsgraph) -> Dict[Hashable, Fraction]:
+    """
+    Berechnet die gesetzlichen Erbquoten (§§ 1924-1931 BGB) als exakte Brüche.
+
+    Lineare Laufzeit in der Anzahl der Personen: jeder Knoten wird für
+    ``hat_erben`` einmal ausgewertet und bei der Verteilung einmal je
+    Elternteil besucht.
+    """
+    quoten: Dict[Hashable, Fraction] = {}
+    ehepartner = [p for p in graph.ehepartner if graph.lebt(p)]
+
+    ordnung: Optional[int] = next((o for o in (1, 2, 3) if graph.ordnung_vorhanden(o)), None)
+    if ordnung == 3 and ehepartner:
+        # Neben Abkömmlingen von Großeltern erbt nur, wer als Großelternteil lebt
+        if not any(graph.lebt(w) for w in graph.wurzeln[3]):
+            ordnung = None
+
+    rest = Fraction(1)
+    if ehepartner:
+        ehegatte = EHEGATTEN_QUOTE.get(ordnung, Fraction(1))
+        rest -= ehegatte
+        for p in ehepartner:
+            quoten[p] = ehegatte / len(ehepartner)
+
+    if ordnung in (1, 2):
+        graph.verteile_gruppe(graph.wurzeln[ordnung], rest, quoten)
+    elif ordnung == 3:
+        linien = [l for l in graph.linien.values() if any(graph.hat_erben(g) for g in l)]
+        for linie in linien:
+            graph.verteile_gruppe(linie, rest / len(linien), quoten)
+        if ehepartner:
+            # § 1931 Abs. 1 S. 2 BGB: Anteile der Abkömmlinge von Großeltern fallen dem Ehegatten zu
+            for knoten in [k for k in quoten if k not in graph.wurzeln[3] and k not in ehepartner]:
+                anteil = quoten.pop(knoten)
+                for p in ehepartner:
+                    quoten[p] += anteil / len(ehepartner)
+    elif not ehepartner:
+        # Vierte Ordnung: lebende Urgroßeltern erben zu gleichen Teilen (§ 1928 BGB)
+        erben = [w for w in graph.wurzeln[4] if graph.lebt(w)]
+        if not erben:
+            # Fallback: Alle lebenden Personen bekommen gleiche Anteile
+            erben = [p for p in graph.personen if graph.lebt(p)]
+        for p in erben:
+            quoten[p] = Fraction(1, len(erben))
+
+    return quoten
+
+
+class Szenario(Verwandtschaftsgraph):
+    """
+    Was-wäre-wenn-Variante eines Verwandtschaftsgraphen.
+
+    Die Änderungen (Deltas) werden als Overlay über den Basisgraphen gelegt,
+    dieser bleibt unverändert. Neu berechnet werden nur Knoten auf dem Pfad
+    von einer geänderten Person zu ihrer Stammwurzel; alle anderen Stämme
+    übernehmen die zwischengespeicherte Aufteilung des Basisgraphen.
+
+    Unterstützte Deltas:
+    - ``{"typ": "verstorben", "id": ..., "sterbedatum": ...}``
+    - ``{"typ": "ausschlagung", "id": ...}`` (gilt als vorverstorben, § 1953 BGB)
+    - ``{"typ": "hinzufuegen", "person": {...}}`` (nur Abkömmlinge)
+    - ``{"typ": "entfernen", "id": ...}`` (entfällt als Erbe, Abkömmlinge rücken nach)
+    """
+
+    def __init__(self, basis: Verwandtschaftsgraph, deltas: Iterable[Dict]):
+        self.basis = basis
+        self.personen = ChainMap({}, basis.personen)
+        self.kinder = ChainMap({}, basis.kinder)
+        self.eltern = ChainMap({}, basis.eltern)
+        self.ehepartner = list(basis.ehepartner)
+        self.wurzeln = {o: list(w) for o, w in basis.wurzeln.items()}
+        self.linien = defaultdict(list, {l: list(g) for l, g in basis.linien.items()})
+        self._stamm_index = ChainMap({}, basis._stamm_index)
+        self._hat_erben = {}
+        self._stamm_cache = {}
+        self._skaliert_cache = {}
+        self._entfernt = set()
+        self._geaendert = set()
+
+        for delta in deltas:
+            self._anwenden(delta)
+
+        # Alle Vorfahren geänderter Knoten sind neu zu berechnen
+        self._betroffen = set()
+        offen = list(self._geaendert)
+        while offen:
+            knoten = offen.pop()
+            if knoten not in self._betroffen:
+                self._betroffen.add(knoten)
+                offen.extend(self.eltern.get(knoten, ()))
+
+    def _anwenden(self, delta: Dict) -> None:
+        typ = delta.get("typ")
+        if typ == "hinzufuegen":
+            person = delta.get("person") or {}
+            pid = person.get("id")
+            if pid is None or pid in self.personen:
+                raise ValueError(f"Person {pid!r} existiert bereits oder hat keine id")
+            beziehung = person.get("beziehung")
+            if beziehung == "ehepartner" or (beziehung in ORDNUNG_WURZELN and beziehung != "kind"):
+                raise ValueError("Es können nur Abkömmlinge hinzugefügt werden")
+            self.personen[pid] = person
+            if beziehung == "kind":
+                self.wurzeln[1].append(pid)
+            if "stammId" in person:
+                self._stamm_index.setdefault((beziehung, person["stammId"]), pid)
+            self._verknuepfe(person)
+            self._geaendert.add(pid)
+            return
+
+        pid = delta.get("id")
+        if pid not in self.personen:
+            raise ValueError(f"Unbekannte Person {pid!r}")
+        if typ in ("verstorben", "ausschlagung"):
+            self.personen[pid] = {**self.personen[pid], "sterbedatum": delta.get("sterbedatum") or typ}
+        elif typ == "entfernen":
+            # Die Person fällt weg wie ein Vorverstorbener; ihre Abkömmlinge
+            # treten an ihre Stelle (§ 1924 Abs. 3 BGB)
+            self._entfernt.add(pid)
+        else:
+            raise ValueError(f"Unbekannter Delta-Typ {typ!r}")
+        self._geaendert.add(pid)
+
+    def _verknuepfe(self, person: Dict) -> None:
+        # Copy-on-write: Listen des Basisgraphen werden nie verändert
+        pid = person.get("id")
+        for elternteil in self._eltern_von(person):
+            self.kinder[elternteil] = list(self.kinder.get(elternteil, ())) + [pid]
+            self.eltern[pid] = list(self.eltern.get(pid, ())) + [elternteil]
+            self._geaendert.add(elternteil)
+
+    def lebt(self, knoten: Hashable) -> bool:
+        return knoten not in self._entfernt and super().lebt(knoten)
+
+    def _hat_erben_bekannt(self, knoten: Hashable) -> Optional[bool]:
+        if knoten not in self._betroffen:
+            return self.basis.hat_erben(knoten)
+        return super()._hat_erben_bekannt(knoten)
+
+    def _verteile_knoten(self, knoten: Hashable, anteil: Fraction, quoten: Dict[Hashable, Fraction]) -> List[tuple]:
+        if knoten in self._betroffen:
+            return super()._verteile_knoten(knoten, anteil, quoten)
+        for erbe, quote in self.basis.stamm_verteilung(knoten).items():
+            quoten[erbe] = quoten.get(erbe, 0) + quote * anteil
+        return []
+
+    def stamm_verteilung(self, knoten: Hashable) -> Dict[Hashable, Fraction]:
+        if knoten not in self._betroffen:
+            return self.basis.stamm_verteilung(knoten)
+        return super().stamm_verteilung(knoten)
+
+    def skalierte_verteilung(self, knoten: Hashable, anteil: Fraction) -> Dict[Hashable, Fraction]:
+        if knoten not in self._betroffen:
+            return self.basis.skalierte_verteilung(knoten, anteil)
+        return super().skalierte_verteilung(knoten, anteil)
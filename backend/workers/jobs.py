@@ -0,0 +1,163 @@
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+from datetime import datetime
+import json
+import logging
+import os
+import threading
+import uuid
+
+from sqlalchemy import func, select
+
+from backend.config import settings
+from backend.database.db import SessionLocal
+from backend.models.exportjob import ExportJob
+from backend.workers.pool import get_job_pool
+
+logger = logging.getLogger(__name__)
+
+# (parameter, user_id, datei, fortschritt(erledigt, gesamt)) -> (dateiname, media_type)
+JobFunktion = Callable[[Dict[str, Any], int, BinaryIO, Callable[[int, int], None]], Tuple[str, str]]
+JOB_ARTEN: Dict[str, JobFunktion] = {}
+
+_stopp = threading.Event()
+# Fortschritt laufender Jobs dieses Prozesses: job_id -> (erledigt, gesamt). Nur
+# Statuswechsel werden gespeichert, so kollidieren Fortschrittsmeldungen nicht
+# mit den Lesezugriffen des Jobs auf dieselbe SQLite-Datei.
+_fortschritt: Dict[str, Tuple[int, int]] = {}
+
+
+class JobAbgebrochen(Exception):
+    """Raised from the progress callback when the process shuts down"""
+
+
+def job_art(name: str) -> Callable[[JobFunktion], JobFunktion]:
+    def registriere(funktion: JobFunktion) -> JobFunktion:
+        JOB_ARTEN[name] = funktion
+        return funktion
+    return registriere
+
+
+def erstelle_job(db, user_id: int, art: str, parameter: Dict[str, Any]) -> ExportJob:
+    """Persists a new job and hands it to the job pool"""
+    if art not in JOB_ARTEN:
+        raise ValueError(f"Unbekannte Job-Art: {art}")
+    job = ExportJob(id=uuid.uuid4().hex, user_id=user_id, art=art, parameter=json.dumps(parameter), status="wartend")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    get_job_pool().submit(fuehre_job_aus, job.id)
+    return job
+
+
+def laufender_fortschritt(job_id: str) -> Optional[Tuple[int, int]]:
+    return _fortschritt.get(job_id)
+
+
+def job_datei(job_id: str) -> str:
+    return os.path.join(settings.EXPORT_JOB_DIR, job_id)
+
+
+def fuehre_job_aus(job_id: str) -> None:
+    """
+    Runs one job in a pool thread with its own session. The artifact is
+    written to a temporary file and renamed when complete, so a download
+    never sees a partial file.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(ExportJob, job_id)
+        if job is None or job.status not in ("wartend", "laeuft"):
+            return
+        art, parameter, user_id = job.art, json.loads(job.parameter or "{}"), job.user_id
+        job.status, job.erledigt, job.fehler = "laeuft", 0, None
+        # Danach bleibt keine Transaktion offen, solange der Job läuft
+        db.commit()
+        os.makedirs(settings.EXPORT_JOB_DIR, exist_ok=True)
+        ziel = job_datei(job_id)
+        _fortschritt[job_id] = (0, 0)
+
+        def fortschritt(erledigt: int, gesamt: int) -> None:
+            if _stopp.is_set():
+                raise JobAbgebrochen()
+            _fortschritt[job_id] = (erledigt, gesamt)
+
+        try:
+            with open(ziel + ".tmp", "wb") as datei:
+                dateiname, media_type = JOB_ARTEN[art](parameter, user_id, datei, fortschritt)
+            os.replace(ziel + ".tmp", ziel)
+        except JobAbgebrochen:
+            # Wird nach dem nächsten Start erneut ausgeführt
+            status = "wartend"
+        except Exception as e:
+            logger.exception("Export-Job %s fehlgeschlagen", job_id)
+            status, job.fehler = "fehler", str(e)
+        else:
+            status = "fertig"
+            job.datei, job.dateiname, job.media_type = ziel, dateiname, media_type
+            job.groesse = os.path.getsize(ziel)
+        finally:
+            if os.path.exists(ziel + ".tmp"):
+                os.remove(ziel + ".tmp")
+        job.erledigt, job.gesamt = _fortschritt.pop(job_id, (0, 0))
+        job.status = status
+        if status != "wartend":
+            job.finished_at = datetime.utcnow()
+        db.commit()
+    finally:
+        db.close()
+
+
+def setze_jobs_fort() -> int:
+    """Resubmits jobs that were waiting or running when the process stopped"""
+    _stopp.clear()
+    db = SessionLocal()
+    try:
+        offen = db.scalars(select(ExportJob.id).where(ExportJob.status.in_(("wartend", "laeuft")))).all()
+    finally:
+        db.close()
+    for job_id in offen:
+        get_job_pool().submit(fuehre_job_aus, job_id)
+    return len(offen)
+
+
+def stoppe_jobs() -> None:
+    """Running jobs stop at their next progress update and stay queued"""
+    _stopp.set()
+
+
+@job_art("historie-csv")
+def _historie_csv(parameter: Dict[str, Any], user_id: int, datei: BinaryIO, fortschritt) -> Tuple[str, str]:
+    from backend.export.historie import HISTORIEN, historie_csv
+    from backend.database.db import read_engine
+    tool = parameter.get("tool")
+    if tool not in HISTORIEN:
+        raise ValueError(f"Unbekanntes Tool: {tool}")
+    tabelle = HISTORIEN[tool][0].__table__
+    with read_engine.connect() as conn:
+        gesamt = conn.execute(select(func.count()).select_from(tabelle).where(tabelle.c.user_id == user_id)).scalar()
+    for nummer, block in enumerate(historie_csv(tool, user_id), 1):
+        datei.write(block)
+        fortschritt(min(nummer * settings.EXPORT_ZEILEN_JE_BLOCK, gesamt), gesamt)
+    return f"{tool}-historie.csv", "text/csv"
+
+
+@job_art("pdf-batch")
+def _pdf_batch(parameter: Dict[str, Any], user_id: int, datei: BinaryIO, fortschritt) -> Tuple[str, str]:
+    from backend.export.archiv import ZipStrom
+    from backend.export.pdf import LAYOUTS
+    from backend.workers.pdf import rendere_pdfs_sync
+    berichte = parameter.get("berichte", [])
+    unbekannt = {b.get("layout") for b in berichte} - LAYOUTS.keys()
+    if unbekannt:
+        raise ValueError(f"Unbekannte Layouts: {sorted(unbekannt, key=str)}")
+    archiv = ZipStrom()
+    schritt = settings.PDF_BATCH_GROESSE * settings.PDF_MAX_WORKERS
+    for start in range(0, len(berichte), schritt):
+        teil = berichte[start:start + schritt]
+        pdfs = rendere_pdfs_sync([(b["layout"], b.get("daten", {})) for b in teil])
+        for nummer, (bericht, pdf) in enumerate(zip(teil, pdfs), start + 1):
+            name = bericht.get("dateiname") or f"{nummer:05d}_{bericht['layout']}"
+            datei.write(archiv.eintrag(f"{name}.pdf", pdf))
+        fortschritt(start + len(teil), len(berichte))
+    datei.write(archiv.abschliessen())
+    return "berichte.zip", "application/zip"
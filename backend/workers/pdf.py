@@ -0,0 +1,69 @@
+from typing import Any, AsyncIterator, Dict, List
+import asyncio
+import threading
+import time
+
+from backend.config import settings
+from backend.export.pdf import PdfAuftrag, rendere_pdf_batch
+from backend.workers.pool import get_pdf_pool
+
+_statistik_lock = threading.Lock()
+_statistik = {"berichte": 0, "batches": 0, "sekunden": 0.0}
+
+
+def _erfasse(berichte: int, sekunden: float) -> None:
+    with _statistik_lock:
+        _statistik["berichte"] += berichte
+        _statistik["batches"] += 1
+        _statistik["sekunden"] += sekunden
+
+
+def pdf_statistik() -> Dict[str, Any]:
+    """Reports and batches rendered by this API process and the time they took in the pool"""
+    with _statistik_lock:
+        statistik = dict(_statistik)
+    statistik["worker"] = settings.PDF_MAX_WORKERS
+    statistik["berichte_pro_sekunde"] = round(statistik["berichte"] / statistik["sekunden"], 1) if statistik["sekunden"] else None
+    return statistik
+
+
+def _batches(auftraege: List[PdfAuftrag], groesse: int) -> List[List[PdfAuftrag]]:
+    return [auftraege[i:i + groesse] for i in range(0, len(auftraege), groesse)]
+
+
+def rendere_pdfs_sync(auftraege: List[PdfAuftrag]) -> List[bytes]:
+    """Blocking variant for code already running in a worker thread"""
+    start = time.perf_counter()
+    ergebnisse = []
+    for teil in get_pdf_pool().map(rendere_pdf_batch, _batches(auftraege, settings.PDF_BATCH_GROESSE)):
+        ergebnisse.extend(teil)
+    _erfasse(len(auftraege), time.perf_counter() - start)
+    return ergebnisse
+
+
+async def rendere_pdfs(auftraege: List[PdfAuftrag]) -> AsyncIterator[bytes]:
+    """
+    Renders reports in the PDF pool, PDF_BATCH_GROESSE per task, without
+    blocking the event loop; yields the PDFs in input order as their batch
+    finishes
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_pool()
+    start = time.perf_counter()
+    futures = [loop.run_in_executor(pool, rendere_pdf_batch, teil) for teil in _batches(auftraege, settings.PDF_BATCH_GROESSE)]
+    try:
+        for future in futures:
+            for pdf in await future:
+                yield pdf
+    finally:
+        for future in futures:
+            future.cancel()
+    _erfasse(len(auftraege), time.perf_counter() - start)
+
+
+async def rendere_pdf(layout: str, daten: Dict[str, Any]) -> bytes:
+    """Single report off the event loop"""
+    start = time.perf_counter()
+    ergebnis = await asyncio.get_running_loop().run_in_executor(get_pdf_pool(), rendere_pdf_batch, [(layout, daten)])
+    _erfasse(1, time.perf_counter() - start)
+    return ergebnis[0]
@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+import threading
+
+from backend.config import settings
+
+_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_job_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound calculator batches.
+
+    Created on first use so workers that never run a batch don't fork.
+    """
+    global _process_pool
+    if _process_pool is None:
+        with _lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS)
+    return _process_pool
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Dedicated process pool for PDF rendering.
+
+    Separate from the calculator pool so PDF throughput is capped by
+    settings.PDF_MAX_WORKERS alone. Workers preload fonts and layouts in
+    their initializer.
+    """
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _lock:
+            if _pdf_pool is None:
+                from backend.export.pdf import initialisiere_pdf_worker
+                _pdf_pool = ProcessPoolExecutor(max_workers=settings.PDF_MAX_WORKERS, initializer=initialisiere_pdf_worker)
+    return _pdf_pool
+
+
+def get_job_pool() -> ThreadPoolExecutor:
+    """
+    Threads running background export jobs. Jobs mostly wait on the
+    database and the PDF pool, so threads are enough.
+    """
+    global _job_pool
+    if _job_pool is None:
+        with _lock:
+            if _job_pool is None:
+                _job_pool = ThreadPoolExecutor(max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix="export-job")
+    return _job_pool
+
+
+def shutdown_pools() -> None:
+    global _process_pool, _pdf_pool, _job_pool
+    with _lock:
+        # Jobs first, they may still submit to the PDF pool
+        for pool in (_job_pool, _process_pool, _pdf_pool):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        _process_pool = None
+        _pdf_pool = None
+        _job_pool = None
@@ -0,0 +1,226 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import DateTime, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+_ENDE = object()
+_VERSUCHE = 3
+
+
+class Protokoll:
+    """
+    Write-behind log for calculator rows.
+
+    Route handlers enqueue rows with ``schreibe`` and return immediately; a
+    background thread inserts them in one transaction per batch, as soon as
+    ``batch_groesse`` rows are waiting or ``intervall_ms`` after the first
+    row of a batch arrived. ``created_at`` is stamped when the row is
+    queued, not when it is flushed. ``stoppe`` (app shutdown, or interpreter exit
+    via atexit) writes everything still queued before returning; only a
+    hard kill loses the rows of the current interval. Callers that need the
+    row id use ``schreibe_sofort`` instead.
+
+    A batch that still fails after retries is kept and written together
+    with the next one (or after ``wiederholen_nach`` seconds without new
+    rows). More than ``max_offen`` kept rows, and rows still failing at
+    ``stoppe``, are appended to ``fehlerdatei`` (NDJSON); ``starte`` queues
+    them again. After ``stoppe``, ``schreibe`` inserts synchronously.
+    """
+
+    wiederholen_nach = 1.0
+
+    def __init__(self, batch_groesse: int, intervall_ms: float, bind=None,
+                 max_offen: Optional[int] = None, fehlerdatei: Optional[str] = None):
+        self.batch_groesse = batch_groesse
+        self.intervall = intervall_ms / 1000
+        self.max_offen = max_offen if max_offen is not None else settings.PROTOKOLL_MAX_OFFEN
+        self.fehlerdatei = fehlerdatei or settings.PROTOKOLL_FEHLERDATEI
+        self._bind = bind
+        self._warteschlange: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._gestoppt = False
+        # Rows of failed flushes, only touched by the flusher thread
+        self._offen: List[Tuple[Any, Dict[str, Any]]] = []
+
+    @property
+    def bind(self):
+        if self._bind is None:
+            from backend.database.db import engine
+            return engine
+        return self._bind
+
+    def starte(self) -> None:
+        with self._lock:
+            self._gestoppt = False
+            self._starte()
+
+    def _starte(self) -> None:
+        # Caller holds self._lock
+        if self._thread is None or not self._thread.is_alive():
+            self._lade_fehlerdatei()
+            self._thread = threading.Thread(target=self._lauf, name="protokoll", daemon=True)
+            self._thread.start()
+            atexit.register(self.stoppe)
+
+    def schreibe(self, modell: Type, werte: Dict[str, Any]) -> None:
+        """Queues one row for ``modell``'s table, never blocks while running"""
+        tabelle = modell.__table__
+        if "created_at" in tabelle.c and "created_at" not in werte:
+            werte = {**werte, "created_at": datetime.utcnow()}
+        eintrag = (tabelle, werte)
+        with self._lock:
+            if not self._gestoppt:
+                self._starte()
+                self._warteschlange.put(eintrag)
+                return
+        # After stoppe the flusher is gone, a queued row would never be written
+        self._schreibe_oder_sichere([eintrag])
+
+    async def schreibe_sofort(self, db: AsyncSession, modell: Type, werte: Dict[str, Any]) -> Any:
+        """Synchronous mode: inserts and commits now, returns the row with its id"""
+        eintrag = modell(**werte)
+        db.add(eintrag)
+        await db.commit()
+        return eintrag
+
+    def leere(self) -> None:
+        """Blocks until every row queued so far has been flushed (or kept after a failure)"""
+        if self._thread is not None:
+            self._warteschlange.join()
+
+    def stoppe(self) -> None:
+        """Writes all queued rows and ends the flusher thread"""
+        with self._lock:
+            self._gestoppt = True
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._warteschlange.put(_ENDE)
+        thread.join()
+        atexit.unregister(self.stoppe)
+
+    def _lauf(self) -> None:
+        while True:
+            try:
+                eintrag = self._warteschlange.get(timeout=self.wiederholen_nach) if self._offen else self._warteschlange.get()
+            except queue.Empty:
+                self._flush([])
+                continue
+            if eintrag is _ENDE:
+                self._flush([], ende=True)
+                self._warteschlange.task_done()
+                return
+            batch = [eintrag]
+            ende = False
+            frist = time.monotonic() + self.intervall
+            while len(batch) < self.batch_groesse:
+                rest = frist - time.monotonic()
+                try:
+                    eintrag = self._warteschlange.get(timeout=rest) if rest > 0 else self._warteschlange.get_nowait()
+                except queue.Empty:
+                    break
+                if eintrag is _ENDE:
+                    ende = True
+                    break
+                batch.append(eintrag)
+            self._flush(batch, ende)
+            for _ in range(len(batch) + ende):
+                self._warteschlange.task_done()
+            if ende:
+                # Everything queued before _ENDE is already in this batch
+                return
+
+    def _flush(self, neu: List[Tuple[Any, Dict[str, Any]]], ende: bool = False) -> None:
+        batch = self._offen + neu
+        if not batch:
+            return
+        if self._schreibe(batch):
+            self._offen = []
+        elif ende or len(batch) > self.max_offen:
+            self._sichere(batch)
+            self._offen = []
+        else:
+            self._offen = batch
+
+    def _schreibe_oder_sichere(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        if not self._schreibe(batch):
+            self._sichere(batch)
+
+    def _schreibe(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> bool:
+        tabellen: Dict[Any, List[Dict[str, Any]]] = {}
+        for tabelle, werte in batch:
+            tabellen.setdefault(tabelle, []).append(werte)
+        for versuch in range(1, _VERSUCHE + 1):
+            try:
+                with self.bind.begin() as conn:
+                    for tabelle, zeilen in tabellen.items():
+                        conn.execute(insert(tabelle), zeilen)
+                return True
+            except Exception:
+                if versuch == _VERSUCHE:
+                    logger.exception("Protokoll: %d Zeilen nicht gespeichert", len(batch))
+                else:
+                    time.sleep(0.1 * versuch)
+        return False
+
+    def _sichere(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        """Appends rows that could not be inserted to the error file"""
+        try:
+            with open(self.fehlerdatei, "a", encoding="utf-8") as f:
+                f.write("".join(
+                    json.dumps({"tabelle": tabelle.name, "werte": werte}, default=str) + "\n" for tabelle, werte in batch
+                ))
+            logger.error("Protokoll: %d Zeilen in %s gesichert", len(batch), self.fehlerdatei)
+        except OSError:
+            logger.exception("Protokoll: %d Zeilen verloren", len(batch))
+
+    def _lade_fehlerdatei(self) -> None:
+        """Queues rows of the error file again; the rename lets only one worker take them"""
+        uebernommen = f"{self.fehlerdatei}.{os.getpid()}"
+        try:
+            os.replace(self.fehlerdatei, uebernommen)
+        except FileNotFoundError:
+            return
+        from backend.database.db import Base
+        unbekannt = []
+        with open(uebernommen, encoding="utf-8") as f:
+            for zeile in f:
+                if not zeile.strip():
+                    continue
+                eintrag = json.loads(zeile)
+                tabelle = Base.metadata.tables.get(eintrag["tabelle"])
+                if tabelle is None:
+                    unbekannt.append(zeile)
+                else:
+                    self._warteschlange.put((tabelle, self._zeitstempel(tabelle, eintrag["werte"])))
+        if unbekannt:
+            # Tabelle nicht (mehr) im Modell: Zeilen bleiben in der Fehlerdatei
+            logger.error("Protokoll: %d Zeilen mit unbekannter Tabelle in %s", len(unbekannt), self.fehlerdatei)
+            with open(self.fehlerdatei, "a", encoding="utf-8") as f:
+                f.writelines(unbekannt)
+        os.remove(uebernommen)
+
+    @staticmethod
+    def _zeitstempel(tabelle, werte: Dict[str, Any]) -> Dict[str, Any]:
+        """Parses DateTime values that ``_sichere`` wrote as strings back into datetimes"""
+        for name, wert in werte.items():
+            spalte = tabelle.c.get(name)
+            if isinstance(wert, str) and spalte is not None and isinstance(spalte.type, DateTime):
+                werte[name] = datetime.fromisoformat(wert)
+        return werte
+
+
+protokoll = Protokoll(settings.PROTOKOLL_BATCH_ZEILEN, settings.PROTOKOLL_INTERVALL_MS)